@@ -0,0 +1 @@
+"""Бенчмарки горячих путей бота (запуск: python -m benchmarks.<модуль>)"""
@@ -0,0 +1,82 @@
+"""
+Бенчмарк пакетного расчёта калькулятора (CSV с SKU → CSV с метриками).
+Показывает пропускную способность файл→файл, пик памяти Python (tracemalloc) —
+он не должен расти с числом строк — и время самого расчёта NumPy против
+построчного calculate_economy_metrics + generate_recommendations.
+Запуск: python -m benchmarks.bench_batch_calculator
+"""
+import csv
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from bot.handlers.calculator import calculate_economy_metrics, generate_recommendations
+from bot.services.batch_calculator import economy_metrics_batch, process_batch, read_rows, recommendation_codes
+
+ROW_COUNTS = (10_000, 100_000)
+HEADER = ['sku', 'себестоимость', 'цена', 'комиссия', 'логистика', 'acos', 'налог']
+
+
+def make_csv(path: str, rows: int):
+    rng = random.Random(rows)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(HEADER)
+        for index in range(rows):
+            cost = rng.uniform(50, 2000)
+            writer.writerow([
+                f"SKU-{index}", f"{cost:.2f}", f"{cost * rng.uniform(1.2, 5):.2f}",
+                rng.choice((5, 12, 15, 17, 23)), rng.randint(5, 25), rng.randint(0, 25), rng.choice((6, 15))
+            ])
+
+
+def compute_times(path: str):
+    """Только расчёт (без чтения/записи файла): NumPy по массиву против цикла по строкам"""
+    rows = read_rows(path)
+    next(rows)
+    data = [[float(value) for value in row[1:7]] for row in rows]
+    inputs = np.array(data)
+    started = time.perf_counter()
+    recommendation_codes(economy_metrics_batch(inputs))
+    vectorized = time.perf_counter() - started
+    started = time.perf_counter()
+    for values in data:
+        generate_recommendations(calculate_economy_metrics(values))
+    scalar = time.perf_counter() - started
+    return vectorized, scalar
+
+
+def run_batch(path: str, trace: bool = False):
+    with tempfile.TemporaryFile() as output:
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        summary = process_batch(path, output)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        if trace:
+            tracemalloc.stop()
+    return summary, elapsed, peak
+
+
+def main():
+    print(f"{'строк':>8} {'файл→файл, с':>13} {'строк/с':>9} {'пик, МБ':>8} {'расчёт NumPy, мс':>17} {'расчёт циклом, мс':>18}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in ROW_COUNTS:
+            path = os.path.join(directory, f"skus_{rows}.csv")
+            make_csv(path, rows)
+            summary, elapsed, _ = run_batch(path)
+            _, _, peak = run_batch(path, trace=True)
+            vectorized, scalar = compute_times(path)
+            print(
+                f"{summary.rows:>8} {elapsed:>13.2f} {summary.rows / elapsed:>9.0f} {peak / 1e6:>8.1f} "
+                f"{vectorized * 1000:>17.1f} {scalar * 1000:>18.1f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
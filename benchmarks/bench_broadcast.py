@@ -0,0 +1,102 @@
+"""
+Бенчмарк рассылки подписчикам на имитации Bot API за планировщиком исходящих сообщений:
+часть пользователей заблокировала бота, посреди рассылки процесс «падает».
+Проверяет темп, что заблокированным не повторяют и что после рестарта никто не потерян.
+Запуск: python -m benchmarks.bench_broadcast
+"""
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from telegram.error import Forbidden
+
+from bot.services.outbound import OutboundScheduler
+from bot.services.subscriptions import BROADCAST_BURST, BROADCAST_RATE, SubscriptionService
+
+SUBSCRIBERS = 150
+BLOCKED_EVERY = 10           # каждый десятый заблокировал бота
+CRASH_AFTER = 60             # после стольких запросов первый процесс «падает»
+API_LATENCY = 0.03
+NOW = datetime(2026, 1, 15, 5, 0, tzinfo=timezone.utc)      # 08:00 МСК
+
+
+class FakeBot:
+    def __init__(self, rate_limiter, crash_after=None):
+        self.rate_limiter = rate_limiter
+        self.crash_after = crash_after
+        self.crashed = asyncio.Event()
+        self.calls = Counter()
+        self.times = []
+
+    async def send_message(self, chat_id, text, rate_limit_args=None):
+        data = {'chat_id': chat_id, 'text': text}
+        return await self.rate_limiter.process_request(self._post, ('sendMessage', data), {},
+                                                       'sendMessage', data, rate_limit_args)
+
+    async def _post(self, endpoint, data):
+        if self.crash_after is not None and sum(self.calls.values()) >= self.crash_after:
+            self.crashed.set()
+            await asyncio.Future()      # процесс «упал» — ответа не будет
+        self.calls[data['chat_id']] += 1
+        self.times.append(time.monotonic())
+        await asyncio.sleep(API_LATENCY)
+        if data['chat_id'] % BLOCKED_EVERY == 0:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        return {'message_id': 1}
+
+
+async def run_process(path, crash_after=None):
+    """Один «процесс»: загрузить состояние, отработать тик, выключиться (или упасть)"""
+    service = SubscriptionService(path)
+    scheduler = OutboundScheduler()
+    await scheduler.initialize()
+    bot = FakeBot(scheduler, crash_after)
+    service.daily[f"{NOW.date().isoformat()}:daily_phrase"] = "Маленький шаг каждый день."
+    started = time.monotonic()
+    tick = asyncio.create_task(service.tick(bot, None, NOW))
+    crashed = asyncio.create_task(bot.crashed.wait())
+    await asyncio.wait({tick, crashed}, return_when=asyncio.FIRST_COMPLETED)
+    for task in (tick, crashed):
+        task.cancel()
+    if bot.crashed.is_set():
+        # у «упавшего» процесса остаются брошенные отправки — их ошибки не интересны
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: None)
+    elapsed = time.monotonic() - started
+    await scheduler.shutdown()
+    return service, bot, elapsed
+
+
+def peak_per_second(times):
+    return max((sum(1 for t in times[i:] if t - start < 1.0) for i, start in enumerate(times)), default=0)
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'subscriptions.json')
+        service = SubscriptionService(path)
+        for user_id in range(1, SUBSCRIBERS + 1):
+            service.subscribe(user_id, 'daily_phrase', "08:00")
+
+        _, first_bot, _ = await run_process(path, CRASH_AFTER)
+        resumed, second_bot, elapsed = await run_process(path)
+
+        run = next(iter(resumed.runs.values()))
+        calls = first_bot.calls + second_bot.calls
+        blocked = [user_id for user_id in range(1, SUBSCRIBERS + 1) if user_id % BLOCKED_EVERY == 0]
+        print(f"подписчиков: {SUBSCRIBERS}, заблокировали бота: {len(blocked)}")
+        print(f"до падения отправлено: {sum(first_bot.calls.values())}, "
+              f"после рестарта: {sum(second_bot.calls.values())}")
+        print(f"повторно после рестарта (с последней записи курсора): "
+              f"{sum(1 for user_id in second_bot.calls if user_id in first_bot.calls)}")
+        print(f"не получили ни одной попытки: {sum(1 for user_id in range(1, SUBSCRIBERS + 1) if not calls[user_id])}")
+        print(f"заблокированным больше одной попытки: {sum(1 for user_id in blocked if calls[user_id] > 1)}")
+        print(f"подписки заблокированных сняты: {not any(resumed.topics(user_id) for user_id in blocked)}")
+        print(f"итог второго процесса: {resumed.report(run)}")
+        print(f"пик за 1 с: {peak_per_second(second_bot.times)} (лимит {BROADCAST_BURST} + {BROADCAST_RATE:g}/с)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
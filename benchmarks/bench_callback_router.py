@@ -0,0 +1,78 @@
+"""
+Бенчмарк маршрутизации нажатий: прежняя цепочка CallbackQueryHandler (regex по порядку
+регистрации, как их перебирает PTB) против словарного CallbackRouter на смеси
+callback_data из реальных меню.
+Запуск: python -m benchmarks.bench_callback_router
+"""
+import random
+import re
+import timeit
+
+from bot.services.callback_router import CallbackRouter
+
+CLICKS = 20_000
+
+AI_TOOLS = [
+    'ai_sage_self', 'ai_strategist_self', 'ai_mentor_self', 'ai_ideator_self',
+    'ai_editor_self', 'ai_growth_expert_self', 'ai_hr_advisor_self', 'ai_mediator_self',
+    'ai_daily_phrase_self', 'ai_mind_horoscope_self', 'ai_daily_reflection_self',
+]
+
+# Порядок как в прежних setup_*: commands → calculator → skilltrainer → ai → main_handler
+LEGACY_PATTERNS = (
+    ['^main_menu$', '^main_menu$', '^basics_menu$', '^profi_menu$', '^programs_menu$', '^individual_menu$',
+     '^commands_menu$', '^(subscriptions_menu|sub_)', '^menu_calculator$', '^calc_(save|diff)$',
+     '^st_mode_.+$', '^st_start_training$', '^st_.+$']
+    + [f'^{key}$' for key in AI_TOOLS]
+    + ['^ai_skilltrainer_business$', '^ai_orchestrator_prof$', r'^demo_[a-z_]+$', r'^activate_[a-z_]+$',
+       '^show_progress$', r'^orch_(action|cmd):.+']
+)
+
+CLICK_MIX = (
+    ['main_menu'] * 6 + ['basics_menu'] * 3 + AI_TOOLS + ['demo_sage', 'activate_sage', 'show_progress']
+    + ['st_mode_sim', 'st_mode_quiz', 'st_start_training', 'st_task_done', 'st_another_task',
+       'st_quiz_gen-q1_1', 'st_quiz_gen-q2_2', 'st_finish_session', 'orch_action:go_to_B1a', 'sub_time_0800']
+)
+
+
+def build_router() -> CallbackRouter:
+    router = CallbackRouter()
+    handler = lambda update, context, *args: None     # noqa: E731
+    exact = ['main_menu', 'basics_menu', 'profi_menu', 'programs_menu', 'individual_menu', 'commands_menu',
+             'subscriptions_menu', 'menu_calculator', 'calc_save', 'calc_diff', 'st_cancel', 'st_start_training',
+             'st_referral', 'st_new_session', 'st_task_done', 'st_need_hint', 'st_another_task',
+             'st_finish_early', 'st_finish_session', 'ai_skilltrainer_business', 'ai_orchestrator_prof',
+             'show_progress'] + AI_TOOLS
+    prefixes = ['sub_toggle_', 'sub_time_', 'st_mode_', 'st_export_', 'st_quiz_', 'demo_', 'activate_',
+                'orch_action:', 'orch_cmd:']
+    for key in exact:
+        router.route(key, handler)
+    for key in prefixes:
+        router.route(key, handler, prefix=True)
+    return router
+
+
+def main():
+    rng = random.Random(7)
+    clicks = [rng.choice(CLICK_MIX) for _ in range(CLICKS)]
+    compiled = [re.compile(pattern) for pattern in LEGACY_PATTERNS]
+    router = build_router()
+
+    def legacy():
+        for data in clicks:
+            next((pattern for pattern in compiled if pattern.match(data)), None)
+
+    def routed():
+        for data in clicks:
+            router.resolve(data)
+
+    overlaps = sum(1 for data in set(CLICK_MIX) if sum(1 for pattern in compiled if pattern.match(data)) > 1)
+    print(f"regex-обработчиков: {len(compiled)}, маршрутов: {len(router._exact) + len(router._prefixes)}")
+    print(f"callback_data, подходящих под несколько regex: {overlaps} из {len(set(CLICK_MIX))}")
+    for title, function in (('цепочка regex', legacy), ('CallbackRouter', routed)):
+        elapsed = min(timeit.repeat(function, number=1, repeat=5)) / CLICKS * 1e6
+        print(f"{title:<16}{elapsed:>8.2f} мкс/нажатие")
+
+
+if __name__ == '__main__':
+    main()
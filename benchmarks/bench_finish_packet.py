@@ -0,0 +1,40 @@
+"""
+Бенчмарк рендеринга Finish Packet в файл (Markdown / HTML / JSON).
+Запуск: python -m benchmarks.bench_finish_packet
+"""
+import timeit
+
+from bot.models import SkillSession, TrainingMode
+from bot.services.packet_export import build_packet_data, render_packet, EXPORT_FORMATS
+
+PROGRAM_SIZES_KB = (4, 64, 512, 2048)
+PARAGRAPH = (
+    "**Неделя 1.** Ежедневная практика открытых вопросов: 15 минут, 3 диалога, "
+    "разбор записей по чек-листу <DOD> & фиксация прогресса в дневнике.\n\n"
+)
+
+
+def make_session() -> SkillSession:
+    session = SkillSession(user_id=123456789)
+    for step in range(6):
+        session.add_answer(step, f"Развёрнутый ответ на вопрос {step + 1} " * 8)
+    session.selected_mode = TrainingMode.DRILL
+    session.gates_passed.update({'interview_complete', 'mode_selected', 'training_complete'})
+    return session
+
+
+def main():
+    session = make_session()
+    print(f"{'размер':>8} {'формат':>6} {'мс/рендер':>10} {'МБ/с':>8} {'байт':>10}")
+    for size_kb in PROGRAM_SIZES_KB:
+        program = PARAGRAPH * (size_kb * 1024 // len(PARAGRAPH.encode('utf-8')) + 1)
+        packet = build_packet_data(session, program)
+        for fmt in EXPORT_FORMATS:
+            size = len(render_packet(packet, fmt).getbuffer())
+            runs = max(3, 2000 // size_kb)
+            seconds = timeit.timeit(lambda: render_packet(packet, fmt), number=runs) / runs
+            print(f"{size_kb:>6}KB {fmt:>6} {seconds * 1000:>10.3f} {size / seconds / 1e6:>8.1f} {size:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Бенчмарк подбора подсказок SKILLTRAINER по корпусу hints.yaml.
+Запуск: python -m benchmarks.bench_hints
+"""
+import timeit
+
+from bot.models import SkillSession, TrainingMode
+from bot.services.hint_engine import hint_index
+
+ANSWERS = (
+    "Хочу научиться вести переговоры с клиентами о скидках",
+    "5, иногда получается, но часто сдаюсь",
+    "Боюсь давления и не знаю, как отвечать на возражения",
+    "Трачу на подготовку около 15 минут в день",
+    "Записываю результаты в таблицу после каждой встречи",
+    "Лучше всего получается слушать собеседника",
+)
+
+
+def make_session(answers: int) -> SkillSession:
+    session = SkillSession(user_id=123456789)
+    for step, answer in enumerate(ANSWERS[:answers]):
+        session.add_answer(step, answer)
+    session.selected_mode = TrainingMode.SIM
+    return session
+
+
+def main():
+    print(f"корпус v{hint_index.version}: {len(hint_index.hints)} подсказок, {len(hint_index.postings)} корней")
+    print(f"{'ответов':>8} {'мкс/подсказка':>14}  подсказка")
+    for answers in (0, 1, 3, len(ANSWERS)):
+        session = make_session(answers)
+        runs = 20000
+        seconds = timeit.timeit(lambda: hint_index.pick(session), number=runs) / runs
+        print(f"{answers:>8} {seconds * 1e6:>14.1f}  {hint_index.pick(session)[:60]}")
+
+
+if __name__ == '__main__':
+    main()
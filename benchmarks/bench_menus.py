@@ -0,0 +1,102 @@
+"""
+Бенчмарк меню: сборка клавиатуры и текста на каждый клик (как было в обработчиках)
+против выдачи готовой разметки из реестра. Для каждого callback — время и число
+новых блоков памяти (tracemalloc), которые создаёт один вызов и держит его результат.
+Запуск: python -m benchmarks.bench_menus
+"""
+import timeit
+import tracemalloc
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.services.ui_registry import ui
+import bot.handlers.skilltrainer  # noqa: F401 — регистрирует шаблон st_quiz
+
+RUNS = 2000
+
+
+def legacy_basics_menu():
+    keyboard = [
+        [InlineKeyboardButton("🧠 Мудрец", callback_data='ai_sage_self'),
+         InlineKeyboardButton("📈 Стратег", callback_data='ai_strategist_self'),
+         InlineKeyboardButton("🧭 Наставник", callback_data='ai_mentor_self')],
+        [InlineKeyboardButton("💡 Идеатор", callback_data='ai_ideator_self'),
+         InlineKeyboardButton("✨ Редактор", callback_data='ai_editor_self'),
+         InlineKeyboardButton("📈 Рост-эксперт", callback_data='ai_growth_expert_self')],
+        [InlineKeyboardButton("💼 HR-советник", callback_data='ai_hr_advisor_self'),
+         InlineKeyboardButton("🤝 Посредник", callback_data='ai_mediator_self'),
+         InlineKeyboardButton("🌟 Фраза дня", callback_data='ai_daily_phrase_self')],
+        [InlineKeyboardButton("🔮 Гороскоп разума", callback_data='ai_mind_horoscope_self'),
+         InlineKeyboardButton("🌙 Рефлексия дня", callback_data='ai_daily_reflection_self')],
+        [InlineKeyboardButton("🔔 Присылать каждый день", callback_data='subscriptions_menu')],
+        [InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]
+    ]
+    return "🆓 БАЗОВЫЕ ИНСТРУМЕНТЫ (ежедневные)\nДо 5 запросов в день на каждый. Выберите:", InlineKeyboardMarkup(keyboard)
+
+
+def legacy_ai_tool(prompt_key='growth_expert'):
+    keyboard = [
+        [InlineKeyboardButton("💡 Демо-сценарий (что он умеет?)", callback_data=f'demo_{prompt_key}')],
+        [InlineKeyboardButton("✅ Активировать", callback_data=f'activate_{prompt_key}')],
+        [InlineKeyboardButton("📊 Мой прогресс", callback_data='show_progress')],
+        [InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]
+    ]
+    display_name = prompt_key.replace('_', ' ').title()
+    text = f"Вы выбрали **{display_name}**.\nЧтобы начать, изучите демо-сценарий или активируйте доступ."
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+def legacy_st_modes():
+    keyboard = [
+        [InlineKeyboardButton("🎭 Sim", callback_data="st_mode_sim"),
+         InlineKeyboardButton("💪 Drill", callback_data="st_mode_drill"),
+         InlineKeyboardButton("🏗️ Build", callback_data="st_mode_build")],
+        [InlineKeyboardButton("📋 Case", callback_data="st_mode_case"),
+         InlineKeyboardButton("❓ Quiz", callback_data="st_mode_quiz"),
+         InlineKeyboardButton("ℹ️ Описания", callback_data="st_mode_info")],
+        [InlineKeyboardButton("❌ Отмена", callback_data="st_cancel")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+def legacy_st_quiz(item_id='gen-q1', options=4):
+    keyboard = [[InlineKeyboardButton(str(i), callback_data=f"st_quiz_{item_id}_{i - 1}") for i in range(1, options + 1)]]
+    keyboard.append([InlineKeyboardButton("🏁 Завершить сессию", callback_data="st_finish_session")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def registry_ai_tool(prompt_key='growth_expert'):
+    return ui.menu('ai_tool', prompt_key=prompt_key, display_name=prompt_key.replace('_', ' ').title())
+
+
+CASES = {
+    'basics_menu': (legacy_basics_menu, lambda: ui.menu('basics_menu')),
+    'ai_growth_expert_self': (legacy_ai_tool, registry_ai_tool),
+    'st_mode_select': (legacy_st_modes, lambda: ui.markup('st_modes')),
+    'st_quiz (4 варианта)': (legacy_st_quiz, lambda: ui.markup('st_quiz', item_id='gen-q1', options=4)),
+}
+
+
+def allocations(function) -> float:
+    """Среднее число новых блоков памяти, оставшихся за результатом одного вызова"""
+    function()      # прогрев: шаблон реестра рендерится при первом обращении
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [function() for _ in range(100)]     # результаты держим, чтобы блоки не освободились
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del kept
+    return max(blocks - 1, 0) / 100     # минус сам список kept
+
+
+def main():
+    print(f"{'callback':<26}{'вариант':<10}{'мкс/вызов':>11}{'блоков/вызов':>14}")
+    for name, (legacy, registry) in CASES.items():
+        for title, function in (('сборка', legacy), ('реестр', registry)):
+            elapsed = timeit.timeit(function, number=RUNS) / RUNS * 1e6
+            print(f"{name:<26}{title:<10}{elapsed:>11.2f}{allocations(function):>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Бенчмарк разбиения длинных ответов на сообщения Telegram на входах по 100 КБ:
+прежний алгоритм (конкатенация по '. ' + жёсткий рез) против однопроходного split_message.
+Кроме времени проверяет лимит в UTF-16 и баланс разметки Markdown в каждой части.
+Запуск: python -m benchmarks.bench_message_split
+"""
+import random
+import re
+import timeit
+
+from bot.services.message_split import MESSAGE_LIMIT, split_message, telegram_length
+
+TARGET_BYTES = 100 * 1024
+WORDS = ("маркетплейс", "прибыль", "навык", "переговоры", "клиент", "цена", "логистика", "план", "неделя", "итог")
+
+
+def legacy_split(text: str, max_length: int = MESSAGE_LIMIT):
+    """Прежняя реализация split_message_efficiently — для сравнения"""
+    if len(text) <= max_length:
+        return [text]
+    sentences = text.split('. ')
+    parts = []
+    current_part = ""
+    for sentence in sentences:
+        test_part = current_part + sentence + ". "
+        if len(test_part) <= max_length:
+            current_part = test_part
+        else:
+            if current_part:
+                parts.append(current_part.strip())
+            current_part = sentence + ". "
+    if current_part:
+        parts.append(current_part.strip())
+    final_parts = []
+    for part in parts:
+        if len(part) > max_length:
+            for i in range(0, len(part), max_length):
+                final_parts.append(part[i:i + max_length])
+        else:
+            final_parts.append(part)
+    return final_parts
+
+
+def sentence(rng: random.Random, markup: bool) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 14))]
+    if markup:
+        i = rng.randrange(len(words) - 3)
+        words[i] = "**" + words[i]
+        words[i + 2] += "**"
+        words[-2] = f"`{words[-2]}`"
+    return " ".join(words).capitalize() + "."
+
+
+def fill(make, seed=1) -> str:
+    rng = random.Random(seed)
+    chunks, size = [], 0
+    while size < TARGET_BYTES:
+        chunk = make(rng)
+        chunks.append(chunk)
+        size += len(chunk.encode('utf-8'))
+    return "".join(chunks)
+
+
+INPUTS = {
+    'проза с абзацами': fill(lambda rng: " ".join(sentence(rng, False) for _ in range(5)) + "\n\n"),
+    'markdown': fill(lambda rng: f"📌 **Раздел {rng.randint(1, 99)}**\n" + " ".join(sentence(rng, True) for _ in range(4))
+                     + ("\n```\nкод = 1\nитог = код * 2\n```" if rng.random() < 0.2 else "") + "\n\n"),
+    'одна строка без точек': fill(lambda rng: " ".join(rng.choice(WORDS) for _ in range(50)) + " "),
+    'эмодзи без пробелов': fill(lambda rng: "👍🏽👨‍👩‍👧🚀" * 20),
+}
+
+
+def markdown_balanced(part: str) -> bool:
+    """Парность ``` и вне кода — парность `, * и _ (как их видит Telegram Markdown)"""
+    if part.count("```") % 2:
+        return False
+    outside = re.sub(r"```.*?```", "", part, flags=re.S)
+    outside = re.sub(r"`[^`]*`", "", outside)
+    return outside.count("`") % 2 == 0 and outside.count("*") % 2 == 0 and outside.count("_") % 2 == 0
+
+
+def main():
+    print(f"{'вход':<24}{'алгоритм':<10}{'мс':>8}{'частей':>8}{'макс UTF-16':>13}{'разметка':>10}")
+    for name, text in INPUTS.items():
+        markdown = name == 'markdown'
+        for title, split in (('прежний', legacy_split), ('новый', lambda t: split_message(t, markdown=markdown))):
+            runs = 5
+            elapsed = timeit.timeit(lambda: split(text), number=runs) / runs * 1000
+            parts = split(text)
+            longest = max(telegram_length(part) for part in parts)
+            balanced = all(markdown_balanced(part) for part in parts) if markdown else '—'
+            flag = '' if longest <= MESSAGE_LIMIT else ' ✗'
+            print(f"{name:<24}{title:<10}{elapsed:>8.2f}{len(parts):>8}{longest:>12}{flag:<1}{str(balanced):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк планировщика исходящих сообщений на имитации Bot API: всплеск ответов
+в несколько чатов, один RetryAfter посередине. Проверяет, что лимиты соблюдены,
+порядок в чатах сохранён, а мелкие сообщения склеены.
+Запуск: python -m benchmarks.bench_outbound
+"""
+import asyncio
+import time
+from collections import defaultdict
+
+from telegram.error import RetryAfter
+
+from bot.services.outbound import (
+    GLOBAL_BURST, GLOBAL_RATE, PRIVATE_CHAT_BURST, PRIVATE_CHAT_RATE, OutboundScheduler
+)
+
+CHATS = 20
+MESSAGES_PER_CHAT = 5
+API_LATENCY = 0.03
+RETRY_AFTER_AT = 15          # номер запроса, на который «Telegram» ответит RetryAfter
+
+
+class FakeApi:
+    def __init__(self):
+        self.calls = 0
+        self.sent = defaultdict(list)       # chat_id → [(время, текст)]
+
+    async def post(self, endpoint, data):
+        self.calls += 1
+        if self.calls == RETRY_AFTER_AT:
+            raise RetryAfter(1)
+        await asyncio.sleep(API_LATENCY)
+        self.sent[data['chat_id']].append((time.monotonic(), data['text']))
+        return {'message_id': self.calls, 'chat': {'id': data['chat_id']}}
+
+
+async def send(scheduler, api, chat_id, text):
+    data = {'chat_id': chat_id, 'text': text}
+    return await scheduler.process_request(api.post, ('sendMessage', data), {}, 'sendMessage', data, None)
+
+
+def max_chat_rate(times, window=1.0):
+    """Наибольшее число отправок в один чат за любое окно window секунд"""
+    best = 0
+    for i, started in enumerate(times):
+        best = max(best, sum(1 for t in times[i:] if t - started < window))
+    return best
+
+
+async def run(title, make_text):
+    scheduler = OutboundScheduler()
+    api = FakeApi()
+    await scheduler.initialize()
+    started = time.monotonic()
+    texts = {chat: [make_text(chat, i) for i in range(MESSAGES_PER_CHAT)] for chat in range(1, CHATS + 1)}
+    await asyncio.gather(*(send(scheduler, api, chat, text) for i in range(MESSAGES_PER_CHAT)
+                           for chat, chat_texts in texts.items() for text in [chat_texts[i]]))
+    elapsed = time.monotonic() - started
+    await scheduler.shutdown()
+
+    requests = sum(len(items) for items in api.sent.values())
+    ordered = all(
+        [part for _, text in items for part in text.split("\n\n")] == texts[chat]
+        for chat, items in api.sent.items()
+    )
+    peak_chat = max(max_chat_rate([t for t, _ in items]) for items in api.sent.values())
+    all_times = sorted(t for items in api.sent.values() for t, _ in items)
+    print(f"\n{title}")
+    print(f"сообщений: {CHATS * MESSAGES_PER_CHAT}, запросов к API: {requests}, склеено: {scheduler.stats['coalesced']}")
+    print(f"RetryAfter: {scheduler.stats['retry_after']}, время: {elapsed:.2f} с")
+    print(f"порядок в чатах сохранён: {ordered}")
+    print(f"пик в чат за 1 с: {peak_chat} (лимит {PRIVATE_CHAT_BURST} + {PRIVATE_CHAT_RATE:g}/с)")
+    print(f"пик на бота за 1 с: {max_chat_rate(all_times)} (лимит {GLOBAL_BURST} + {GLOBAL_RATE:g}/с)")
+
+
+async def main():
+    await run("Короткие ответы (склеиваются, кроме каждого пятого длинного)",
+              lambda chat, i: "x" * 3000 + str(i) if i % 5 == 4 else f"{chat}:{i}")
+    await run("Только длинные части (без склейки — чистый темп корзин)",
+              lambda chat, i: "x" * 3000 + str(i))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
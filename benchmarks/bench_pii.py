@@ -0,0 +1,111 @@
+"""
+Бенчмарк обезличивания ПДн: прежние семь проходов re.sub против однопроходного pii_engine.
+1. Корпус benchmarks/pii_corpus.yaml: движок обязан совпасть с expected; случаи, где
+   прежняя реализация давала другой результат, печатаются.
+2. Пропускная способность на коротком вопросе, сообщении с ПДн, длинной вставке
+   и на повторяющихся ответах (с памятью и без).
+3. Задержка цикла событий, пока маскируется вставка на 200 КБ: в самом цикле
+   и через mask_async в рабочем потоке.
+Запуск: python -m benchmarks.bench_pii
+"""
+import asyncio
+import os
+import re
+import time
+import timeit
+
+import yaml
+
+from bot.services.pii_engine import PiiEngine
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'pii_corpus.yaml')
+RUNS = 2000
+
+SHORT = "Как поднять продажи на 20% за квартал?"
+WITH_PII = "Меня зовут Иван, почта ivan.petrov@mail.ru, тел +7 (916) 123-45-67, карта 1234 5678 9012 3456"
+PARAGRAPH = ("Добрый день! Хочу обсудить план продаж на маркетплейсе: у нас 3 склада и 120 позиций, "
+             "Это Сергей из закупок, звоните 8 916 123 45 67. ")
+LONG = PARAGRAPH * 40
+HUGE = PARAGRAPH * 1500
+REPLIES = ["да", "нет", "готово", "не знаю", "давай дальше", "Задание выполнено", "спасибо", "ок"]
+
+
+def legacy_mask_pii(text: str) -> str:
+    """Прежняя реализация mask_pii — для сравнения"""
+    text = re.sub(r'\b([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\b', '<PERSON>', text)
+    text = re.sub(r'\b(зовут|имя|это|зовут\s+меня|зовут\s+его|зовут\s+её)\s+([а-яёa-z\s]{2,30})', r'\1 <PERSON>', text, flags=re.IGNORECASE)
+    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '<EMAIL>', text)
+    text = re.sub(r'\+?\d[\d\-\s\(\)]{7,}\d', '<PHONE>', text)
+    text = re.sub(r'\b\d{10}\b|\b\d{12}\b', '<TAX_ID>', text)
+    text = re.sub(r'\b(?:\d{4}[\s\-]?){3}\d{4}\b', '<CARD>', text)
+    text = re.sub(r'\b\d{2}\s\d{2}\s\d{6}\b', '<PASSPORT>', text)
+    return text
+
+
+def check_corpus(engine: PiiEngine) -> bool:
+    with open(CORPUS_PATH, 'r', encoding='utf-8') as f:
+        cases = yaml.safe_load(f)['cases']
+    failures = [case for case in cases if engine.mask(case['text']) != case['expected']]
+    changed = [case for case in cases if legacy_mask_pii(case['text']) != case['expected']]
+    print(f"корпус: {len(cases)} случаев, ошибок движка: {len(failures)}, отличий от прежней реализации: {len(changed)}")
+    for case in failures:
+        print(f"  ОШИБКА {case['text']!r}: {engine.mask(case['text'])!r}, ожидалось {case['expected']!r}")
+    for case in changed:
+        print(f"  было {legacy_mask_pii(case['text'])!r} → стало {case['expected']!r}")
+    return not failures
+
+
+def throughput():
+    engine = PiiEngine(memo_size=0)
+    memo_engine = PiiEngine()
+    print(f"\n{'вход':<28}{'прежний':>12}{'движок':>12}{'с памятью':>12}  мкс/вызов")
+    cases = (('короткий вопрос', [SHORT]), ('сообщение с ПДн', [WITH_PII]),
+             (f'вставка {len(LONG)} симв.', [LONG]), ('повторяющиеся ответы', REPLIES))
+    for title, texts in cases:
+        row = []
+        for function in (legacy_mask_pii, engine.mask, memo_engine.mask):
+            elapsed = min(timeit.repeat(lambda: [function(text) for text in texts], number=RUNS, repeat=3))
+            row.append(elapsed / RUNS / len(texts) * 1e6)
+        print(f"{title:<28}{row[0]:>12.2f}{row[1]:>12.2f}{row[2]:>12.2f}")
+
+
+async def loop_lag(masker) -> float:
+    """Максимальный разрыв между тиками цикла событий (мс), пока маскируется HUGE"""
+    lags = []
+    running = True
+
+    async def ticker():
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            lags.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await masker(HUGE)
+    running = False
+    await task
+    return max(lags) * 1000
+
+
+async def lag_report():
+    engine = PiiEngine(memo_size=0)
+
+    async def inline(text):
+        engine.mask(text)
+
+    print(f"\nвставка {len(HUGE) // 1000} тыс. символов, максимальная пауза цикла событий:")
+    for title, masker in (('в цикле событий', inline), ('mask_async (поток)', engine.mask_async)):
+        print(f"  {title:<22}{await loop_lag(masker):>8.1f} мс")
+
+
+def main():
+    check_corpus(PiiEngine())
+    throughput()
+    asyncio.run(lag_report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Бенчмарк сетки чувствительности калькулятора: sensitivity_grid (один векторный расчёт)
+против цикла calculate_economy_metrics по каждой ячейке.
+Сначала проверяет, что текст сетки по обеим осям — корректный Markdown (legacy):
+каждая открытая сущность закрыта, иначе Telegram отвечает 400 «Can't find end of the entity».
+Запуск: python -m benchmarks.bench_price_grid
+"""
+import random
+import timeit
+
+from bot.handlers.calculator import calculate_economy_metrics
+from bot.services.message_split import _scan_markers
+from bot.services.price_solver import GRID_AXES, PRICE_MULTIPLIERS, format_grid, sensitivity_grid
+
+BASE = [300.0, 1000.0, 15.0, 10.0, 10.0, 6.0]
+RANDOM_INPUTS = 500
+RUNS = 500
+
+
+def loop_grid(data, axis):
+    """Та же сетка поячеечно — для сравнения"""
+    column, _, values = GRID_AXES[axis]
+    grid = []
+    for multiplier in PRICE_MULTIPLIERS:
+        row = []
+        for value in values:
+            cell = list(data)
+            cell[1] = data[1] * multiplier
+            cell[column] = value
+            row.append(calculate_economy_metrics(cell)['чистая_маржа_%'])
+        grid.append(row)
+    return grid
+
+
+def main():
+    rng = random.Random(3)
+    inputs = [BASE] + [
+        [rng.uniform(0, 5000), rng.uniform(1, 10000), rng.uniform(0, 40), rng.uniform(0, 30),
+         rng.uniform(0, 40), rng.uniform(0, 15)]
+        for _ in range(RANDOM_INPUTS)
+    ]
+    broken = [(axis, data) for data in inputs for axis in GRID_AXES if _scan_markers(format_grid(data, axis), '')]
+    print(f"сеток: {len(inputs) * len(GRID_AXES)}, с незакрытой разметкой Markdown: {len(broken)}")
+    for axis, data in broken[:3]:
+        print(f"  {axis} {data}")
+
+    print(f"\n{'ось':<12}{'цикл':>10}{'NumPy':>10}  мкс/сетка")
+    for axis in GRID_AXES:
+        row = [min(timeit.repeat(lambda: function(BASE, axis), number=RUNS, repeat=3)) / RUNS * 1e6
+               for function in (loop_grid, sensitivity_grid)]
+        print(f"{axis:<12}{row[0]:>10.1f}{row[1]:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
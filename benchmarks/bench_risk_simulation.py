@@ -0,0 +1,26 @@
+"""
+Бенчмарк риск-симуляции калькулятора (Монте-Карло по диапазонам входов).
+Запуск: python -m benchmarks.bench_risk_simulation
+"""
+import timeit
+
+from bot.services.risk_simulation import parse_ranges, simulate
+
+BASE = [300.0, 1000.0, 15.0, 10.0, 10.0, 6.0]
+SCENARIO = "acos 5-20; логистика 10±2; возвраты 0-5-15; цена 900-1100"
+DRAW_COUNTS = (10_000, 100_000, 1_000_000)
+
+
+def main():
+    ranges = parse_ranges(SCENARIO)
+    print(f"сценарий: {SCENARIO}")
+    print(f"{'прогонов':>10} {'мс':>8} {'P(убыток)':>10}")
+    for draws in DRAW_COUNTS:
+        runs = max(3, 1_000_000 // draws)
+        seconds = timeit.timeit(lambda: simulate(BASE, ranges, draws=draws, seed=1), number=runs) / runs
+        result = simulate(BASE, ranges, draws=draws, seed=1)
+        print(f"{draws:>10} {seconds * 1000:>8.1f} {result.loss_probability:>10.2%}")
+
+
+if __name__ == '__main__':
+    main()
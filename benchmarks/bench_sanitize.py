@@ -0,0 +1,85 @@
+"""
+Бенчмарк очистки ввода: прежний sanitize_user_input (re.sub + генератор с isprintable()
+по всему тексту, обрезка в конце) против обрезки с запасом, str.replace для частых
+символов и str.translate по таблице удаления для остальных непечатаемых.
+Отдельно — чистый translate без быстрого пути.
+Сначала сверяет результаты на корпусе: тексты корпуса ПДн и случайные строки из
+кириллицы, эмодзи, управляющих и удаляемых символов длиной вокруг max_length,
+в том числе такие, где удаляется больше запаса.
+Запуск: python -m benchmarks.bench_sanitize
+"""
+import os
+import random
+import re
+import timeit
+
+import yaml
+
+from bot.utils import SANITIZE_MARGIN, SANITIZE_TABLE, sanitize_user_input
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'pii_corpus.yaml')
+RANDOM_CASES = 3000
+RUNS = 200
+
+ALPHABET = (
+    list("абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗ abcxyzABC0123456789.,!?:;()\"'%+=_*#@/")
+    + list("<>{}`|\\-\t") * 3
+    + ['\n', '\r', '\x00', '\x07', '\x1b', '\x7f', '\x85', '\xa0', '\xad', '​', ' ', '﻿', '']
+    + ['😀', '🚀', '👍🏻', '\U000e0001', '\U0010ffff', '𝔸']
+)
+
+
+def legacy_sanitize(text: str, max_length: int = 2000) -> str:
+    """Прежняя реализация sanitize_user_input — для сравнения"""
+    if not text:
+        return ""
+    cleaned = re.sub(r'[<>{}`|\\\-\t]', '', text)
+    cleaned = ''.join(char for char in cleaned if char.isprintable() or char in '\r')
+    return cleaned[:max_length]
+
+
+def translate_only(text: str, max_length: int = 2000) -> str:
+    """Обрезка с запасом и translate без быстрого пути (для коротких текстов запаса хватает)"""
+    return text[:max_length + SANITIZE_MARGIN].translate(SANITIZE_TABLE)[:max_length]
+
+
+def corpus():
+    with open(CORPUS_PATH, 'r', encoding='utf-8') as f:
+        texts = [case['text'] for case in yaml.safe_load(f)['cases']]
+    rng = random.Random(5)
+    for _ in range(RANDOM_CASES):
+        length = rng.choice([0, 1, 50, 1999, 2000, 2001, 2256, 2257, 3000, 9000])
+        texts.append(''.join(rng.choice(ALPHABET) for _ in range(length)))
+    # Удаляемые символы съедают запас целиком: результат добирается следующими кусками
+    texts.append('<' * 2500 + 'текст ' * 500)
+    texts.append('\x00' * 10_000 + 'конец')
+    texts.append(('\t' * 300 + 'абв') * 40)
+    return texts
+
+
+def main():
+    texts = corpus()
+    lengths = (2000, 100, 1)
+    mismatches = [(text, length) for text in texts for length in lengths
+                  if sanitize_user_input(text, length) != legacy_sanitize(text, length)]
+    print(f"корпус: {len(texts)} текстов × {len(lengths)} значений max_length, расхождений: {len(mismatches)}")
+    for text, length in mismatches[:5]:
+        print(f"  max_length={length}: {text[:60]!r}...")
+
+    paragraph = "Добрый день! Помогите с планом продаж: 3 склада, 120 позиций, комиссия 15% 🚀\n"
+    inputs = {
+        'короткий вопрос': "Как поднять продажи на 20% за квартал?",
+        'сообщение 1 500 симв.': (paragraph * 20)[:1500],
+        'вставка 4 096 симв.': (paragraph * 60)[:4096],
+        'вставка 100 000 симв.': (paragraph * 1300)[:100_000],
+        'с управляющими символами': (paragraph.replace('\n', '\x1b[0m\n') * 20)[:1500],
+    }
+    print(f"\n{'вход':<26}{'прежний':>12}{'translate':>12}{'новый':>12}  мкс/вызов")
+    for title, text in inputs.items():
+        row = [min(timeit.repeat(lambda: function(text), number=RUNS, repeat=3)) / RUNS * 1e6
+               for function in (legacy_sanitize, translate_only, sanitize_user_input)]
+        print(f"{title:<26}{row[0]:>12.1f}{row[1]:>12.1f}{row[2]:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Бенчмарк памяти на активного пользователя: SkillSession + история диалога.
+Сравнивает слотовую сессию с маской гейтов и кольцевым буфером истории
+с прежним представлением (__dict__, set гейтов, список dict-реплик).
+Запуск: python -m benchmarks.bench_session_memory
+"""
+import gc
+import tracemalloc
+from datetime import datetime
+
+from bot.models import ConversationHistory, SkillSession, TrainingMode
+
+USER_COUNTS = (10_000, 100_000)
+ANSWERS = 7
+HISTORY_TURNS = 15
+GATES = ('interview_complete', 'mode_selected', 'training_complete')
+
+
+class LegacySession:
+    """Прежняя форма SkillSession (обычный объект с __dict__)"""
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.state = None
+        self.current_step = 0
+        self.max_steps = 8
+        self.answers = {}
+        self.selected_mode = None
+        self.gates_passed = set()
+        self.last_hint = None
+        self.created_at = datetime.now()
+        self.progress = 0.0
+        self.finish_packet = None
+        self.training_complete = False
+        self.data = {}
+
+
+def make_compact(user_id: int):
+    session = SkillSession(user_id)
+    for step in range(ANSWERS):
+        session.add_answer(step, f"ответ {step} пользователя {user_id}")
+    session.selected_mode = TrainingMode.DRILL
+    session.gates_passed.update(GATES)
+    history = ConversationHistory()
+    for turn in range(HISTORY_TURNS):
+        history.append("user" if turn % 2 == 0 else "assistant", f"реплика {turn} {user_id}")
+    return session, history
+
+
+def make_legacy(user_id: int):
+    session = LegacySession(user_id)
+    for step in range(ANSWERS):
+        session.answers[step] = f"ответ {step} пользователя {user_id}"
+    session.current_step = ANSWERS
+    session.progress = 1.0
+    session.selected_mode = TrainingMode.DRILL
+    session.gates_passed.update(GATES)
+    history = []
+    for turn in range(HISTORY_TURNS):
+        history.append({"role": "user" if turn % 2 == 0 else "assistant", "content": f"реплика {turn} {user_id}"})
+    return session, {"history": history, "last_activity": datetime.now()}
+
+
+def measure(factory, users: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = {user_id: factory(user_id) for user_id in range(users)}
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return (after - before) / users
+
+
+def main():
+    print(f"{'пользователей':>14} {'прежняя, Б':>12} {'компактная, Б':>14} {'экономия':>9}")
+    for users in USER_COUNTS:
+        legacy = measure(make_legacy, users)
+        compact = measure(make_compact, users)
+        print(f"{users:>14} {legacy:>12.0f} {compact:>14.0f} {1 - compact / legacy:>9.0%}")
+
+
+if __name__ == '__main__':
+    main()
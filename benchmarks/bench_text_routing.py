@@ -0,0 +1,122 @@
+"""
+Бенчмарк маршрутизации текста: прежняя цепочка if, где any(...) заново вызывает lower()
+на каждое ключевое слово, против таблиц select_text_route с KeywordTriggers.
+Смесь сообщений — как в логах: ответы в режиме ИИ-инструмента, калькулятор, кнопки
+reply-клавиатуры, просьбы о реферальной ссылке и статистике, случайный текст в меню.
+Сравнивается только выбор обработчика, сами обработчики не вызываются.
+Отдельно — поиск ключевых слов в длинном сообщении: any(...) с lower() на каждый набор,
+объединённое регулярное выражение с именованными группами и KeywordTriggers.
+Запуск: python -m benchmarks.bench_text_routing
+"""
+import random
+import re
+import timeit
+from types import SimpleNamespace
+
+from bot.handlers import main_handler
+from bot.handlers.main_handler import keyword_triggers, select_text_route
+from bot.models import BotState, active_skill_sessions
+
+MESSAGES = 20_000
+USER_ID = -1    # отрицательный id: ни сессии SKILLTRAINER, ни снимка агента
+REFERRAL_WORDS = ['пригласи', 'друг', 'реферал', 'ссылка']
+PROGRESS_WORDS = ['прогресс', 'статистика', 'стата']
+COMBINED = re.compile(
+    f"(?P<referral>{'|'.join(REFERRAL_WORDS)})|(?P<progress>{'|'.join(PROGRESS_WORDS)})"
+)
+
+# (состояние, активный режим ИИ, текст, вес)
+MIX = [
+    (BotState.AI_SELECTION, 'sage', "Как мне перестать откладывать важные дела на потом и начать уже сегодня?", 30),
+    (BotState.AI_SELECTION, 'strategist', "Хочу открыть кофейню у метро, с чего начать анализ рынка?", 15),
+    (BotState.AI_SELECTION, 'mediator', "Поссорился с другом из-за денег, как помириться?", 5),
+    (BotState.CALCULATOR, None, "1500 / 600 / 7% / WB / 120 / 6%", 15),
+    (BotState.CALCULATOR, None, "цена 2490 себестоимость 900 комиссия 15 логистика 80", 5),
+    (BotState.MAIN_MENU, None, "🏠 Меню", 8),
+    (BotState.AI_SELECTION, 'sage', "📊 Прогресс", 4),
+    (BotState.MAIN_MENU, None, "Пришли реферальную ссылку", 4),
+    (BotState.MAIN_MENU, None, "какая у меня стата?", 4),
+    (BotState.MAIN_MENU, None, "привет", 6),
+    (BotState.AI_SELECTION, None, "а что дальше делать", 4),
+]
+
+
+def legacy_route(context, user_id, user_text):
+    """
+    Прежний handle_text_message без вызова обработчиков: возвращает имя ветки.
+    Отличие от select_text_route: в калькуляторе текст с ключевым словом («Другое»)
+    уходил в ключевые слова — в смеси таких сообщений нет.
+    """
+    if user_text == "🏠 Меню":
+        return 'route_menu_button'
+    if user_text == "📊 Прогресс":
+        return 'route_progress_button'
+    if user_id in active_skill_sessions:
+        return 'route_skilltrainer'
+    active_agent = main_handler.get_active_agent(context, user_id)
+    if active_agent and hasattr(active_agent, 'handle_input'):
+        return 'route_agent_input'
+    if any(word in user_text.lower() for word in REFERRAL_WORDS):
+        return 'route_referral'
+    if any(word in user_text.lower() for word in PROGRESS_WORDS):
+        return 'route_progress'
+    current_state = context.user_data.get('state', BotState.MAIN_MENU)
+    if current_state == BotState.CALCULATOR:
+        return 'route_calculator'
+    elif context.user_data.get('active_groq_mode'):
+        return 'route_groq_mode'
+    elif current_state in (BotState.AI_SELECTION, BotState.BUSINESS_MENU):
+        return 'route_tool_not_active'
+    return 'route_help'
+
+
+def main():
+    rng = random.Random(11)
+    population = [entry[:3] for entry in MIX]
+    weights = [entry[3] for entry in MIX]
+    messages = []
+    for state, mode, text in rng.choices(population, weights, k=MESSAGES):
+        user_data = {'state': state}
+        if mode:
+            user_data['active_groq_mode'] = mode
+        messages.append((SimpleNamespace(user_data=user_data), text))
+
+    mismatches = [text for context, text in messages
+                  if legacy_route(context, USER_ID, text) != select_text_route(context, USER_ID, text).__name__]
+    print(f"сообщений: {MESSAGES}, расхождений в выборе обработчика: {len(mismatches)}")
+
+    def legacy():
+        for context, text in messages:
+            legacy_route(context, USER_ID, text)
+
+    def routed():
+        for context, text in messages:
+            select_text_route(context, USER_ID, text)
+
+    for title, function in (('цепочка if', legacy), ('таблицы', routed)):
+        elapsed = min(timeit.repeat(function, number=1, repeat=5)) / MESSAGES * 1e6
+        print(f"{title:<12}{elapsed:>8.2f} мкс/сообщение")
+
+    long_text = "Расскажи подробно, как выстроить команду продаж с нуля. " * 40
+    context = SimpleNamespace(user_data={'state': BotState.AI_SELECTION, 'active_groq_mode': 'sage'})
+    print(f"\nдлинное сообщение, {len(long_text)} символов:")
+    for title, function in (('цепочка if', legacy_route), ('таблицы', select_text_route)):
+        elapsed = min(timeit.repeat(lambda: function(context, USER_ID, long_text), number=2000, repeat=5)) / 2000 * 1e6
+        print(f"{title:<22}{elapsed:>8.2f} мкс")
+
+    def any_per_group(text):
+        return (any(word in text.lower() for word in REFERRAL_WORDS)
+                or any(word in text.lower() for word in PROGRESS_WORDS))
+
+    def combined_regex(text):
+        return next(COMBINED.finditer(text.lower()), None)
+
+    print("поиск ключевых слов:")
+    for title, function in (('any() на каждый набор', any_per_group), ('общий regex', combined_regex),
+                            ('KeywordTriggers', keyword_triggers.match)):
+        elapsed = min(timeit.repeat(lambda: function(long_text), number=2000, repeat=5)) / 2000 * 1e6
+        print(f"{title:<22}{elapsed:>8.2f} мкс")
+
+
+if __name__ == '__main__':
+    main()
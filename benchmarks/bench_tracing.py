@@ -0,0 +1,45 @@
+"""
+Бенчмарк накладных расходов трассировки на апдейт: корневой спан и шесть дочерних
+(маршрутизация, обезличивание, кэш, LLM, две отправки) без полезной работы внутри —
+чистая стоимость слоя при выключенном сэмплировании, 1%, 10% и 100%.
+Запуск: python -m benchmarks.bench_tracing
+"""
+import asyncio
+import timeit
+
+from bot.services.tracing import Tracer
+
+UPDATES = 20_000
+SPANS = ('route', 'mask_pii', 'cache', 'llm', 'sendMessage', 'sendMessage')
+
+
+async def untraced_update():
+    for _ in SPANS:
+        pass
+
+
+def measure(update) -> float:
+    """Секунд на UPDATES апдейтов в одном цикле событий"""
+    async def run():
+        for _ in range(UPDATES):
+            await update()
+    return min(timeit.repeat(lambda: asyncio.run(run()), number=1, repeat=3))
+
+
+def main():
+    baseline = measure(untraced_update)
+    for rate in (0.0, 0.01, 0.1, 1.0):
+        tracer = Tracer(sample_rate=rate, slow_ms=1e9)
+
+        async def traced_update():
+            with tracer.trace('update', 'message 1'):
+                for name in SPANS:
+                    with tracer.span(name):
+                        pass
+
+        overhead = (measure(traced_update) - baseline) / UPDATES * 1e6
+        print(f"сэмплирование {rate:>5.0%}: {overhead:6.2f} мкс на апдейт ({len(SPANS)} спанов), "
+              f"трасс записано {tracer.stats['traced']}")
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,87 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from bot.services.pii_engine import pii_engine
+
+# Сколько последних переходов хранить в state_log (и в снимке сессии)
+STATE_LOG_LIMIT = 50
+# Ключи session_data, которые попадают в снимок; остальное (сырой ввод и т.п.) на диск не пишется
+SNAPSHOT_KEYS = (
+    'current_block', 'settings', 'experts', 'plan', 'assumptions', 'artifacts',
+    'state_log', 'completed_blocks', 'active', 'llm_turns', 'confidence',
+)
+# Служебные ключи снимка без пользовательского текста — их строки не маскируются
+_SNAPSHOT_SERVICE_KEYS = ('current_block', 'state_log', 'completed_blocks')
+
+
+def _mask_strings(value):
+    """Прогнать все строки вложенной структуры через маскирование ПДн"""
+    if isinstance(value, str):
+        return pii_engine.mask(value)
+    if isinstance(value, dict):
+        return {key: _mask_strings(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_mask_strings(item) for item in value]
+    return value
+
+
+class SessionData(dict):
+    """
+    Состояние сессии агента с версиями ключей.
+    Версия ключа растёт при каждой записи — по ней кэши (например, гейтов)
+    понимают, что поле изменилось. После изменения вложенного объекта
+    на месте (list.append и т.п.) нужно вызвать touch(key).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._versions: Dict[str, int] = {}
+        self._clock = 0
+
+    def touch(self, key: str):
+        """Отметить ключ изменённым"""
+        self._clock += 1
+        self._versions[key] = self._clock
+
+    def version(self, key: str) -> int:
+        """Текущая версия ключа (0 — не менялся)"""
+        return self._versions.get(key, 0)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.touch(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.touch(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            self.touch(key)
+        return super().pop(key, *default)
+
+
 class BaseAgent(ABC):
     """
     Базовый класс для всех агентов.
     Хранит общее состояние сессии и предоставляет интерфейс.
     """
+    agent_type = 'base'  # ключ типа агента в снимке сессии
+
     def __init__(self, user_id: int, agent_name: str):
         self.user_id = user_id
         self.agent_name = agent_name
         self.created_at = datetime.now()
-        self.session_data: Dict[str, Any] = {
+        self.session_data: SessionData = SessionData({
             'current_block': 'B0',
             'settings': {},
             'experts': [],
@@ -21,7 +91,7 @@ class BaseAgent(ABC):
             'state_log': [],
             'completed_blocks': set(),
             'active': True
-        }
+        })
 
     @abstractmethod
     async def handle_input(self, update, context, user_input: str):
@@ -47,3 +117,51 @@ class BaseAgent(ABC):
             'block': block_id,
             'timestamp': datetime.now().isoformat()
         })
+        del self.session_data['state_log'][:-STATE_LOG_LIMIT]
+        self.session_data.touch('state_log')
+        self.save_snapshot()
+
+    def snapshot_keys(self) -> Tuple[str, ...]:
+        """Ключи session_data для снимка; агенты добавляют свои поля (их строки маскируются)"""
+        return SNAPSHOT_KEYS
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Компактный сериализуемый снимок сессии: только ключи из snapshot_keys,
+        пользовательский текст в них — после маскирования ПДн.
+        """
+        session = {}
+        for key in self.snapshot_keys():
+            if key not in self.session_data:
+                continue
+            value = self.session_data[key]
+            if isinstance(value, set):
+                value = sorted(value)
+            session[key] = value if key in _SNAPSHOT_SERVICE_KEYS else _mask_strings(value)
+        session['state_log'] = session.get('state_log', [])[-STATE_LOG_LIMIT:]
+        return {
+            'agent': self.agent_type,
+            'user_id': self.user_id,
+            'created_at': self.created_at.isoformat(),
+            'session': session,
+        }
+
+    def load_snapshot(self, snapshot: Dict[str, Any]):
+        """Восстановить состояние сессии из снимка"""
+        session = dict(snapshot.get('session', {}))
+        session['completed_blocks'] = set(session.get('completed_blocks', []))
+        self.session_data.update(session)
+        if snapshot.get('created_at'):
+            self.created_at = datetime.fromisoformat(snapshot['created_at'])
+
+    def save_snapshot(self):
+        """Сохранить снимок сессии (вызывается после перехода между блоками)"""
+        if not self.session_data.get('active', True):
+            return
+        from bot.services.agent_snapshots import agent_snapshot_store
+        agent_snapshot_store.save(self.user_id, self.snapshot())
+
+    def drop_snapshot(self):
+        """Удалить сохранённый снимок сессии"""
+        from bot.services.agent_snapshots import agent_snapshot_store
+        agent_snapshot_store.delete(self.user_id)
@@ -1,36 +1,145 @@
-import re
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, List, NamedTuple, Tuple
+
+
+def normalize_alias(alias: str) -> str:
+    """Нормализует имя команды: без '/', регистр, ё→е, '-'→'_'"""
+    return alias.lstrip('/').casefold().replace('ё', 'е').replace('-', '_')
+
+
+def parse_no_args(raw: str) -> str:
+    """Команда без аргументов: хвост игнорируется"""
+    return ""
+
+
+def parse_text_arg(raw: str) -> str:
+    """Произвольный текстовый аргумент"""
+    return raw
+
+
+class CommandSpec(NamedTuple):
+    """Скомпилированная запись таблицы команд"""
+    name: str
+    aliases: Tuple[str, ...]
+    description: str
+    arg_type: str
+    requires_arg: bool
+    default_arg: Optional[str]
+
+
+class ParsedCommand(NamedTuple):
+    """Распознанная команда с разобранным аргументом"""
+    spec: CommandSpec
+    args: Any
+    handler: Optional[Callable]
+    error: Optional[str] = None
+
+
+class _TrieNode:
+    __slots__ = ('children', 'spec', 'below')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.spec: Optional[CommandSpec] = None
+        self.below: set = set()  # имена команд в поддереве — для однозначных префиксов
+
 
 class CommandProcessor:
     """
     Обрабатывает внутренние команды агента: /s-check, /вернуться и т.д.
+    Таблица команд компилируется один раз из конфига: префиксное дерево
+    по нормализованным алиасам → спецификация → типизированный парсер аргумента
+    → асинхронный обработчик команды.
     """
-    def __init__(self):
+    def __init__(self, commands_config: Optional[List[Dict[str, Any]]] = None,
+                 arg_parsers: Optional[Dict[str, Callable[[str], Any]]] = None):
         self.commands: Dict[str, Callable] = {}
+        self.specs: Dict[str, CommandSpec] = {}
+        self.arg_parsers: Dict[str, Callable[[str], Any]] = {
+            'none': parse_no_args,
+            'text': parse_text_arg,
+        }
+        if arg_parsers:
+            self.arg_parsers.update(arg_parsers)
+        self.default_handler: Optional[Callable] = None
+        self._root = _TrieNode()
+        for cmd in commands_config or []:
+            self.add_command(cmd)
+
+    def add_command(self, cmd: Dict[str, Any]) -> CommandSpec:
+        """Добавляет команду из конфига в таблицу"""
+        name = cmd['name']
+        aliases = tuple(cmd.get('alias') or [f"/{name}"])
+        arg_type = cmd.get('arg', 'text')
+        if arg_type not in self.arg_parsers:
+            raise ValueError(f"Неизвестный тип аргумента команды {name}: {arg_type}")
+        spec = CommandSpec(
+            name=name,
+            aliases=aliases,
+            description=cmd.get('description', ''),
+            arg_type=arg_type,
+            requires_arg=bool(cmd.get('requires_arg', False)),
+            default_arg=cmd.get('default_arg'),
+        )
+        self.specs[name] = spec
+        for alias in aliases:
+            node = self._root
+            node.below.add(name)
+            for char in normalize_alias(alias):
+                node = node.children.setdefault(char, _TrieNode())
+                node.below.add(name)
+            if node.spec and node.spec.name != name:
+                raise ValueError(f"Алиас {alias} уже занят командой {node.spec.name}")
+            node.spec = spec
+        return spec
 
     def register(self, cmd_name: str, handler: Callable):
-        """Регистрирует обработчик команды"""
-        self.commands[cmd_name] = handler
+        """Регистрирует обработчик команды (по имени или алиасу)"""
+        spec = self.resolve(cmd_name)
+        self.commands[spec.name if spec else normalize_alias(cmd_name)] = handler
 
-    def process(self, text: str, session_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def resolve(self, token: str) -> Optional[CommandSpec]:
+        """Ищет команду по алиасу или однозначному префиксу алиаса"""
+        node = self._root
+        for char in normalize_alias(token):
+            node = node.children.get(char)
+            if node is None:
+                return None
+        if node.spec:
+            return node.spec
+        if len(node.below) == 1:
+            return self.specs[next(iter(node.below))]
+        return None
+
+    def process(self, text: str, session_data: Optional[Dict[str, Any]] = None) -> Optional[ParsedCommand]:
         """
-        Если текст — команда, возвращает {'command': ..., 'args': ...}
-        Иначе — None
+        Если текст — известная команда, возвращает ParsedCommand.
+        Иначе — None (для обычного текста — после проверки одного символа).
         """
-        text = text.strip()
-        if not text.startswith('/'):
+        if text[:1] != '/':
             return None
 
-        # Поддержка: /команда <аргумент>
-        match = re.match(r'^/(\S+)(?:\s+(.+))?$', text)
-        if not match:
+        parts = text.split(None, 1)
+        token = parts[0].split('@', 1)[0]  # /cmd@BotName в группах
+        raw_args = parts[1] if len(parts) > 1 else ""
+        spec = self.resolve(token)
+        if spec is None:
             return None
 
-        cmd = match.group(1).lower()
-        args = match.group(2) if match.group(2) else ""
+        handler = self.commands.get(spec.name, self.default_handler)
+        raw_args = raw_args.strip()
+        if not raw_args:
+            if spec.requires_arg and spec.default_arg is None:
+                return ParsedCommand(spec, None, handler, f"Команда /{spec.name} требует аргумент")
+            raw_args = spec.default_arg or ""
+        try:
+            args = self.arg_parsers[spec.arg_type](raw_args)
+        except ValueError as e:
+            return ParsedCommand(spec, None, handler, str(e))
+        return ParsedCommand(spec, args, handler)
 
-        return {
-            'command': cmd,
-            'args': args,
-            'handler': self.commands.get(cmd)
-        }
+    def help_text(self) -> str:
+        """Список команд для подсказки"""
+        return "\n".join(
+            f"{spec.aliases[0]} — {spec.description}" if spec.description else spec.aliases[0]
+            for spec in self.specs.values()
+        )
@@ -0,0 +1,206 @@
+import re
+import json
+import math
+from datetime import date
+from typing import Dict, Any, Iterable, Tuple, Optional
+
+# Маркер структурированного хвоста в ответе LLM
+FIELDS_MARKER = "[FIELDS]"
+
+# Уверенность для локально извлечённых значений
+LOCAL_CONFIDENCE = 0.9
+GUESS_CONFIDENCE = 0.5
+
+_MONTHS = {
+    'январ': 1, 'феврал': 2, 'март': 3, 'апрел': 4, 'ма': 5, 'июн': 6,
+    'июл': 7, 'август': 8, 'сентябр': 9, 'октябр': 10, 'ноябр': 11, 'декабр': 12
+}
+
+_DATE_NUMERIC = re.compile(r'\b(\d{1,2})[./](\d{1,2})[./](\d{4}|\d{2})\b')
+_DATE_ISO = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+_DATE_WORDS = re.compile(
+    r'\b(\d{1,2})\s+(январ|феврал|март|апрел|ма[йя]|июн|июл|август|сентябр|октябр|ноябр|декабр)[а-я]*(?:\s+(\d{4}))?',
+    re.IGNORECASE
+)
+_DATE_RELATIVE = re.compile(
+    r'\b(через|за)\s+(\d{1,3})\s+(дн[а-я]*|недел[а-я]*|месяц[а-я]*|год[а-я]*|лет)\b'
+    r'|\bдо\s+конца\s+(недели|месяца|квартала|года)\b',
+    re.IGNORECASE
+)
+_NORTH_STAR = re.compile(
+    r'\b(?:north[\s-]*star(?:\s+metric)?|nsm|главн\w*\s+метрик\w*)\b\s*[:—–-]?\s*([^\n,.;]{2,60})',
+    re.IGNORECASE
+)
+_LEAD_METRICS = re.compile(
+    r'(?:lead[\s-]*(?:metrics|метрик\w*)|опережающ\w*\s+метрик\w*)\s*[:—–-]?\s*([^\n.;]{2,120})',
+    re.IGNORECASE
+)
+
+# Словарь метрик: корень → каноническое название
+_METRIC_WORDS = {
+    'ltv': 'LTV', 'cac': 'CAC', 'arpu': 'ARPU', 'mau': 'MAU', 'dau': 'DAU',
+    'gmv': 'GMV', 'nps': 'NPS', 'roi': 'ROI', 'romi': 'ROMI', 'mrr': 'MRR',
+    'конверси': 'конверсия', 'выручк': 'выручка', 'удержани': 'удержание',
+    'retention': 'удержание', 'отток': 'отток', 'churn': 'отток',
+    'средн чек': 'средний чек', 'заявк': 'заявки',
+}
+_METRIC_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(word).replace(r'\ ', r'\w*\s+') for word in _METRIC_WORDS) + r')\w*',
+    re.IGNORECASE
+)
+
+
+def extract_local_fields(text: str, wanted: Iterable[str]) -> Dict[str, Tuple[Any, float]]:
+    """
+    Дешёвое локальное извлечение полей гейта (даты, метрики) без LLM.
+    Возвращает {поле: (значение, уверенность)} только для запрошенных полей.
+    """
+    wanted = set(wanted)
+    found: Dict[str, Tuple[Any, float]] = {}
+    if not text:
+        return found
+
+    if 'deadline' in wanted:
+        deadline = _extract_deadline(text)
+        if deadline:
+            found['deadline'] = (deadline, LOCAL_CONFIDENCE)
+
+    north_star = _NORTH_STAR.search(text)
+    if 'north_star_metric' in wanted and north_star:
+        found['north_star_metric'] = (north_star.group(1).strip(), LOCAL_CONFIDENCE)
+
+    lead = _LEAD_METRICS.search(text)
+    if 'lead_metrics' in wanted and lead:
+        items = [item.strip() for item in re.split(r',|\bи\b', lead.group(1)) if item.strip()]
+        if items:
+            found['lead_metrics'] = (items, LOCAL_CONFIDENCE)
+
+    # Без явных подписей — догадка по словарю метрик (низкая уверенность)
+    if not north_star and not lead and wanted & {'north_star_metric', 'lead_metrics'}:
+        metrics = []
+        for match in _METRIC_RE.finditer(text):
+            name = _canonical_metric(match.group(1))
+            if name not in metrics:
+                metrics.append(name)
+        if metrics and 'north_star_metric' in wanted:
+            found['north_star_metric'] = (metrics[0], GUESS_CONFIDENCE)
+        if len(metrics) > 1 and 'lead_metrics' in wanted:
+            found['lead_metrics'] = (metrics[1:], GUESS_CONFIDENCE)
+
+    return found
+
+
+def _canonical_metric(word: str) -> str:
+    word = ' '.join(word.lower().split())
+    for root, name in _METRIC_WORDS.items():
+        if word.startswith(root.split()[0]) and (' ' not in root or ' ' in word):
+            return name
+    return word
+
+
+def _valid_date(year: int, month: int, day: int) -> Optional[str]:
+    """ISO-дата, если такой день существует (45/19/2025 и 31.02 — нет)"""
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def _extract_deadline(text: str) -> Optional[str]:
+    """Дата в формате ISO или относительный срок как в тексте"""
+    for match in _DATE_ISO.finditer(text):
+        deadline = _valid_date(*(int(part) for part in match.groups()))
+        if deadline:
+            return deadline
+    for match in _DATE_NUMERIC.finditer(text):
+        day, month, year = (int(part) for part in match.groups())
+        deadline = _valid_date(year + 2000 if year < 100 else year, month, day)
+        if deadline:
+            return deadline
+    for match in _DATE_WORDS.finditer(text):
+        day = int(match.group(1))
+        name = match.group(2).lower()
+        month = _MONTHS.get(name) or _MONTHS[name[:2]]
+        if match.group(3):
+            deadline = _valid_date(int(match.group(3)), month, day)
+            if deadline:
+                return deadline
+        elif _valid_date(2000, month, day):     # високосный год: 29 февраля без года допустимо
+            return f"{day:02d}.{month:02d}"
+    match = _DATE_RELATIVE.search(text)
+    if match:
+        return ' '.join(match.group(0).lower().split())
+    return None
+
+
+def build_fields_instruction(fields: Iterable[str]) -> str:
+    """Инструкция для LLM вернуть недостающие поля JSON-хвостом в том же ответе"""
+    fields = list(fields)
+    template = ', '.join(f'"{field}": ...' for field in fields)
+    return (
+        f"\n[ПОЛЯ ГЕЙТА: {', '.join(fields)}]\n"
+        f"В самом конце ответа добавь строку {FIELDS_MARKER} и сразу за ней JSON в одну строку: "
+        f'{{{template}, "confidence": {{"<поле>": 0.0–1.0}}}}. '
+        "Включай только поля, которые можно уверенно вывести из диалога; неизвестные не указывай. "
+        "Не упоминай этот блок в тексте ответа.\n"
+    )
+
+
+def parse_fields_tail(response: str, allowed: Iterable[str]) -> Tuple[str, Dict[str, Tuple[Any, float]]]:
+    """
+    Отделяет JSON-хвост от ответа LLM.
+    Возвращает (текст для пользователя, {поле: (значение, уверенность)}).
+    """
+    index = response.rfind(FIELDS_MARKER)
+    if index < 0:
+        return response, {}
+    text = response[:index].rstrip()
+    tail = response[index + len(FIELDS_MARKER):]
+    start, end = tail.find('{'), tail.rfind('}')
+    if start < 0 or end <= start:
+        return text, {}
+    try:
+        payload = json.loads(tail[start:end + 1])
+    except ValueError:
+        return text, {}
+    if not isinstance(payload, dict):
+        return text, {}
+
+    confidence = payload.get('confidence')
+    if not isinstance(confidence, dict):
+        confidence = {}
+    fields: Dict[str, Tuple[Any, float]] = {}
+    for field in allowed:
+        value = payload.get(field)
+        if not value or not isinstance(value, (str, int, float, list)):
+            continue
+        try:
+            score = min(1.0, max(0.0, float(confidence.get(field, 1.0))))
+        except (TypeError, ValueError):
+            score = 1.0
+        fields[field] = (value, score)
+    return text, fields
+
+
+def merge_fields(session_data: Dict[str, Any], fields: Dict[str, Tuple[Any, float]]) -> Tuple[str, ...]:
+    """
+    Записывает извлечённые поля в session_data, не затирая более уверенные значения:
+    при равной уверенности побеждает новое (пользователь поправил дату или метрику).
+    Поля без оценки уверенности заданы явно и не затираются. Возвращает список обновлённых полей.
+    """
+    if not fields:
+        return ()
+    confidence = dict(session_data.get('confidence') or {})
+    updated = []
+    for field, (value, score) in fields.items():
+        current = session_data.get(field)
+        stored = confidence.get(field, math.inf)
+        if current and (stored > score or (current == value and stored == score)):
+            continue
+        session_data[field] = value
+        confidence[field] = score
+        updated.append(field)
+    if updated:
+        # Присваиваем новый словарь, чтобы сработала инвалидация кэша гейтов
+        session_data['confidence'] = confidence
+    return tuple(updated)
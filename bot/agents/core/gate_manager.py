@@ -1,26 +1,115 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional, NamedTuple
+
+
+class GateResult(NamedTuple):
+    """Результат проверки гейта"""
+    block_id: str
+    passed: bool
+    message: str
+    missing: Tuple[str, ...] = ()
+    fallback_action: Optional[str] = None
+
+
+class GatePredicate:
+    """
+    Скомпилированное правило гейта.
+    Пути полей (`plan.steps.owner`) разбираются один раз при загрузке конфига.
+    """
+    __slots__ = ('block_id', 'fields', 'min_confidence', 'fallback_action', 'description', 'keys')
+
+    def __init__(self, block_id: str, config: Dict[str, Any]):
+        self.block_id = block_id
+        self.fields: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (field, tuple(field.split('.'))) for field in config.get('required_fields', [])
+        )
+        min_confidence = config.get('min_confidence')
+        self.min_confidence: Optional[float] = float(min_confidence) if min_confidence is not None else None
+        self.fallback_action: Optional[str] = config.get('fallback_action')
+        self.description: str = config.get('description', '')
+        # Ключи верхнего уровня session_data, от которых зависит результат
+        keys = {path[0] for _, path in self.fields}
+        if self.min_confidence is not None:
+            keys.add('confidence')
+        self.keys: Tuple[str, ...] = tuple(sorted(keys))
+
+    def evaluate(self, session_data: Dict[str, Any]) -> GateResult:
+        """Проверяет гейт по текущему состоянию сессии"""
+        missing = tuple(field for field, path in self.fields if not _is_filled(session_data, path))
+        if missing:
+            return GateResult(self.block_id, False, f"Требуется заполнить: {', '.join(missing)}",
+                              missing, self.fallback_action)
+
+        if self.min_confidence is not None:
+            confidence = session_data.get('confidence') or {}
+            unsure = tuple(
+                field for field, _ in self.fields
+                if confidence.get(field, 1.0) < self.min_confidence
+            )
+            if unsure:
+                return GateResult(self.block_id, False, f"Нужно подтвердить: {', '.join(unsure)}",
+                                  unsure, self.fallback_action)
+
+        return GateResult(self.block_id, True, "✅ Гейт пройден")
+
+
+def _is_filled(value: Any, path: Tuple[str, ...]) -> bool:
+    """Проверяет, что по пути есть непустое значение (списки — поэлементно)"""
+    for i, part in enumerate(path):
+        if isinstance(value, list):
+            return bool(value) and all(_is_filled(item, path[i:]) for item in value)
+        if not isinstance(value, dict):
+            return False
+        value = value.get(part)
+        if not value:
+            return False
+    return True
+
 
 class GateManager:
     """
     Управляет проверкой гейтов (DOD — Definition of Done).
+    Правила компилируются при создании, результаты кэшируются до изменения
+    полей session_data, на которые ссылается гейт.
     """
     def __init__(self, gate_rules: Dict[str, Any]):
         self.gate_rules = gate_rules  # из YAML
+        self.gates: Dict[str, GatePredicate] = {
+            block_id: GatePredicate(block_id, config)
+            for block_id, config in gate_rules.items() if config
+        }
+        self._cache: Dict[str, Tuple[Tuple[int, ...], GateResult]] = {}
+        self._cache_owner: Optional[int] = None
+
+    def evaluate(self, block_id: str, session_data: Dict[str, Any]) -> GateResult:
+        """Возвращает результат гейта блока (из кэша, если поля не менялись)"""
+        gate = self.gates.get(block_id)
+        if gate is None:
+            return GateResult(block_id, True, "Гейт не требуется")
+
+        version = getattr(session_data, 'version', None)
+        if version is None:
+            return gate.evaluate(session_data)
+
+        if self._cache_owner != id(session_data):
+            self._cache.clear()
+            self._cache_owner = id(session_data)
+
+        stamp = tuple(version(key) for key in gate.keys)
+        cached = self._cache.get(block_id)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        result = gate.evaluate(session_data)
+        self._cache[block_id] = (stamp, result)
+        return result
+
+    def evaluate_all(self, session_data: Dict[str, Any]) -> Dict[str, GateResult]:
+        """Проверяет все гейты за один проход"""
+        return {block_id: self.evaluate(block_id, session_data) for block_id in self.gates}
 
     def check_gate(self, block_id: str, session_data: Dict[str, Any]) -> Tuple[bool, str]:
         """
         Проверяет, пройден ли гейт для блока.
         Возвращает (успешно, сообщение).
         """
-        gate_config = self.gate_rules.get(block_id, {})
-        if not gate_config:
-            return True, "Гейт не требуется"
-
-        # Пример простой проверки: все поля из required_fields заполнены
-        required_fields = gate_config.get('required_fields', [])
-        for field in required_fields:
-            if field not in session_data or not session_data[field]:
-                return False, f"Требуется заполнить: {field}"
-
-        # Можно добавить кастомную логику в будущем
-        return True, "✅ Гейт пройден"
+        result = self.evaluate(block_id, session_data)
+        return result.passed, result.message
@@ -1,7 +1,7 @@
 # bot/agents/core/llm_client.py
 from typing import Optional
-from bot.utils import mask_pii
 from bot.models import ai_cache
+from bot.services.tracing import tracer
 
 class LLMClient:
     def __init__(self, groq_client):
@@ -14,24 +14,26 @@ class LLMClient:
         model: str = "llama-3.1-8b-instant",
         max_tokens: int = 2000
     ) -> Optional[str]:
-        clean_query = mask_pii(user_query)
-
+        """user_query уже обезличен вызывающим (mask_pii_async) — повторно не маскируем"""
         # ✅ ИСПОЛЬЗУЕМ ГЛОБАЛЬНЫЙ КЭШ ИЗ MODELS.PY
-        if cached := ai_cache.get_cached_response("orchestrator", clean_query):
+        with tracer.span('cache'):
+            cached = ai_cache.get_cached_response("orchestrator", user_query)
+        if cached:
             return cached
 
         try:
-            response = self.groq_client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": clean_query}
-                ],
-                model=model,
-                max_tokens=max_tokens,
-                temperature=0.7
-            )
+            with tracer.span('llm'):
+                response = self.groq_client.chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_query}
+                    ],
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=0.7
+                )
             result = response.choices[0].message.content
-            ai_cache.cache_response("orchestrator", clean_query, result)
+            ai_cache.cache_response("orchestrator", user_query, result)
             return result
         except Exception as e:
             print(f"LLMClient error: {e}")
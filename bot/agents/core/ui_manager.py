@@ -1,15 +1,20 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-def generate_hud(agent_name: str, session_data: Dict[str, Any]) -> str:
+def generate_hud(agent_name: str, session_data: Dict[str, Any], gates: Optional[Dict[str, Any]] = None) -> str:
     """
     Генерирует HUD (Heads-Up Display) для агента.
-    Пример: [█████▁▁▁▁▁] 50% | Блок: B1.b | Эксперты: 2
+    Пример: [█████▁▁▁▁▁] 50% | Блок: B1.b | Эксперты: 2 | Гейты: 1/6
+    gates — результат GateManager.evaluate_all (необязательно).
     """
     current = session_data.get('current_block', 'B0')
     experts = len(session_data.get('experts', []))
     progress = _estimate_progress(current)
     bar = _make_progress_bar(progress)
-    return f"{bar} {progress}% | Блок: {current} | Эксперты: {experts}"
+    hud = f"{bar} {progress}% | Блок: {current} | Эксперты: {experts}"
+    if gates:
+        passed = sum(1 for result in gates.values() if result.passed)
+        hud += f" | Гейты: {passed}/{len(gates)}"
+    return hud
 
 def _estimate_progress(block_id: str) -> int:
     """Простая эвристика прогресса по ID блока"""
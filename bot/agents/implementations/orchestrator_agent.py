@@ -1,17 +1,30 @@
 # bot/agents/implementations/orchestrator_agent.py
 import os
-from typing import Dict, Any
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from typing import Dict, Any, Optional
+from telegram import Update
 from telegram.ext import ContextTypes
-from ..core.agent_base import BaseAgent
+from ..core.agent_base import BaseAgent, SNAPSHOT_KEYS
 from ..core.state_machine import StateMachine
 from ..core.gate_manager import GateManager
 from ..core.ui_manager import generate_hud
-from ..core.command_processor import CommandProcessor
+from ..core.command_processor import CommandProcessor, ParsedCommand
 from ..core.llm_client import LLMClient
+from ..core.field_extractor import (
+    extract_local_fields, build_fields_instruction, parse_fields_tail, merge_fields
+)
+from bot.config import logger
+from bot.utils import mask_pii_async
+from bot.services.ui_registry import ui
+
+# На сколько переходов вперёд искать ближайший гейт для заполнения полей
+GATE_LOOKAHEAD = 3
+# Ввод пользователя, нужный после восстановления (контекст B1.a); в снимке — замаскированный
+SNAPSHOT_TEXT_KEYS = ('raw_description', 'refinements')
 
 
 class OrchestratorAgent(BaseAgent):
+    agent_type = 'orchestrator'
+
     def __init__(self, user_id: int, groq_client):
         super().__init__(user_id, "Оркестратор")
         config_path = os.path.join(os.path.dirname(__file__), '..', 'configs', 'orchestrator.yaml')
@@ -20,21 +33,36 @@ class OrchestratorAgent(BaseAgent):
         with open(prompt_path, 'r', encoding='utf-8') as f:
             self.system_prompt = f.read()
         self.gate_manager = GateManager(self.state_machine.config.get('gates', {}))
-        self.command_processor = CommandProcessor()
+        self._known_blocks = self._collect_blocks(self.state_machine.blocks)
+        self.command_processor = CommandProcessor(
+            self.state_machine.config.get('commands', []),
+            arg_parsers={'block': self._parse_block_arg}
+        )
         self.llm_client = LLMClient(groq_client)
         self._register_commands()
         self.session_data['settings'] = self.state_machine.config.get('default_settings', {})
 
+    def snapshot_keys(self):
+        """Базовые ключи, текст описания и поля гейтов — без них гейты после восстановления не пройдут"""
+        gate_keys = {key for gate in self.gate_manager.gates.values() for key in gate.keys}
+        return SNAPSHOT_KEYS + SNAPSHOT_TEXT_KEYS + tuple(sorted(gate_keys - set(SNAPSHOT_KEYS)))
+
     def _register_commands(self):
-        commands = self.state_machine.config.get('commands', [])
-        for cmd in commands:
-            name = cmd['name']
-            aliases = cmd.get('alias', [])
-            for alias in aliases:
-                self.command_processor.register(alias.lstrip('/'), self._handle_command)
+        self.command_processor.register('s-check', self._cmd_s_check)
+        self.command_processor.register('вернуться', self._cmd_return)
+        self.command_processor.default_handler = self._cmd_default
+
+    def _parse_block_arg(self, raw: str) -> str:
+        """Аргумент-блок: «b1.a» → «B1.a», неизвестные блоки отклоняются"""
+        block_id = raw.strip().split()[0] if raw.strip() else ''
+        if block_id and block_id[0] in 'bBtT':
+            block_id = block_id[0].upper() + block_id[1:]
+        if block_id not in self._known_blocks:
+            raise ValueError(f"Неизвестный блок: {raw.strip()}")
+        return block_id
 
     async def start_session(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        self.session_data['current_block'] = 'B0'
+        self.set_current_block('B0')
         message = (
             "👋 Я — Оркестратор.\n"
             "Помогу вам превратить идею в измеримый результат с участием коллегии экспертов.\n\n"
@@ -50,41 +78,61 @@ class OrchestratorAgent(BaseAgent):
             await context.bot.send_message(chat_id=chat_id, text=message)
 
         # 🔥 СРАЗУ ПОКАЗЫВАЕМ КНОПКУ ПОСЛЕ B0
-        keyboard = [[InlineKeyboardButton("➡️ Перейти к уточнениям (B1.a)", callback_data="orch_action:go_to_B1a")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.effective_message.reply_text("Что дальше?", reply_markup=reply_markup)
+        await update.effective_message.reply_text("Что дальше?", reply_markup=ui.markup('orch_after_b0'))
 
     async def handle_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_input: str):
+        # 1. Обработка команд (обычный текст отсекается по первому символу)
+        if user_input[:1] == '/':
+            await self.run_command(update, context, user_input)
+            return
+
         current_block = self.session_data['current_block']
 
-        # 1. Сохраняем ввод
+        # 2. Обезличиваем один раз: в сессию, промт и LLM идёт только маскированный текст
+        masked_input = await mask_pii_async(user_input)
         if current_block == 'B0':
-            self.session_data['raw_description'] = user_input
+            self.session_data['raw_description'] = masked_input
         elif current_block == 'B1.a':
-            self.session_data['refinements'] = user_input
-
-        # 2. Обработка команд
-        cmd_info = self.command_processor.process(user_input, self.session_data)
-        if cmd_info:
-            handler = cmd_info['handler']
-            if handler:
-                await handler(update, context, cmd_info)
-            return
+            self.session_data['refinements'] = masked_input
 
-        # 3. Вызов LLM
+        # 3. Поля ближайшего гейта: сначала дешёвое локальное извлечение
+        # (по исходному тексту — маска телефона съела бы даты вида 2025-03-15; наружу он не уходит)
+        gate_block = self._pending_gate_block(current_block)
+        wanted = ()
+        if gate_block:
+            gate = self.gate_manager.gates[gate_block]
+            fields = [field for field, path in gate.fields if len(path) == 1]
+            merge_fields(self.session_data, extract_local_fields(user_input, fields))
+            result = self.gate_manager.evaluate(gate_block, self.session_data)
+            wanted = tuple(field for field in result.missing if field in fields)
+
+        # 4. Вызов LLM
         system_prompt = self._build_dynamic_prompt(current_block)
         # 🔥 Добавляем контекст из session_data, если есть
         if current_block == 'B1.a':
             raw_desc = self.session_data.get('raw_description', 'не указано')
             system_prompt += f"\n\n[ВВОД ПОЛЬЗОВАТЕЛЯ В B0: {raw_desc}]"
+        # Недостающие поля LLM возвращает JSON-хвостом в том же ответе
+        if wanted:
+            system_prompt += build_fields_instruction(wanted)
 
-        response = await self.llm_client.call_llm(system_prompt, user_input)
+        response = await self.llm_client.call_llm(system_prompt, masked_input)
         if not response:
             await update.message.reply_text("❌ Не удалось получить ответ. Попробуйте позже.")
             return
+        self.session_data['llm_turns'] = self.session_data.get('llm_turns', 0) + 1
+        if wanted:
+            response, extracted = parse_fields_tail(response, wanted)
+            merge_fields(self.session_data, extracted)
+            if self.gate_manager.evaluate(gate_block, self.session_data).passed:
+                logger.info(
+                    f"Orchestrator user {self.user_id}: гейт {gate_block} заполнен "
+                    f"за {self.session_data['llm_turns']} LLM-вызовов"
+                )
 
-        # 4. Отправка ответа
-        hud = generate_hud(self.agent_name, self.session_data)
+        # 5. Отправка ответа
+        gates = self.gate_manager.evaluate_all(self.session_data)
+        hud = generate_hud(self.agent_name, self.session_data, gates)
         full_response = f"{hud}\n\n{response}"
         from bot.utils import send_long_message
         await send_long_message(
@@ -107,22 +155,67 @@ class OrchestratorAgent(BaseAgent):
         prompt += f"[НАСТРОЙКИ: mode={settings.get('mode', 'coach')}, risk_appetite={settings.get('risk_appetite', 'medium')}]\n"
         return prompt
 
+    def _pending_gate_block(self, block_id: str) -> Optional[str]:
+        """Ближайший (в пределах GATE_LOOKAHEAD переходов) блок с непройденным гейтом"""
+        frontier = [block_id]
+        seen = set()
+        for _ in range(GATE_LOOKAHEAD + 1):
+            next_frontier = []
+            for block in frontier:
+                if block in seen:
+                    continue
+                seen.add(block)
+                if block in self.gate_manager.gates:
+                    if not self.gate_manager.evaluate(block, self.session_data).passed:
+                        return block
+                    continue
+                next_frontier.extend(self.state_machine.get_next_blocks(block))
+            frontier = next_frontier
+        return None
+
     async def _send_contextual_buttons(self, update: Update, context: ContextTypes.DEFAULT_TYPE, block_id: str):
         """Заглушка — кнопки отправляются в start_session и через main_handler"""
         pass
 
-    async def _handle_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, cmd_info: Dict[str, Any]):
-        command = cmd_info['command']
-        args = cmd_info.get('args', '')
-        if command == 's-check':
-            await update.message.reply_text("🔍 Запускаю S-CHECK (Self-Critique)...")
-        elif command == 'вернуться':
-            target_block = args.strip() if args else 'B0'
-            self.session_data['current_block'] = target_block
-            await update.message.reply_text(f"↩️ Возврат к блоку: {target_block}")
-        else:
-            await update.message.reply_text(f"🛠️ Команда `{command}` получена.")
+    async def run_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> bool:
+        """Выполняет команду из текста или кнопки orch_cmd:. Возвращает False, если команда неизвестна"""
+        if text[:1] != '/':
+            text = '/' + text
+        parsed = self.command_processor.process(text, self.session_data)
+        message = update.effective_message
+        if parsed is None:
+            await message.reply_text(
+                "❓ Неизвестная команда. Доступные команды:\n" + self.command_processor.help_text()
+            )
+            return False
+        if parsed.error:
+            await message.reply_text(f"⚠️ {parsed.error}")
+            return True
+        if parsed.handler:
+            await parsed.handler(update, context, parsed)
+        return True
+
+    async def _cmd_s_check(self, update: Update, context: ContextTypes.DEFAULT_TYPE, parsed: ParsedCommand):
+        await update.effective_message.reply_text("🔍 Запускаю S-CHECK (Self-Critique)...")
+
+    async def _cmd_return(self, update: Update, context: ContextTypes.DEFAULT_TYPE, parsed: ParsedCommand):
+        self.set_current_block(parsed.args)
+        await update.effective_message.reply_text(f"↩️ Возврат к блоку: {parsed.args}")
+
+    async def _cmd_default(self, update: Update, context: ContextTypes.DEFAULT_TYPE, parsed: ParsedCommand):
+        await update.effective_message.reply_text(f"🛠️ Команда `{parsed.spec.name}` получена.")
+
+    @staticmethod
+    def _collect_blocks(blocks: Dict[str, Any]) -> set:
+        """ID всех блоков конфига, включая вложенные subblocks"""
+        found = set()
+        for block_id, config in blocks.items():
+            found.add(str(block_id))
+            if isinstance(config, dict) and config.get('subblocks'):
+                found |= OrchestratorAgent._collect_blocks(config['subblocks'])
+        return found
 
     async def finish_session(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         self.session_data['active'] = False
+        self.drop_snapshot()
         await update.message.reply_text("✅ Сессия «Оркестратора» завершена.")
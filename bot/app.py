@@ -4,6 +4,7 @@
 import asyncio
 import os
 
+from telegram import Update
 from telegram.ext import Application, CallbackQueryHandler
 from groq import Groq
 
@@ -11,14 +12,15 @@ from .config import (
     TELEGRAM_TOKEN, GROQ_API_KEY, PORT, WEBHOOK_URL,
     logger, BOT_VERSION
 )
-from .handlers.commands import (
-    setup_commands,
-    show_main_menu  # ← глобальный обработчик главного меню
-)
+from .handlers.commands import setup_commands
 from .handlers.calculator import setup_calculator_handlers
 from .handlers.skilltrainer import setup_skilltrainer_handlers
 from .handlers.ai_handlers import setup_ai_handlers
 from .handlers.main_handler import setup_main_handler
+from .services.callback_router import callback_router
+from .services.outbound import OutboundScheduler
+from .services.subscriptions import subscription_service
+from .services.tracing import tracer, update_label
 from .web.server import setup_web_server
 
 
@@ -34,6 +36,13 @@ else:
     logger.warning("GROQ_API_KEY не установлен. Функции AI будут недоступны.")
 
 
+class TracedApplication(Application):
+    """Корневой спан трассировки на апдейт из polling (webhook открывает его сам, до разбора JSON)"""
+    async def process_update(self, update: object) -> None:
+        with tracer.trace('update', update_label(update) if isinstance(update, Update) else ''):
+            await super().process_update(update)
+
+
 def create_application() -> Application:
     """
     Создание и настройка приложения Telegram бота
@@ -42,8 +51,11 @@ def create_application() -> Application:
         logger.error("❌ TELEGRAM_TOKEN не установлен. Запуск невозможен.")
         raise ValueError("TELEGRAM_TOKEN не установлен")
     
-    # Создаём приложение
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    # Создаём приложение; все исходящие запросы идут через планировщик с учётом flood control
+    application = (
+        Application.builder().token(TELEGRAM_TOKEN).rate_limiter(OutboundScheduler())
+        .application_class(TracedApplication).build()
+    )
     
     # ✅ Сохраняем groq_client в bot_data — доступен глобально
     application.bot_data['groq_client'] = groq_client
@@ -51,14 +63,14 @@ def create_application() -> Application:
     # Основные команды
     setup_commands(application)
 
-    # 🔹 ГЛОБАЛЬНАЯ РЕГИСТРАЦИЯ: кнопка "В главное меню" работает везде
-    application.add_handler(CallbackQueryHandler(show_main_menu, pattern='^main_menu$'))
-
     # Остальные обработчики
     setup_calculator_handlers(application)
     setup_skilltrainer_handlers(application)
     setup_ai_handlers(application)  # ← без groq_client
     setup_main_handler(application)
+
+    # Все inline-кнопки — через один маршрутизатор: маршруты добавлены в setup_* выше
+    application.add_handler(CallbackQueryHandler(callback_router.dispatch))
     
     logger.info(f"{BOT_VERSION} - Приложение создано и настроено")
     return application
@@ -72,6 +84,7 @@ async def run_polling():
     await application.initialize()
     await application.start()
     await application.updater.start_polling()
+    subscription_service.start(application)
     logger.info(f"{BOT_VERSION} - Запуск в режиме polling...")
     await asyncio.Future()
 
@@ -18,6 +18,12 @@ TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 PORT = int(os.environ.get("PORT", 10000))  # Render default
 WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
+AGENT_SNAPSHOT_DIR = os.environ.get("AGENT_SNAPSHOT_DIR", "var/agent_snapshots")  # снимки сессий агентов
+TASK_BANK_PATH = os.environ.get("TASK_BANK_PATH", "var/task_bank.json")  # банк заданий SKILLTRAINER
+SUBSCRIPTIONS_PATH = os.environ.get("SUBSCRIPTIONS_PATH", "var/subscriptions.json")  # подписки и курсоры рассылок
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0))  # доля трассируемых апдейтов, 0 — выключено
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", 1500))  # трассы дольше — в список медленных
+ADMIN_USER_IDS = {int(user_id) for user_id in os.environ.get("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
 
 # ==============================================================================
 # КОНСТАНТЫ ВЕРСИЙ
@@ -46,6 +52,27 @@ BENCHMARKS = {
     'чистая_маржа': {'низкая': 20, 'средняя': 30, 'высокая': 40}
 }
 
+# Правила рекомендаций калькулятора: (метрика, бенчмарк, ключ «выше», текст, ключ «ниже», текст).
+# Общие для одиночного и пакетного расчёта.
+RECOMMENDATION_RULES = [
+    ('наценка_%', 'наценка',
+     'высокая', "🚀 Отличная наценка! Товар имеет высокий потенциал прибыли",
+     'низкая', "📈 Низкая наценка. Рассмотрите повышение цены или поиск поставщика с лучшими условиями"),
+    ('комиссия_%', 'комиссия_mp',
+     'высокая', "📊 Комиссия выше среднего. Рассмотрите маркетплейсы с меньшей комиссией",
+     'низкая', "💰 Низкая комиссия - хорошие условия!"),
+    ('логистика_%', 'логистика',
+     'высокая', "🚚 Логистика дороговата. Ищите способы оптимизации доставки или упаковки",
+     'низкая', "📦 Логистика эффективна!"),
+    ('acos_%', 'acos',
+     'высокий', "📢 Высокий ACOS. Оптимизируйте рекламные кампании или когорты",
+     'низкий', "🎯 Эффективная реклама!"),
+    ('чистая_маржа_%', 'чистая_маржа',
+     'высокая', "✅ Отличная рентабельность! Товар готов к масштабированию",
+     'низкая', "💸 Низкая рентабельность. Рассмотрите повышение цены или снижение закупочной стоимости"),
+]
+RECOMMENDATION_OK = "📊 Показатели в норме. Продолжайте в том же духе!"
+
 # ==============================================================================
 # 2. СИСТЕМНЫЕ ПРОМТЫ
 # ==============================================================================
@@ -116,6 +143,7 @@ TRAINING_MODE_DESCRIPTIONS = {
     "quiz": "❓ **QUIZ (Тест)**: Проверка знаний через вопросы и сценарии. Для закрепления теории и быстрой проверки понимания."
 }
 
+# id гейтов совпадают с models.SkillGate: порядок членов задаёт бит в маске сессии
 SKILLTRAINER_GATES = {
     "interview_complete": {
         "id": "interview_complete",
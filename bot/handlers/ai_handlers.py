@@ -1,31 +1,28 @@
 """Обработчики AI-инструментов (Мудрец, Стратег, SKILLTRAINER и др.)"""
 import re
 from typing import Optional
-from datetime import datetime
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, Application, CallbackQueryHandler
+from telegram import Update, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, Application
 from telegram.constants import ParseMode
 from ..config import (
     logger, SYSTEM_PROMPTS, DEMO_SCENARIOS, BOT_VERSION
 )
 from ..models import (
     user_stats_cache, rate_limiter, ai_cache, BotState,
-    user_conversation_history
+    user_conversation_history, ConversationHistory, HISTORY_TTL_SECONDS
 )
-from ..utils import send_long_message, split_message_efficiently, sanitize_user_input, mask_pii
+from ..utils import send_long_message, split_message_efficiently, sanitize_user_input, mask_pii_async
+from ..services.agent_snapshots import agent_snapshot_store
+from ..services.ui_registry import ui
+from ..services.callback_router import callback_router
+from ..services.tracing import tracer
 from .commands import update_usage_stats
 # ==============================================================================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ==============================================================================
 def get_ai_keyboard(prompt_key: str) -> InlineKeyboardMarkup:
-    """Создание клавиатуры для AI инструмента"""
-    keyboard = [
-        [InlineKeyboardButton("💡 Демо-сценарий (что он умеет?)", callback_data=f'demo_{prompt_key}')],
-        [InlineKeyboardButton("✅ Активировать", callback_data=f'activate_{prompt_key}')],
-        [InlineKeyboardButton("📊 Мой прогресс", callback_data='show_progress')],
-        [InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    """Клавиатура AI инструмента (из реестра меню, одна на ключ)"""
+    return ui.markup('ai_tool', prompt_key=prompt_key, display_name=prompt_key.replace('_', ' ').title())
 # ==============================================================================
 # ОБРАБОТЧИК ВЫБОРА ИНСТРУМЕНТА
 # ==============================================================================
@@ -42,44 +39,35 @@ async def ai_selection_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         parts = callback_data.split('_', 2)
         prompt_key = parts[1] if len(parts) > 1 else "unknown"
     context.user_data['current_ai_key'] = prompt_key
-    reply_markup = get_ai_keyboard(prompt_key)
-    # Формируем название: "growth_expert" → "Growth Expert"
-    display_name = prompt_key.replace('_', ' ').title()
-    await query.edit_message_text(
-        f"Вы выбрали **{display_name}**.\n"
-        f"Чтобы начать, изучите демо-сценарий или активируйте доступ.",
-        reply_markup=reply_markup,
-        parse_mode=ParseMode.MARKDOWN
-    )
+    # Название: "growth_expert" → "Growth Expert"
+    menu = ui.menu('ai_tool', prompt_key=prompt_key, display_name=prompt_key.replace('_', ' ').title())
+    await query.edit_message_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
     context.user_data['state'] = BotState.AI_SELECTION
     context.user_data['active_groq_mode'] = None
     return BotState.AI_SELECTION
 # ==============================================================================
 # ДЕМО-СЦЕНАРИЙ
 # ==============================================================================
-async def show_demo_scenario(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def show_demo_scenario(update: Update, context: ContextTypes.DEFAULT_TYPE, demo_key: str):
+    """demo_<ключ>: demo_growth_expert → growth_expert"""
     query = update.callback_query
     await query.answer()
-    # Извлекаем ключ: demo_growth_expert → growth_expert
-    demo_key = query.data.split('_', 1)[1]
     # Получаем описание из DEMO_SCENARIOS
     text_content = DEMO_SCENARIOS.get(demo_key, "⚠️ Описание демо-сценария не найдено.")
-    # Кнопка "Назад в главное меню"
-    keyboard = [[InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(text_content, reply_markup=reply_markup, parse_mode=None)
+    await query.edit_message_text(text_content, reply_markup=ui.markup('back_to_main'), parse_mode=None)
 # ==============================================================================
 # АКТИВАЦИЯ ДОСТУПА
 # ==============================================================================
-async def activate_access(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def activate_access(update: Update, context: ContextTypes.DEFAULT_TYPE, prompt_key: str):
+    """activate_<ключ>"""
     query = update.callback_query
     await query.answer()
     
     # 🔥 ОСНОВНОЕ ИСПРАВЛЕНИЕ: ОЧИСТКА АКТИВНОГО АГЕНТА ПРИ ЛЮБОЙ АКТИВАЦИИ
     if 'active_agent' in context.user_data:
         del context.user_data['active_agent']
+    agent_snapshot_store.delete(query.from_user.id)
     
-    prompt_key = query.data.split('_', 1)[1]
     # Специальная обработка для skilltrainer
     if prompt_key == 'skilltrainer':
         from .skilltrainer import start_skilltrainer_session
@@ -122,40 +110,32 @@ async def handle_groq_request(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     user_id = update.message.from_user.id
     user_query = sanitize_user_input(update.message.text)
-    user_query = mask_pii(user_query)  # ← 🔒 ОБЕЗЛИЧИВАНИЕ ПДн
+    user_query = await mask_pii_async(user_query)  # ← 🔒 ОБЕЗЛИЧИВАНИЕ ПДн
     # Проверка и очистка устаревшей истории (TTL = 1 час)
-    if user_id in user_conversation_history:
-        last_activity = user_conversation_history[user_id]['last_activity']
-        if (datetime.now() - last_activity).total_seconds() > 3600:
-            del user_conversation_history[user_id]
-    # Формируем историю
-    if user_id not in user_conversation_history:
-        user_conversation_history[user_id] = {
-            'history': [],
-            'last_activity': datetime.now()
-        }
-    history = user_conversation_history[user_id]['history']
+    history = user_conversation_history.get(user_id)
+    if history is None or history.expired(HISTORY_TTL_SECONDS):
+        history = user_conversation_history[user_id] = ConversationHistory()
     system_prompt = SYSTEM_PROMPTS.get(prompt_key, "Ответь кратко и полезно.")
     # Подготавливаем сообщения (макс. 15 шагов)
     messages = [{"role": "system", "content": system_prompt}]
-    messages.extend(history[-14:])  # последние 14, + новый = 15
+    messages.extend(history.messages(14))  # последние 14, + новый = 15
     messages.append({"role": "user", "content": user_query})
     # Отправляем "ожидание"
     await update.message.reply_text("⏳ Обрабатываю ваш запрос...", parse_mode=None)
     try:
         # Генерация ответа
-        chat_completion = groq_client.chat.completions.create(
-            messages=messages,
-            model="llama-3.1-8b-instant",
-            max_tokens=2000,
-            temperature=0.7
-        )
+        with tracer.span('llm'):
+            chat_completion = groq_client.chat.completions.create(
+                messages=messages,
+                model="llama-3.1-8b-instant",
+                max_tokens=2000,
+                temperature=0.7
+            )
         response_text = chat_completion.choices[0].message.content
         # Сохраняем ОБЕЗЛИЧЕННЫЙ запрос и ответ
-        history.append({"role": "user", "content": user_query})
-        history.append({"role": "assistant", "content": response_text})
-        user_conversation_history[user_id]['history'] = history[-15:]  # не более 15
-        user_conversation_history[user_id]['last_activity'] = datetime.now()
+        history.append("user", user_query)
+        history.append("assistant", response_text)  # буфер хранит не более 15
+        history.touch()
         # Отправляем ответ
         await send_long_message(
             update.message.chat.id,
@@ -179,12 +159,12 @@ def setup_ai_handlers(application: Application):
         'ai_daily_phrase_self', 'ai_mind_horoscope_self', 'ai_daily_reflection_self'
     ]
     for pattern in ai_patterns:
-        application.add_handler(CallbackQueryHandler(ai_selection_handler, pattern=f"^{pattern}$"))
+        callback_router.route(pattern, ai_selection_handler)
     # SKILLTRAINER — отдельно, но через ту же логику выбора
-    application.add_handler(CallbackQueryHandler(ai_selection_handler, pattern='^ai_skilltrainer_business$'))
+    callback_router.route('ai_skilltrainer_business', ai_selection_handler)
     # 🔧 Добавляем обработчик для Оркестратора
-    application.add_handler(CallbackQueryHandler(ai_selection_handler, pattern='^ai_orchestrator_prof$'))
-    # Демо и активация
-    application.add_handler(CallbackQueryHandler(show_demo_scenario, pattern=r"^demo_[a-z_]+$"))
-    application.add_handler(CallbackQueryHandler(activate_access, pattern=r"^activate_[a-z_]+$"))
+    callback_router.route('ai_orchestrator_prof', ai_selection_handler)
+    # Демо и активация: хвост callback_data — ключ инструмента
+    callback_router.route('demo_', show_demo_scenario, prefix=True)
+    callback_router.route('activate_', activate_access, prefix=True)
     logger.info("AI обработчики настроены")
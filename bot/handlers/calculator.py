@@ -1,17 +1,68 @@
 """
 Обработчик калькулятора маркетплейса
 """
-from telegram import Update, KeyboardButton, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, Application, MessageHandler, filters, CallbackQueryHandler
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+
+from telegram import (
+    Update, KeyboardButton, ReplyKeyboardMarkup, InlineKeyboardMarkup,
+    InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent
+)
+from telegram.ext import ContextTypes, Application, MessageHandler, filters, InlineQueryHandler
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 
 from ..config import (
-    logger, CALCULATOR_STEPS, BENCHMARKS
+    logger, CALCULATOR_STEPS, BENCHMARKS, RECOMMENDATION_RULES, RECOMMENDATION_OK
 )
-from ..models import BotState
+from ..models import BotState, LRUCache
 from ..utils import get_calculator_data_safe
+from ..services.calculator_input import (
+    CALCULATOR_INPUT_HELP, NEGATIVE_VALUE_ERROR, memo_key, parse_calculator_changes, parse_calculator_input
+)
+from ..services.batch_calculator import BATCH_EXTENSIONS, INPUT_COLUMNS, BatchError, process_batch
+from ..services.price_solver import format_grid, price_points, target_margin_price
+from ..services.fee_tables import fee_tables
+from ..services.risk_simulation import default_ranges, format_simulation, parse_ranges, simulate
+from ..services.scenarios import IncrementalReport, ReportSection, Scenario, ScenarioBook, format_diff
+from ..services.ui_registry import ui
+from ..services.callback_router import callback_router
 from .commands import update_usage_stats
 
+BATCH_MAX_FILE_BYTES = 20 * 1024 * 1024    # лимит скачивания файлов Bot API
+BATCH_SPOOL_BYTES = 4 * 1024 * 1024        # результат крупнее — во временный файл на диске
+BATCH_HELP = (
+    "📦 **Пакетный расчёт:** отправьте CSV или XLSX с колонками "
+    "`sku; себестоимость; цена; комиссия; логистика; acos; налог` (проценты — числами)."
+)
+
+INLINE_CACHE_SECONDS = 300   # Telegram кэширует ответ на одинаковый запрос
+inline_report_memo = LRUCache(max_size=1000)   # нормализованный вход → готовый inline-результат
+COMMISSION_STEP = 2     # с этого шага можно выбрать категорию вместо ввода ставок
+GRID_BUTTONS = {'acos': "📈 Цена × ACOS", 'commission': "📈 Цена × Комиссия"}
+GRID_AXIS_BY_BUTTON = {label: axis for axis, label in GRID_BUTTONS.items()}
+SIMULATION_BUTTON = "🎲 Риск-симуляция"
+SIMULATION_PREFIX = "риск"
+SIMULATION_HELP = (
+    "Свои диапазоны: «риск acos 5-20; логистика 10±2; возвраты 0-5-15» "
+    "(a-b — равномерно, a±b — нормально, a-b-c — треугольное)."
+)
+SCENARIO_COMMAND_RE = re.compile(r'^(сохранить|сравнить)\b\s*(.*)$', re.IGNORECASE)
+SCENARIO_HELP = (
+    "Поменять значение без нового расчёта: «цена 1700» или «acos 12; налог 7» — отчёт выше обновится. "
+    "«сохранить Летняя цена» / «сравнить Летняя цена» — сценарии; «цель 25» — цена для нужной маржи."
+)
+CALCULATOR_WELCOME = (
+    "🛍️ **РАСЧЕТ ЭКОНОМИКИ МАРКЕТПЛЕЙСА**\n"
+    f"{BATCH_HELP}\n\n"
+    f"{CALCULATOR_INPUT_HELP}\n\n"
+    "Или введите данные одного товара по шагам:\n"
+    + CALCULATOR_STEPS[0]
+)
+TARGET_MARGIN_RE = re.compile(r'^(?:цель|маржа)\s*(\d+(?:[.,]\d+)?)\s*%?$', re.IGNORECASE)
 
 # ==============================================================================
 # ФУНКЦИИ КАЛЬКУЛЯТОРА
@@ -62,89 +113,183 @@ def calculate_economy_metrics(data):
 
 def generate_recommendations(metrics):
     recommendations = []
+    for metric, benchmark, high_key, high_text, low_key, low_text in RECOMMENDATION_RULES:
+        if metrics[metric] > BENCHMARKS[benchmark][high_key]:
+            recommendations.append(high_text)
+        elif metrics[metric] < BENCHMARKS[benchmark][low_key]:
+            recommendations.append(low_text)
     
-    if metrics['наценка_%'] > BENCHMARKS['наценка']['высокая']:
-        recommendations.append("🚀 Отличная наценка! Товар имеет высокий потенциал прибыли")
-    elif metrics['наценка_%'] < BENCHMARKS['наценка']['низкая']:
-        recommendations.append("📈 Низкая наценка. Рассмотрите повышение цены или поиск поставщика с лучшими условиями")
-    
-    if metrics['комиссия_%'] > BENCHMARKS['комиссия_mp']['высокая']:
-        recommendations.append("📊 Комиссия выше среднего. Рассмотрите маркетплейсы с меньшей комиссией")
-    elif metrics['комиссия_%'] < BENCHMARKS['комиссия_mp']['низкая']:
-        recommendations.append("💰 Низкая комиссия - хорошие условия!")
-    
-    if metrics['логистика_%'] > BENCHMARKS['логистика']['высокая']:
-        recommendations.append("🚚 Логистика дороговата. Ищите способы оптимизации доставки или упаковки")
-    elif metrics['логистика_%'] < BENCHMARKS['логистика']['низкая']:
-        recommendations.append("📦 Логистика эффективна!")
-    
-    if metrics['acos_%'] > BENCHMARKS['acos']['высокий']:
-        recommendations.append("📢 Высокий ACOS. Оптимизируйте рекламные кампании или когорты")
-    elif metrics['acos_%'] < BENCHMARKS['acos']['низкий']:
-        recommendations.append("🎯 Эффективная реклама!")
-    
-    if metrics['чистая_маржа_%'] > BENCHMARKS['чистая_маржа']['высокая']:
-        recommendations.append("✅ Отличная рентабельность! Товар готов к масштабированию")
-    elif metrics['чистая_маржа_%'] < BENCHMARKS['чистая_маржа']['низкая']:
-        recommendations.append("💸 Низкая рентабельность. Рассмотрите повышение цены или снижение закупочной стоимости")
-    
-    return recommendations if recommendations else ["📊 Показатели в норме. Продолжайте в том же духе!"]
+    return recommendations if recommendations else [RECOMMENDATION_OK]
 
 
-async def calculate_and_show_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    data = [get_calculator_data_safe(context, i) for i in range(6)]
-    metrics = calculate_economy_metrics(data)
-    recommendations = generate_recommendations(metrics)
-    
-    report = f"""📊 **ФИНАНСОВЫЙ АНАЛИЗ ТОВАРА**
-💰 **ВЫРУЧКА И ЗАТРАТЫ:**
+def _render_costs(scenario: Scenario) -> str:
+    metrics = scenario.metrics
+    return f"""💰 **ВЫРУЧКА И ЗАТРАТЫ:**
 • Выручка: {metrics['выручка']:.1f} ₽
 • Себестоимость: {metrics['себестоимость']:.1f} ₽
 • Комиссия MP: {metrics['комиссия']:.1f} ₽ ({metrics['комиссия_%']:.1f}%)
 • Логистика FBS: {metrics['логистика']:.1f} ₽ ({metrics['логистика_%']:.1f}%)
 • Реклама (ACOS): {metrics['реклама']:.1f} ₽ ({metrics['acos_%']:.1f}%)
-• Налог УСН: {metrics['налог']:.1f} ₽ ({metrics['налог_%']:.1f}%)
-🎯 **УРОВНИ ПРИБЫЛИ:**
+• Налог УСН: {metrics['налог']:.1f} ₽ ({metrics['налог_%']:.1f}%)"""
+
+
+def _render_profit(scenario: Scenario) -> str:
+    metrics = scenario.metrics
+    return f"""🎯 **УРОВНИ ПРИБЫЛИ:**
 • CM1 (до рекламы): {metrics['cm1']:.1f} ₽ ({metrics['маржа_cm1_%']:.1f}%)
 • CM2 (после рекламы): {metrics['cm2']:.1f} ₽ ({metrics['маржа_cm2_%']:.1f}%)
-• Чистая прибыль: {metrics['чистая_прибыль']:.1f} ₽ ({metrics['чистая_маржа_%']:.1f}%)
-📈 **КЛЮЧЕВЫЕ МЕТРИКИ:**
+• Чистая прибыль: {metrics['чистая_прибыль']:.1f} ₽ ({metrics['чистая_маржа_%']:.1f}%)"""
+
+
+def _render_key_metrics(scenario: Scenario) -> str:
+    metrics = scenario.metrics
+    return f"""📈 **КЛЮЧЕВЫЕ МЕТРИКИ:**
 • Наценка: {metrics['наценка_%']:.1f}% {'🚀' if metrics['наценка_%'] > 300 else '✅' if metrics['наценка_%'] > 200 else '📊'}
-• Рентабельность: {metrics['чистая_маржа_%']:.1f}% {'✅' if metrics['чистая_маржа_%'] > 30 else '📊'}
-💡 **РЕКОМЕНДАЦИИ:**
-"""
+• Рентабельность: {metrics['чистая_маржа_%']:.1f}% {'✅' if metrics['чистая_маржа_%'] > 30 else '📊'}"""
+
+
+def _render_recommendations(scenario: Scenario) -> str:
+    return "💡 **РЕКОМЕНДАЦИИ:**\n" + "\n".join(f"• {rec}" for rec in generate_recommendations(scenario.metrics))
+
+
+# Секции отчёта и метрики, от которых они зависят: после правки одного входа
+# перерисовываются только затронутые секции
+REPORT_SECTIONS = (
+    ReportSection('header', frozenset(), lambda scenario: "📊 **ФИНАНСОВЫЙ АНАЛИЗ ТОВАРА**"),
+    ReportSection('costs', frozenset({
+        'выручка', 'себестоимость', 'комиссия', 'комиссия_%', 'логистика', 'логистика_%',
+        'реклама', 'acos_%', 'налог', 'налог_%'
+    }), _render_costs),
+    ReportSection('profit', frozenset({
+        'cm1', 'маржа_cm1_%', 'cm2', 'маржа_cm2_%', 'чистая_прибыль', 'чистая_маржа_%'
+    }), _render_profit),
+    ReportSection('key_metrics', frozenset({'наценка_%', 'чистая_маржа_%'}), _render_key_metrics),
+    ReportSection('recommendations', frozenset(rule[0] for rule in RECOMMENDATION_RULES), _render_recommendations),
+    ReportSection('price_points', frozenset(INPUT_COLUMNS),
+                  lambda scenario: "🎯 **ТОЧКИ ЦЕНЫ:**\n" + "\n".join(price_points(scenario.data))),
+)
+
+
+# Reply-клавиатуры калькулятора не зависят от пользователя — собираются при импорте
+RESULT_KEYBOARD = ReplyKeyboardMarkup([
+    [KeyboardButton(GRID_BUTTONS['acos']), KeyboardButton(GRID_BUTTONS['commission'])],
+    [KeyboardButton(SIMULATION_BUTTON)],
+    [KeyboardButton("🔄 Новый расчет")],
+    [KeyboardButton("🔙 Назад")]
+], resize_keyboard=True)
+_CATEGORY_TITLES = [fee_tables.category_titles[category] for category in fee_tables.categories]
+CATEGORY_KEYBOARD = ReplyKeyboardMarkup(
+    [[KeyboardButton(title) for title in _CATEGORY_TITLES[i:i + 2]] for i in range(0, len(_CATEGORY_TITLES), 2)]
+    + [[KeyboardButton("🔙 Назад")]],
+    resize_keyboard=True
+)
+
+
+def format_economy_report(data) -> str:
+    """Отчёт по шести входным значениям (общий для чата и inline-режима)"""
+    return IncrementalReport(REPORT_SECTIONS, Scenario(data)).text
+
+
+def scenario_keyboard() -> InlineKeyboardMarkup:
+    return ui.markup('calc_scenario')
+
+
+def get_scenario_book(context: ContextTypes.DEFAULT_TYPE) -> ScenarioBook:
+    book = context.user_data.get('calculator_scenarios')
+    if book is None:
+        book = context.user_data['calculator_scenarios'] = ScenarioBook()
+    return book
+
+
+async def calculate_and_show_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    data = [get_calculator_data_safe(context, i) for i in range(6)]
+    book = get_scenario_book(context)
+    report = book.start(Scenario(data), REPORT_SECTIONS)
     
-    for rec in recommendations:
-        report += f"• {rec}\n"
+    message = await update.message.reply_text(report.text, reply_markup=scenario_keyboard(), parse_mode=ParseMode.MARKDOWN)
+    book.message = (message.chat_id, message.message_id)
     
-    keyboard = [
-        [KeyboardButton("🔄 Новый расчет")],
-        [KeyboardButton("🔙 Назад")]
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    await update.message.reply_text(report, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+    await update.message.reply_text(SCENARIO_HELP, reply_markup=RESULT_KEYBOARD)
     await update_usage_stats(update.message.from_user.id, 'calculator')
 
 
+async def update_scenario(update: Update, context: ContextTypes.DEFAULT_TYPE, changes) -> None:
+    """Правка одного или нескольких входов: пересчёт зависимых метрик и редактирование отчёта на месте"""
+    book = get_scenario_book(context)
+    profit_before = book.current.values['чистая_прибыль']
+    updated = book.apply(changes)
+    context.user_data['calculator_data'] = dict(enumerate(book.current.data))
+    if not updated:
+        await update.message.reply_text("Значения не изменились.")
+        return
+    try:
+        chat_id, message_id = book.message
+        await context.bot.edit_message_text(
+            book.report.text, chat_id=chat_id, message_id=message_id,
+            reply_markup=scenario_keyboard(), parse_mode=ParseMode.MARKDOWN
+        )
+    except (BadRequest, TypeError) as e:
+        # Сообщение удалено, слишком старое или его нет — присылаем отчёт заново
+        logger.info(f"Отчёт калькулятора не отредактирован: {e}")
+        message = await update.message.reply_text(book.report.text, reply_markup=scenario_keyboard(), parse_mode=ParseMode.MARKDOWN)
+        book.message = (message.chat_id, message.message_id)
+    profit = book.current.values['чистая_прибыль']
+    await update.message.reply_text(f"✏️ Отчёт обновлён: чистая прибыль {profit_before:.1f} → {profit:.1f} ₽")
+
+
+async def show_scenario_diff(message, book: ScenarioBook, name: str = '') -> None:
+    """Текущий расчёт рядом с сохранённым сценарием (по имени) или с состоянием до последней правки"""
+    other = book.find(name) if name else book.previous
+    if other is None or book.current is None:
+        await message.reply_text(
+            f"❌ Сценарий «{name}» не найден." if name else
+            "Пока не с чем сравнить: измените значение («цена 1700») или сохраните сценарий."
+        )
+        return
+    await message.reply_text(format_diff(other, book.current.copy("Сейчас")), parse_mode=ParseMode.MARKDOWN)
+
+
+async def handle_scenario_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Кнопки под отчётом: сохранить сценарий / сравнить с предыдущим"""
+    query = update.callback_query
+    book = get_scenario_book(context)
+    if book.current is None:
+        await query.answer("Расчёт устарел — начните новый.")
+        return
+    if query.data == 'calc_save':
+        scenario = book.save()
+        await query.answer(f"💾 Сохранено: {scenario.name}")
+        return
+    await query.answer()
+    await show_scenario_diff(query.message, book)
+
+
+def category_keyboard() -> ReplyKeyboardMarkup:
+    return CATEGORY_KEYBOARD
+
+
+async def compare_marketplaces(update: Update, context: ContextTypes.DEFAULT_TYPE, category: str):
+    """Себестоимость и цена + категория → все площадки одним расчётом; лучшая становится текущим расчётом"""
+    cost = get_calculator_data_safe(context, 0)
+    price = get_calculator_data_safe(context, 1)
+    results = fee_tables.compare(cost, price, category)
+    await update.message.reply_text(fee_tables.format_comparison(results, category), parse_mode=ParseMode.MARKDOWN)
+    best = results[0]
+    context.user_data['calculator_data'].update({
+        2: best.commission, 3: best.logistics, 4: fee_tables.default_acos, 5: fee_tables.default_tax
+    })
+    context.user_data['calculator_step'] = len(CALCULATOR_STEPS)
+    await update.message.reply_text(f"🏆 Подробный расчёт для лучшей площадки — {best.title}:")
+    await calculate_and_show_results(update, context)
+
+
 async def start_economy_calculator(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     context.user_data['calculator_step'] = 0
     context.user_data['calculator_data'] = {}
     context.user_data['state'] = BotState.CALCULATOR
     
-    if update.callback_query:
-        await update.callback_query.message.reply_text(
-            "🛍️ **РАСЧЕТ ЭКОНОМИКИ МАРКЕТПЛЕЙСА**\n"
-            "Введите данные вашего товара:\n"
-            + CALCULATOR_STEPS[0],
-            parse_mode=ParseMode.MARKDOWN
-        )
-    else:
-        await update.message.reply_text(
-            "🛍️ **РАСЧЕТ ЭКОНОМИКИ МАРКЕТПЛЕЙСА**\n"
-            "Введите данные вашего товара:\n"
-            + CALCULATOR_STEPS[0],
-            parse_mode=ParseMode.MARKDOWN
-        )
+    message = update.callback_query.message if update.callback_query else update.message
+    await message.reply_text(CALCULATOR_WELCOME, parse_mode=ParseMode.MARKDOWN)
 
 
 async def handle_economy_calculator(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -161,22 +306,84 @@ async def handle_economy_calculator(update: Update, context: ContextTypes.DEFAUL
             await update.message.reply_text(CALCULATOR_STEPS[step - 1])
         return
     
+    if step >= len(CALCULATOR_STEPS):
+        data = [get_calculator_data_safe(context, i) for i in range(len(CALCULATOR_STEPS))]
+        axis = GRID_AXIS_BY_BUTTON.get(text)
+        if axis:
+            await update.message.reply_text(format_grid(data, axis), parse_mode=ParseMode.MARKDOWN)
+            return
+        if text == SIMULATION_BUTTON or text.lower().startswith(SIMULATION_PREFIX):
+            ranges = parse_ranges(text)
+            report = format_simulation(simulate(data, ranges or default_ranges(data)))
+            # Кнопка или нераспознанные диапазоны («5-20±3») — подсказываем формат
+            if not ranges:
+                report += f"\n{SIMULATION_HELP}"
+            await update.message.reply_text(report, parse_mode=ParseMode.MARKDOWN)
+            return
+        book = get_scenario_book(context)
+        command = SCENARIO_COMMAND_RE.match(text.strip())
+        if command and book.current is not None:
+            action, name = command.group(1).lower(), command.group(2).strip()
+            if action == 'сохранить':
+                await update.message.reply_text(f"💾 Сохранено: {book.save(name).name}")
+            else:
+                await show_scenario_diff(update.message, book, name)
+            return
+        changes = parse_calculator_changes(text)
+        if changes and book.current is not None:
+            if min(changes.values()) < 0:
+                await update.message.reply_text(f"❌ {NEGATIVE_VALUE_ERROR}")
+                return
+            await update_scenario(update, context, changes)
+            return
+        target = TARGET_MARGIN_RE.match(text.strip())
+        if target:
+            margin = float(target.group(1).replace(',', '.'))
+            price = target_margin_price(data, margin)
+            await update.message.reply_text(
+                f"🎯 Цена для чистой маржи {margin:g}%: {price:.1f} ₽" if price is not None
+                else f"❌ Маржа {margin:g}% недостижима: процентные затраты и маржа ≥ 100% цены"
+            )
+            return
+
     if text == "🔄 Новый расчет":
         context.user_data['calculator_step'] = 0
         context.user_data['calculator_data'] = {}
         await start_economy_calculator(update, context)
         return
     
+    data, error = parse_calculator_input(text)
+    if data:
+        context.user_data['calculator_data'] = dict(enumerate(data))
+        context.user_data['calculator_step'] = len(CALCULATOR_STEPS)
+        await calculate_and_show_results(update, context)
+        return
+    if error:
+        await update.message.reply_text(f"❌ {error}\n{CALCULATOR_INPUT_HELP}", parse_mode=ParseMode.MARKDOWN)
+        return
+
+    if step == COMMISSION_STEP:
+        category = fee_tables.find_category(text)
+        if category:
+            await compare_marketplaces(update, context, category)
+            return
+
     try:
         value = float(text)
         if value < 0:
-            await update.message.reply_text("❌ Число должно быть положительным. Попробуйте еще раз:")
+            await update.message.reply_text(f"❌ {NEGATIVE_VALUE_ERROR} Попробуйте еще раз:")
             return
         
         context.user_data['calculator_data'][step] = value
         context.user_data['calculator_step'] = step + 1
         
-        if step + 1 < len(CALCULATOR_STEPS):
+        if step + 1 == COMMISSION_STEP:
+            await update.message.reply_text(
+                f"{CALCULATOR_STEPS[step + 1]}\n\n"
+                "Или выберите категорию — сравню Wildberries, Ozon и Яндекс Маркет по тарифам:",
+                reply_markup=category_keyboard()
+            )
+        elif step + 1 < len(CALCULATOR_STEPS):
             await update.message.reply_text(CALCULATOR_STEPS[step + 1])
         else:
             await calculate_and_show_results(update, context)
@@ -185,6 +392,76 @@ async def handle_economy_calculator(update: Update, context: ContextTypes.DEFAUL
         await update.message.reply_text("❌ Пожалуйста, введите число:")
 
 
+# ==============================================================================
+# INLINE-РЕЖИМ: @bot 500 1500 15 10 8 6
+# ==============================================================================
+
+async def handle_calculator_inline(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Отчёт калькулятора как inline-результат; одинаковые входы считаются один раз"""
+    query = update.inline_query
+    data, error = parse_calculator_input(query.query)
+    if not data:
+        await query.answer(
+            [],
+            cache_time=INLINE_CACHE_SECONDS,
+            button=InlineQueryResultsButton(text=error or "Себестоимость цена комиссия% логистика% ACOS% налог%", start_parameter="calculator")
+        )
+        return
+    key = memo_key(data)
+    result = inline_report_memo.get(key)
+    if result is None:
+        metrics = calculate_economy_metrics(data)
+        result = InlineQueryResultArticle(
+            id=hashlib.md5(repr(key).encode()).hexdigest(),
+            title=f"Чистая прибыль {metrics['чистая_прибыль']:.1f} ₽ ({metrics['чистая_маржа_%']:.1f}%)",
+            description=f"Цена {data[1]:g} ₽, себестоимость {data[0]:g} ₽, наценка {metrics['наценка_%']:.0f}%",
+            input_message_content=InputTextMessageContent(format_economy_report(data), parse_mode=ParseMode.MARKDOWN)
+        )
+        inline_report_memo.set(key, result)
+    await query.answer([result], cache_time=INLINE_CACHE_SECONDS)
+
+
+# ==============================================================================
+# ПАКЕТНЫЙ РАСЧЁТ (CSV/XLSX)
+# ==============================================================================
+
+async def handle_calculator_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Файл с SKU → расчёт всех строк и CSV с результатами"""
+    document = update.message.document
+    extension = os.path.splitext(document.file_name or '')[1].lower()
+    if extension not in BATCH_EXTENSIONS:
+        await update.message.reply_text(f"❌ Поддерживаются файлы {', '.join(BATCH_EXTENSIONS)}")
+        return
+    if document.file_size and document.file_size > BATCH_MAX_FILE_BYTES:
+        await update.message.reply_text("❌ Файл больше 20 МБ. Разбейте таблицу на части.")
+        return
+
+    await update.message.reply_text("⏳ Считаю экономику по всем SKU...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"input{extension}")
+        tg_file = await document.get_file()
+        await tg_file.download_to_drive(path)
+        with tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES) as output:
+            try:
+                summary = await asyncio.to_thread(process_batch, path, output)
+            except BatchError as e:
+                await update.message.reply_text(f"❌ {e}\n\n{BATCH_HELP}", parse_mode=ParseMode.MARKDOWN)
+                return
+            except Exception as e:
+                logger.error(f"Ошибка пакетного расчёта: {e}")
+                await update.message.reply_text("❌ Не удалось обработать файл. Проверьте формат таблицы.")
+                return
+            await update.message.reply_text(summary.report(), parse_mode=ParseMode.MARKDOWN)
+            if summary.rows:
+                output.seek(0)
+                await update.message.reply_document(
+                    document=output,
+                    filename=f"economy_{os.path.splitext(document.file_name)[0]}.csv",
+                    caption="📎 Метрики и рекомендации по каждому SKU"
+                )
+    await update_usage_stats(update.message.from_user.id, 'calculator')
+
+
 # ==============================================================================
 # ОБРАБОТЧИК CALLBACK ДЛЯ МЕНЮ
 # ==============================================================================
@@ -205,30 +482,11 @@ async def menu_calculator(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 # ==============================================================================
 
 async def show_business_menu_from_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [InlineKeyboardButton("📊 Калькулятор маркетплейсов", callback_data='menu_calculator')],
-        [InlineKeyboardButton("🗣️ Переговорщик", callback_data='ai_negotiator_business'),
-         InlineKeyboardButton("🎓 SKILLTRAINER", callback_data='ai_skilltrainer_business')],
-        [InlineKeyboardButton("📝 Редактор", callback_data='ai_editor_business'),
-         InlineKeyboardButton("🎯 Маркетолог", callback_data='ai_marketer_business')],
-        [InlineKeyboardButton("🚀 HR-рекрутер", callback_data='ai_hr_business')],
-        [InlineKeyboardButton("🔙 В главное меню", callback_data='main_menu')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
+    menu = ui.menu('business_menu')
     if update.callback_query:
-        await update.callback_query.edit_message_text(
-            "🚀 **ДЛЯ ДЕЛА**\nИнструменты для профессионального роста и бизнеса:",
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        await update.callback_query.edit_message_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
     else:
-        await update.message.reply_text(
-            "🚀 **ДЛЯ ДЕЛА**\nИнструменты для профессионального роста и бизнеса:",
-            reply_markup=reply_markup,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        await update.message.reply_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
 
 
 # ==============================================================================
@@ -236,5 +494,12 @@ async def show_business_menu_from_callback(update: Update, context: ContextTypes
 # ==============================================================================
 
 def setup_calculator_handlers(application: Application):
-    application.add_handler(CallbackQueryHandler(menu_calculator, pattern='^menu_calculator$'))
+    callback_router.route('menu_calculator', menu_calculator)
+    callback_router.route('calc_save', handle_scenario_callback)
+    callback_router.route('calc_diff', handle_scenario_callback)
+    application.add_handler(InlineQueryHandler(handle_calculator_inline))
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("xlsx"),
+        handle_calculator_document
+    ))
     logger.info("Обработчики калькулятора настроены")
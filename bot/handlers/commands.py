@@ -1,16 +1,23 @@
-"""Обработчики команд бота (/start, /menu, /progress, /version, /referral, /clear_history)"""
+"""Обработчики команд бота (/start, /menu, /progress, /version, /referral, /clear_history, /subscribe)"""
 import os
 from typing import Dict, Any
 from datetime import datetime
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
-from telegram.ext import ContextTypes, Application, CommandHandler, CallbackQueryHandler
-from telegram.constants import ParseMode
+from telegram import Update, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, Application, CommandHandler
 from ..config import (
     logger, BOT_VERSION, CONFIG_VERSION, SKILLTRAINER_VERSION,
-    DEMO_SCENARIOS, SYSTEM_PROMPTS, REPLY_KEYBOARD_MARKUP
+    DEMO_SCENARIOS, SYSTEM_PROMPTS, REPLY_KEYBOARD_MARKUP, ADMIN_USER_IDS
 )
 from ..models import user_stats_cache, active_skill_sessions, BotState, user_conversation_history
-from ..utils import split_message_efficiently
+from ..utils import split_message_efficiently, send_long_message
+from ..services.agent_snapshots import agent_snapshot_store
+from ..services.ui_registry import ui, Menu, build_markup
+from ..services.callback_router import callback_router
+from ..services.subscriptions import (
+    subscription_service, SUBSCRIPTION_TOPICS, TIME_PRESETS,
+    parse_time, parse_utc_offset, format_offset
+)
+from ..services.tracing import tracer
 # ==============================================================================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ==============================================================================
@@ -125,98 +132,136 @@ async def basics_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     """Меню БАЗОВЫХ (11 промтов)"""
     query = update.callback_query
     await query.answer()
-    keyboard = [
-        [InlineKeyboardButton("🧠 Мудрец", callback_data='ai_sage_self'),
-         InlineKeyboardButton("📈 Стратег", callback_data='ai_strategist_self'),
-         InlineKeyboardButton("🧭 Наставник", callback_data='ai_mentor_self')],
-        [InlineKeyboardButton("💡 Идеатор", callback_data='ai_ideator_self'),
-         InlineKeyboardButton("✨ Редактор", callback_data='ai_editor_self'),
-         InlineKeyboardButton("📈 Рост-эксперт", callback_data='ai_growth_expert_self')],
-        [InlineKeyboardButton("💼 HR-советник", callback_data='ai_hr_advisor_self'),
-         InlineKeyboardButton("🤝 Посредник", callback_data='ai_mediator_self'),
-         InlineKeyboardButton("🌟 Фраза дня", callback_data='ai_daily_phrase_self')],
-        [InlineKeyboardButton("🔮 Гороскоп разума", callback_data='ai_mind_horoscope_self'),
-         InlineKeyboardButton("🌙 Рефлексия дня", callback_data='ai_daily_reflection_self')],
-        [InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(
-        "🆓 БАЗОВЫЕ ИНСТРУМЕНТЫ (ежедневные)\n"
-        "До 5 запросов в день на каждый. Выберите:",
-        reply_markup=reply_markup,
-        parse_mode=None
-    )
+    menu = ui.menu('basics_menu')
+    await query.edit_message_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
     return BotState.MAIN_MENU
 async def profi_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotState:
     """Меню ПРОФИ"""
     query = update.callback_query
     await query.answer()
-    keyboard = [
-        [InlineKeyboardButton("🎓 SKILLTRAINER", callback_data='ai_skilltrainer_business')],
-        [InlineKeyboardButton("📊 Калькулятор маркетплейсов", callback_data='menu_calculator')],
-        [InlineKeyboardButton("🧠 Оркестратор проекта", callback_data='ai_orchestrator_prof')],  # ← ДОБАВЛЕНО
-        [InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(
-        "💡 ПРОФИ (платные)\n"
-        "До 3 запросов в день. Выберите:",
-        reply_markup=reply_markup,
-        parse_mode=None
-    )
+    menu = ui.menu('profi_menu')
+    await query.edit_message_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
     return BotState.MAIN_MENU
 async def programs_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotState:
     """Меню ПРОГРАММ (заглушка)"""
     query = update.callback_query
     await query.answer()
-    keyboard = [[InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(
-        "🎓 ПРОГРАММЫ (скоро)\n"
-        "Готовые маршруты к результату:\n"
-        "• Мастер переговоров\n"
-        "• Бизнес-инженер\n"
-        "• Лидер будущего\n"
-        "Следите за обновлениями!",
-        reply_markup=reply_markup,
-        parse_mode=None
-    )
+    menu = ui.menu('programs_menu')
+    await query.edit_message_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
     return BotState.MAIN_MENU
 async def individual_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotState:
     """Меню ИНДИВИДУАЛЬНОГО промта (заглушка с ссылкой)"""
     query = update.callback_query
     await query.answer()
-    keyboard = [[InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(
-        "👤 ИНДИВИДУАЛЬНЫЙ ПРОМТ ПОД КЛЮЧ\n"
-        "Напишите мне: mo.om-mo2016@yandex.ru\n"
-        "Создам персональный промт под вашу задачу.",
-        reply_markup=reply_markup,
-        parse_mode=None
-    )
+    menu = ui.menu('individual_menu')
+    await query.edit_message_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
     return BotState.MAIN_MENU
 async def commands_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotState:
     """Меню КОМАНД"""
     query = update.callback_query
     await query.answer()
-    keyboard = [[InlineKeyboardButton("🔙 Назад в главное меню", callback_data='main_menu')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    help_text = (
-        "❓ ДОСТУПНЫЕ КОМАНДЫ:\n"
-        "/start — Главное меню\n"
-        "/menu — Повторить главное меню\n"
-        "/progress — Ваш прогресс\n"
-        "/version — О боте\n"
-        "/referral — Пригласить друга\n"
-        "/clear_history — Очистить историю диалога"
+    menu = ui.menu('commands_menu')
+    await query.edit_message_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
+    return BotState.MAIN_MENU
+# ==============================================================================
+# ПОДПИСКИ НА ЕЖЕДНЕВНЫЕ ИНСТРУМЕНТЫ
+# ==============================================================================
+def subscriptions_text(user_id: int) -> str:
+    topics = subscription_service.topics(user_id)
+    if not topics:
+        return (
+            "🔔 ЕЖЕДНЕВНАЯ РАССЫЛКА\n"
+            "Фраза дня и гороскоп разума будут приходить сами в выбранное время.\n"
+            "Отметьте, что присылать:"
+        )
+    entry = next(iter(topics.values()))
+    names = ", ".join(SUBSCRIPTION_TOPICS[topic] for topic in topics)
+    return (
+        "🔔 ЕЖЕДНЕВНАЯ РАССЫЛКА\n"
+        f"Подписки: {names}\n"
+        f"Время: {entry['time']} ({format_offset(entry['offset'])})\n"
+        "Другой часовой пояс: /subscribe 08:00 UTC+5"
     )
+@ui.template('subscriptions')
+def build_subscriptions_menu(topics: tuple, current_time: str) -> Menu:
+    """Клавиатура подписок зависит только от набора тем и времени — рендерится один раз на сочетание"""
+    rows = [
+        [(f"{'✅' if topic in topics else '▫️'} {title}", f'sub_toggle_{topic}')]
+        for topic, title in SUBSCRIPTION_TOPICS.items()
+    ]
+    if topics:
+        times = [
+            (f"• {preset}" if preset == current_time else preset, f"sub_time_{preset.replace(':', '')}")
+            for preset in TIME_PRESETS
+        ]
+        rows += [times[:3], times[3:]]
+    rows.append([("🔙 Назад", 'basics_menu')])
+    return Menu(None, build_markup(rows), None)
+def subscriptions_keyboard(user_id: int) -> InlineKeyboardMarkup:
+    topics = subscription_service.topics(user_id)
+    current_time = next(iter(topics.values()), {}).get('time', '')
+    return ui.markup('subscriptions', topics=tuple(topics), current_time=current_time)
+async def subscriptions_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotState:
+    """Меню подписок: выбор тем и времени"""
+    query = update.callback_query
+    await query.answer()
+    user_id = query.from_user.id
     await query.edit_message_text(
-        help_text,
-        reply_markup=reply_markup,
+        subscriptions_text(user_id),
+        reply_markup=subscriptions_keyboard(user_id),
         parse_mode=None
     )
     return BotState.MAIN_MENU
+async def toggle_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE, topic: str) -> BotState:
+    """sub_toggle_<тема>"""
+    user_id = update.callback_query.from_user.id
+    if topic in subscription_service.topics(user_id):
+        subscription_service.unsubscribe(user_id, topic)
+    elif topic in SUBSCRIPTION_TOPICS:
+        subscription_service.subscribe(user_id, topic)
+    else:
+        await update.callback_query.answer()   # неизвестная тема: меню не изменилось
+        return BotState.MAIN_MENU
+    return await subscriptions_menu_handler(update, context)
+async def set_subscription_time(update: Update, context: ContextTypes.DEFAULT_TYPE, digits: str) -> BotState:
+    """sub_time_<ЧЧММ>; время не из TIME_PRESETS или уже выбранное — без правки сообщения"""
+    query = update.callback_query
+    local_time = f"{digits[:2]}:{digits[2:]}"
+    topics = subscription_service.topics(query.from_user.id)
+    current_time = next(iter(topics.values()), {}).get('time')
+    if local_time not in TIME_PRESETS or local_time == current_time:
+        # Тот же текст и клавиатура — Telegram ответил бы «Message is not modified»
+        await query.answer()
+        return BotState.MAIN_MENU
+    subscription_service.set_schedule(query.from_user.id, local_time=local_time)
+    return await subscriptions_menu_handler(update, context)
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/subscribe [ЧЧ:ММ] [UTC±N] — подписаться на обе темы или сменить время"""
+    user_id = update.message.from_user.id
+    local_time, offset = None, None
+    for arg in context.args or []:
+        if parse_time(arg) is not None:
+            local_time = arg.replace('.', ':').zfill(5)
+        elif parse_utc_offset(arg) is not None:
+            offset = parse_utc_offset(arg)
+        else:
+            await update.message.reply_text(
+                "Не понял параметр. Пример: /subscribe 08:30 UTC+3", parse_mode=None
+            )
+            return
+    if subscription_service.topics(user_id):
+        subscription_service.set_schedule(user_id, local_time, offset)
+    else:
+        for topic in SUBSCRIPTION_TOPICS:
+            subscription_service.subscribe(user_id, topic, local_time, offset)
+    await update.message.reply_text(
+        subscriptions_text(user_id),
+        reply_markup=subscriptions_keyboard(user_id),
+        parse_mode=None
+    )
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    subscription_service.unsubscribe(update.message.from_user.id)
+    await update.message.reply_text("🔕 Рассылка отключена. Вернуть: /subscribe", parse_mode=None)
 # ==============================================================================
 # ГЛАВНОЕ МЕНЮ (5 КНОПОК!)
 # ==============================================================================
@@ -229,37 +274,11 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     else:
         user_id = update.message.from_user.id
     await get_usage_stats(user_id)
-    keyboard = [
-        [InlineKeyboardButton("🆓 БАЗОВЫЕ (ежедневные)", callback_data='basics_menu')],
-        [InlineKeyboardButton("💡 ПРОФИ (платные)", callback_data='profi_menu')],
-        [InlineKeyboardButton("🎓 ПРОГРАММЫ (скоро)", callback_data='programs_menu')],
-        [InlineKeyboardButton("👤 ИНДИВИДУАЛЬНЫЙ (под ключ)", callback_data='individual_menu')],
-        [InlineKeyboardButton("❓ КОМАНДЫ", callback_data='commands_menu')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    welcome_text = (
-        "👋 Это ваш личный AI-тренер и стратег — помощник в росте, принятии решений и решении сложных задач.\n"
-        "Выберите, как вы хотите работать:\n"
-        "🆓 БАЗОВЫЕ (ежедневные) — 11 бесплатных инструментов для саморефлексии, идей и вдохновения.\n"
-        "До 5 запросов в день. Отлично подойдут для старта.\n"
-        "💡 ПРОФИ (платные) — глубокие инструменты для бизнеса и личного роста:\n"
-        "• 🎓 SKILLTRAINER — развивает навыки: переговоры, уверенность, лидерство\n"
-        "• 📊 Калькулятор маркетплейсов — считает чистую прибыль с учётом комиссий, логистики и налогов\n"
-        "До 3 запросов в день.\n"
-        "🎓 ПРОГРАММЫ (скоро) — готовые маршруты из 6+ инструментов:\n"
-        "«Мастер переговоров», «Бизнес-инженер», «Лидер будущего» и др.\n"
-        "Следите за обновлениями!\n"
-        "👤 ИНДИВИДУАЛЬНЫЙ ПРОМТ (под ключ) — если вам нужен промт под вашу задачу, напишите мне:\n"
-        "mo.om-mo2016@yandex.ru\n"
-        "⚠️ Информация о работе системы\n"
-        "Используется технология LLM для автоматической генерации текста.\n"
-        "Важно: ответы требуют самостоятельной проверки.\n"
-        "Настоятельно не рекомендуется делиться персональными данными. 🔒"
-    )
+    menu = ui.menu('main_menu')
     if query:
-        await query.edit_message_text(welcome_text, reply_markup=reply_markup, parse_mode=None)
+        await query.edit_message_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
     else:
-        await update.message.reply_text(welcome_text, reply_markup=reply_markup, parse_mode=None)
+        await update.message.reply_text(menu.text, reply_markup=menu.markup, parse_mode=menu.parse_mode)
     return BotState.MAIN_MENU
 # ==============================================================================
 # КОМАНДА /start — ОЧИЩАЕТ ИСТОРИЮ И ПОКАЗЫВАЕТ ГЛАВНОЕ МЕНЮ
@@ -277,6 +296,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotState:
     # ✅ ОСНОВНОЕ ИСПРАВЛЕНИЕ: ОЧИСТКА АКТИВНОГО АГЕНТА UAF
     if 'active_agent' in context.user_data:
         del context.user_data['active_agent']
+    agent_snapshot_store.delete(user_id)
     await update.message.reply_text(
         "👋 Привет! Используйте нижнюю панель для навигации.",
         reply_markup=REPLY_KEYBOARD_MARKUP
@@ -320,6 +340,25 @@ async def referral_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ==============================================================================
 # НАСТРОЙКА ОБРАБОТЧИКОВ
 # ==============================================================================
+async def traces_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Только для ADMIN_USER_IDS: сводка и самые медленные трассы апдейтов.
+    /traces 0.1 (или 10%) — трассировать 10% апдейтов, /traces 0 — выключить.
+    """
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        return
+    if context.args:
+        value = context.args[0]
+        try:
+            rate = float(value.rstrip('%')) / (100 if value.endswith('%') else 1)
+        except ValueError:
+            await update.message.reply_text("Формат: /traces [доля апдейтов, например 0.1 или 10%]")
+            return
+        tracer.sample_rate = min(max(rate, 0.0), 1.0)
+        logger.info(f"Трассировка: сэмплирование {tracer.sample_rate:.0%} (админ {update.effective_user.id})")
+    await send_long_message(update.effective_chat.id, tracer.report(), context)
+
+
 def setup_commands(application: Application):
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("menu", menu_command))
@@ -327,10 +366,16 @@ def setup_commands(application: Application):
     application.add_handler(CommandHandler("progress", progress_command))
     application.add_handler(CommandHandler("referral", referral_command))
     application.add_handler(CommandHandler("clear_history", clear_history_command))
-    application.add_handler(CallbackQueryHandler(show_main_menu, pattern='^main_menu$'))
-    application.add_handler(CallbackQueryHandler(basics_menu_handler, pattern='^basics_menu$'))
-    application.add_handler(CallbackQueryHandler(profi_menu_handler, pattern='^profi_menu$'))
-    application.add_handler(CallbackQueryHandler(programs_menu_handler, pattern='^programs_menu$'))
-    application.add_handler(CallbackQueryHandler(individual_menu_handler, pattern='^individual_menu$'))
-    application.add_handler(CallbackQueryHandler(commands_menu_handler, pattern='^commands_menu$'))
+    application.add_handler(CommandHandler("subscribe", subscribe_command))
+    application.add_handler(CommandHandler("unsubscribe", unsubscribe_command))
+    application.add_handler(CommandHandler("traces", traces_command))
+    callback_router.route('main_menu', show_main_menu)
+    callback_router.route('basics_menu', basics_menu_handler)
+    callback_router.route('profi_menu', profi_menu_handler)
+    callback_router.route('programs_menu', programs_menu_handler)
+    callback_router.route('individual_menu', individual_menu_handler)
+    callback_router.route('commands_menu', commands_menu_handler)
+    callback_router.route('subscriptions_menu', subscriptions_menu_handler)
+    callback_router.route('sub_toggle_', toggle_subscription, prefix=True)
+    callback_router.route('sub_time_', set_subscription_time, prefix=True)
     logger.info("Командные обработчики настроены")
@@ -1,80 +1,86 @@
 """Главный обработчик текстовых сообщений и маршрутизация (с TTL = 1 час для кэша истории)"""
 from telegram import Update
-from telegram.ext import ContextTypes, Application, MessageHandler, filters, CallbackQueryHandler
+from telegram.ext import ContextTypes, Application, MessageHandler, filters
 from telegram.constants import ParseMode
-from datetime import datetime, timedelta
 from ..config import logger
-from ..models import BotState, active_skill_sessions, user_conversation_history
+from ..models import BotState, active_skill_sessions, user_conversation_history, HISTORY_TTL_SECONDS
+from ..services.agent_snapshots import agent_snapshot_store
+from ..services.callback_router import callback_router
+from ..services.keyword_triggers import KeywordTriggers
+from ..services.tracing import tracer
 from .commands import show_usage_progress
 
 
-async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotState:
-    """Главный обработчик текстовых сообщений"""
-    user_text = update.message.text.strip()
-    user_id = update.message.from_user.id
+def get_active_agent(context: ContextTypes.DEFAULT_TYPE, user_id: int):
+    """Активный UAF-агент пользователя; после рестарта — лениво восстанавливается из снимка"""
+    active_agent = context.user_data.get('active_agent')
+    if active_agent is None and agent_snapshot_store.has(user_id):
+        groq_client = context.application.bot_data.get('groq_client')
+        active_agent = agent_snapshot_store.restore_agent(user_id, groq_client)
+        if active_agent is not None:
+            context.user_data['active_agent'] = active_agent
+            context.user_data['state'] = BotState.AI_SELECTION
+    return active_agent
 
-    # === ПРОВЕРКА TTL = 1 ЧАС ===
-    if user_id in user_conversation_history:
-        last_activity = user_conversation_history[user_id]["last_activity"]
-        if datetime.now() - last_activity > timedelta(hours=1):
-            del user_conversation_history[user_id]
-        else:
-            user_conversation_history[user_id]["last_activity"] = datetime.now()
 
-    # Обработка кнопок reply-клавиатуры
-    if user_text == "🏠 Меню":
-        from .commands import start
-        return await start(update, context)
-    if user_text == "📊 Прогресс":
-        await show_usage_progress(update, context)
-        return context.user_data.get('state', BotState.MAIN_MENU)
+async def route_menu_button(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    from .commands import start
+    return await start(update, context)
 
-    # Проверка активной сессии SKILLTRAINER
-    if user_id in active_skill_sessions:
-        from .skilltrainer import handle_skilltrainer_response
-        session = active_skill_sessions[user_id]
-        await handle_skilltrainer_response(update, context, session)
-        return context.user_data.get('state', BotState.MAIN_MENU)
 
-    # 🔧 Проверка активного UAF-агента (например, Оркестратор)
-    active_agent = context.user_data.get('active_agent')
-    if active_agent and hasattr(active_agent, 'handle_input'):
-        await active_agent.handle_input(update, context, user_text)
-        return context.user_data.get('state', BotState.AI_SELECTION)
-
-    # Обработка специальных команд в тексте
-    if any(word in user_text.lower() for word in ['пригласи', 'друг', 'реферал', 'ссылка']):
-        from .commands import show_referral_program
-        await show_referral_program(update, context)
-        return BotState.MAIN_MENU
-    if any(word in user_text.lower() for word in ['прогресс', 'статистика', 'стата']):
-        await show_usage_progress(update, context)
-        return BotState.MAIN_MENU
-
-    # Получаем текущее состояние бота
-    current_state = context.user_data.get('state', BotState.MAIN_MENU)
+async def route_progress_button(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    await show_usage_progress(update, context)
+    return context.user_data.get('state', BotState.MAIN_MENU)
 
-    # Маршрутизация по состояниям
-    if current_state == BotState.CALCULATOR:
-        from .calculator import handle_economy_calculator
-        await handle_economy_calculator(update, context)
-        return BotState.CALCULATOR
-    elif context.user_data.get('active_groq_mode'):
-        active_mode = context.user_data['active_groq_mode']
-        from .ai_handlers import handle_groq_request
-        await handle_groq_request(update, context, active_mode)
-        return BotState.AI_SELECTION
-    elif current_state in (BotState.AI_SELECTION, BotState.BUSINESS_MENU):
-        await update.message.reply_text(
-            "❓ Вы отправили текст, но не активировали ни один из ИИ-инструментов. "
-            "Нажмите на кнопку 'Активировать' под нужным инструментом, чтобы начать диалог, "
-            "или 🏠 Меню для возврата."
-        )
-        return current_state
-    else:
-        # Помощь по умолчанию
-        from ..config import BOT_VERSION
-        help_text = f"""🤖 **Personal Growth AI** {BOT_VERSION}
+
+async def route_skilltrainer(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    from .skilltrainer import handle_skilltrainer_response
+    session = active_skill_sessions[update.message.from_user.id]
+    await handle_skilltrainer_response(update, context, session)
+    return context.user_data.get('state', BotState.MAIN_MENU)
+
+
+async def route_agent_input(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    await context.user_data['active_agent'].handle_input(update, context, user_text)
+    return context.user_data.get('state', BotState.AI_SELECTION)
+
+
+async def route_referral(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    from .commands import show_referral_program
+    await show_referral_program(update, context)
+    return BotState.MAIN_MENU
+
+
+async def route_progress(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    await show_usage_progress(update, context)
+    return BotState.MAIN_MENU
+
+
+async def route_calculator(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    from .calculator import handle_economy_calculator
+    await handle_economy_calculator(update, context)
+    return BotState.CALCULATOR
+
+
+async def route_groq_mode(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    from .ai_handlers import handle_groq_request
+    await handle_groq_request(update, context, context.user_data['active_groq_mode'])
+    return BotState.AI_SELECTION
+
+
+async def route_tool_not_active(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    await update.message.reply_text(
+        "❓ Вы отправили текст, но не активировали ни один из ИИ-инструментов. "
+        "Нажмите на кнопку 'Активировать' под нужным инструментом, чтобы начать диалог, "
+        "или 🏠 Меню для возврата."
+    )
+    return context.user_data.get('state', BotState.MAIN_MENU)
+
+
+async def route_help(update: Update, context: ContextTypes.DEFAULT_TYPE, user_text: str) -> BotState:
+    """Помощь по умолчанию"""
+    from ..config import BOT_VERSION
+    help_text = f"""🤖 **Personal Growth AI** {BOT_VERSION}
 💡 **Доступные команды:**
 /start - Главное меню
 /progress - Ваш прогресс и статистика
@@ -84,62 +90,148 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
 • Выберите инструмент из меню
 🚀 **Новый инструмент: SKILLTRAINER**
 Многошаговая сессия развития навыков с гейтами и прогресс-баром!"""
-        await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
-        return current_state
+    await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
+    return context.user_data.get('state', BotState.MAIN_MENU)
+
+
+# Таблицы маршрутизации текста. Порядок проверок в select_text_route:
+# кнопка reply-клавиатуры → сессия SKILLTRAINER → активный агент → ключевые слова →
+# режим ИИ-инструмента (кроме калькулятора) → состояние бота.
+REPLY_BUTTON_ROUTES = {
+    "🏠 Меню": route_menu_button,
+    "📊 Прогресс": route_progress_button,
+}
+
+# Тип агента → обработчик; агенты без своей записи получают текст в handle_input
+AGENT_ROUTES = {
+    'orchestrator': route_agent_input,
+}
+
+keyword_triggers = KeywordTriggers({
+    'referral': ['пригласи', 'друг', 'реферал', 'ссылка'],
+    'progress': ['прогресс', 'статистика', 'стата'],
+})
+KEYWORD_ROUTES = {
+    'referral': route_referral,
+    'progress': route_progress,
+}
+
+STATE_ROUTES = {
+    BotState.CALCULATOR: route_calculator,
+    BotState.AI_SELECTION: route_tool_not_active,
+    BotState.BUSINESS_MENU: route_tool_not_active,
+}
+
+
+def select_text_route(context: ContextTypes.DEFAULT_TYPE, user_id: int, user_text: str):
+    """Выбрать обработчик текста: не больше одного просмотра текста и поиска по словарю на шаг"""
+    route = REPLY_BUTTON_ROUTES.get(user_text)
+    if route is not None:
+        return route
+    if user_id in active_skill_sessions:
+        return route_skilltrainer
+    active_agent = get_active_agent(context, user_id)
+    if active_agent and hasattr(active_agent, 'handle_input'):
+        return AGENT_ROUTES.get(getattr(active_agent, 'agent_type', None), route_agent_input)
+    current_state = context.user_data.get('state', BotState.MAIN_MENU)
+    # Кнопки калькулятора («Другое» содержит «друг») не должны уходить в ключевые слова
+    if current_state == BotState.CALCULATOR:
+        return route_calculator
+    trigger = keyword_triggers.match(user_text)
+    if trigger is not None:
+        return KEYWORD_ROUTES[trigger]
+    if context.user_data.get('active_groq_mode'):
+        return route_groq_mode
+    return STATE_ROUTES.get(current_state, route_help)
+
+
+async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotState:
+    """Главный обработчик текстовых сообщений"""
+    user_text = update.message.text.strip()
+    user_id = update.message.from_user.id
+
+    # === ПРОВЕРКА TTL = 1 ЧАС ===
+    user_conversation_history.maybe_compact()
+    history = user_conversation_history.get(user_id)
+    if history is not None:
+        if history.expired(HISTORY_TTL_SECONDS):
+            del user_conversation_history[user_id]
+        else:
+            history.touch()
+
+    with tracer.span('route'):
+        route = select_text_route(context, user_id, user_text)
+    logger.debug(f"Текст пользователя {user_id} → {route.__name__}")
+    return await route(update, context, user_text)
 
 
-async def handle_orchestrator_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка нажатий кнопок Оркестратора: orch_action:..., orch_cmd:..."""
+async def get_orchestrator_for_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Ответить на нажатие и вернуть активный Оркестратор (None — с сообщением пользователю)"""
     query = update.callback_query
     await query.answer()
-    callback_data = query.data
-    user_id = query.from_user.id
-
-    active_agent = context.user_data.get('active_agent')
+    active_agent = get_active_agent(context, query.from_user.id)
     if not active_agent or not hasattr(active_agent, 'session_data'):
         await query.message.reply_text("⚠️ Сессия не активна. Запустите Оркестратор заново.")
+        return None
+    return active_agent
+
+
+async def handle_orchestrator_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, action: str):
+    """Кнопки действий Оркестратора: orch_action:<действие>"""
+    query = update.callback_query
+    active_agent = await get_orchestrator_for_callback(update, context)
+    if active_agent is None:
         return
+    if action == "go_to_B1a":
+        active_agent.set_current_block('B1.a')
+        await query.message.reply_text("🔍 Отлично! Теперь уточним детали:\n• Целевая аудитория (ЦА)\n• Сроки\n• Ограничения (бюджет, каналы и т.д.)")
+    elif action == "confirm_B1b":
+        active_agent.set_current_block('B1.c')
+        await query.message.reply_text("✅ Формулировка подтверждена. Переходим к настройкам...")
+    elif action == "refine_ca":
+        await query.message.reply_text("✏️ Уточните целевую аудиторию и JTBD (работу, которую она хочет выполнить):")
+    elif action == "show_preflight":
+        preflight = (
+            "📊 **Mini Pre-flight** (пример):\n"
+            "• Бюджет: min 50k / base 100k / max 200k ₽\n"
+            "• Ресурсы: PM, Data, FinOps (10–15 ч/нед)\n"
+            "• Данные: PII — жёлтый, доступы — есть\n"
+            "• Допущения: ЦА — предприниматели 25–45 лет\n"
+            "• Риски: зависимость от одного поставщика\n"
+            "• Метрики: North Star — LTV, Lead — конверсия"
+        )
+        await query.message.reply_text(preflight, parse_mode=ParseMode.MARKDOWN)
+    else:
+        await query.message.reply_text(f"🛠️ Действие `{action}` получено.")
 
-    # Обработка действий
-    if callback_data.startswith("orch_action:"):
-        action = callback_data.split(":", 1)[1]
-        if action == "go_to_B1a":
-            active_agent.session_data['current_block'] = 'B1.a'
-            await query.message.reply_text("🔍 Отлично! Теперь уточним детали:\n• Целевая аудитория (ЦА)\n• Сроки\n• Ограничения (бюджет, каналы и т.д.)")
-        elif action == "confirm_B1b":
-            active_agent.session_data['current_block'] = 'B1.c'
-            await query.message.reply_text("✅ Формулировка подтверждена. Переходим к настройкам...")
-        elif action == "refine_ca":
-            await query.message.reply_text("✏️ Уточните целевую аудиторию и JTBD (работу, которую она хочет выполнить):")
-        elif action == "show_preflight":
-            preflight = (
-                "📊 **Mini Pre-flight** (пример):\n"
-                "• Бюджет: min 50k / base 100k / max 200k ₽\n"
-                "• Ресурсы: PM, Data, FinOps (10–15 ч/нед)\n"
-                "• Данные: PII — жёлтый, доступы — есть\n"
-                "• Допущения: ЦА — предприниматели 25–45 лет\n"
-                "• Риски: зависимость от одного поставщика\n"
-                "• Метрики: North Star — LTV, Lead — конверсия"
-            )
-            await query.message.reply_text(preflight, parse_mode=ParseMode.MARKDOWN)
-        else:
-            await query.message.reply_text(f"🛠️ Действие `{action}` получено.")
-
-    # Обработка команд через кнопки
-    elif callback_data.startswith("orch_cmd:"):
-        cmd = callback_data.split(":", 1)[1]
-        if cmd == "s-check":
-            await query.message.reply_text("🔍 Запускаю S-CHECK (Self-Critique)...")
-            # Здесь будет вызов LLM с шаблоном S-CHECK
-        else:
-            await query.message.reply_text(f"⚙️ Команда `{cmd}` — в обработке.")
+
+async def handle_orchestrator_command(update: Update, context: ContextTypes.DEFAULT_TYPE, cmd: str):
+    """Кнопки команд Оркестратора: orch_cmd:<команда>"""
+    active_agent = await get_orchestrator_for_callback(update, context)
+    if active_agent is None:
+        return
+    # Та же таблица команд, что и для текстовых /команд агента
+    if hasattr(active_agent, 'run_command'):
+        await active_agent.run_command(update, context, cmd)
+    else:
+        await update.callback_query.message.reply_text(f"⚙️ Команда `{cmd}` — в обработке.")
+
+
+async def handle_agent_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команды агента, которые Telegram размечает как bot_command (/s-check, /benchmarks...)"""
+    active_agent = get_active_agent(context, update.message.from_user.id)
+    if active_agent and hasattr(active_agent, 'handle_input'):
+        await active_agent.handle_input(update, context, update.message.text.strip())
 
 
 def setup_main_handler(application: Application):
     """Настройка главного обработчика текстовых сообщений"""
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
+    # Неизвестные боту /команды — во внутреннюю таблицу команд активного агента
+    application.add_handler(MessageHandler(filters.COMMAND, handle_agent_command))
     # РЕГИСТРИРУЕМ КНОПКУ «📊 Мой прогресс»
-    application.add_handler(CallbackQueryHandler(show_usage_progress, pattern='^show_progress$'))
+    callback_router.route('show_progress', show_usage_progress)
     # 🔧 РЕГИСТРИРУЕМ КНОПКИ ОРКЕСТРАТОРА
-    application.add_handler(CallbackQueryHandler(handle_orchestrator_callback, pattern=r'^orch_(action|cmd):.+'))
+    callback_router.route('orch_action:', handle_orchestrator_callback, prefix=True)
+    callback_router.route('orch_cmd:', handle_orchestrator_command, prefix=True)
     logger.info("Главный обработчик сообщений настроен")
@@ -2,8 +2,8 @@
 import random
 from typing import Optional
 from datetime import datetime, timedelta
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, Application, CallbackQueryHandler
+from telegram import Update
+from telegram.ext import ContextTypes, Application
 from telegram.constants import ParseMode
 from ..config import (
     logger, SKILLTRAINER_QUESTIONS, TRAINING_MODE_DESCRIPTIONS,
@@ -14,11 +14,38 @@ from ..models import (
     active_skill_sessions, BotState, user_conversation_history
 )
 from ..utils import (
-    generate_hud, generate_hint, check_gate, format_finish_packet,
-    split_message_efficiently, mask_pii
+    generate_hud, generate_hint, check_gate,
+    mask_pii_async
 )
+from ..services.packet_export import (
+    build_packet_data, render_packet, packet_filename, packet_summary, DEFAULT_EXPORT_FORMAT, EXPORT_FORMATS
+)
+from ..services.task_bank import task_bank
+from ..services.training_engine import start_run, LocalRun
+from ..services.ui_registry import ui, Menu, build_markup
+from ..services.callback_router import callback_router
+from ..services.tracing import tracer
 from .commands import update_usage_stats
 
+MODE_DESCRIPTIONS_TEXT = "**📚 ОПИСАНИЯ РЕЖИМОВ ТРЕНИРОВКИ:**\n" + "".join(
+    f"{description}\n" for description in TRAINING_MODE_DESCRIPTIONS.values()
+)
+TRAINING_PROMPTS = {
+    TrainingMode.SIM: "🎭 **РЕЖИМ: SIM (Симуляция)**\nСейчас я создам реалистичную ситуацию для отработки вашего навыка. Готовы начать симуляцию?",
+    TrainingMode.DRILL: "💪 **РЕЖИМ: DRILL (Отработка)**\nСейчас мы будем отрабатывать конкретные техники. Начнем с базовых упражнений. Готовы?",
+    TrainingMode.BUILD: "🏗️ **РЕЖИМ: BUILD (Построение)**\nСейчас мы построим пошаговую стратегию развития вашего навыка. Начнем с фундамента. Готовы?",
+    TrainingMode.CASE: "📋 **РЕЖИМ: CASE (Кейс)**\nСейчас мы разберем реальный кейс применения вашего навыка. Готовы к анализу?",
+    TrainingMode.QUIZ: "❓ **РЕЖИМ: QUIZ (Тест)**\nСейчас я задам вопросы для проверки ваших знаний. Готовы к тесту?"
+}
+
+
+@ui.template('st_quiz')
+def build_quiz_menu(item_id: str, options: int) -> Menu:
+    """Кнопки вариантов 1..N + завершение; id вопроса в данных отсекает нажатия по старым вопросам"""
+    rows = [[(str(i), f"st_quiz_{item_id}_{i - 1}") for i in range(1, options + 1)],
+            [("🏁 Завершить сессию", "st_finish_session")]]
+    return Menu(None, build_markup(rows), None)
+
 
 # ==============================================================================
 # ИНТЕРФЕЙС СЕССИИ
@@ -56,16 +83,7 @@ async def send_skilltrainer_question(update: Update, context: ContextTypes.DEFAU
     question = SKILLTRAINER_QUESTIONS[session.current_step]
 
     if session.current_step == 6:  # Выбор режима — только через callback
-        keyboard = [
-            [InlineKeyboardButton("🎭 Sim", callback_data="st_mode_sim"),
-             InlineKeyboardButton("💪 Drill", callback_data="st_mode_drill"),
-             InlineKeyboardButton("🏗️ Build", callback_data="st_mode_build")],
-            [InlineKeyboardButton("📋 Case", callback_data="st_mode_case"),
-             InlineKeyboardButton("❓ Quiz", callback_data="st_mode_quiz"),
-             InlineKeyboardButton("ℹ️ Описания", callback_data="st_mode_info")],
-            [InlineKeyboardButton("❌ Отмена", callback_data="st_cancel")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = ui.markup('st_modes')
         if update.callback_query:
             await update.callback_query.edit_message_text(
                 f"{hud}{question}**Выберите режим тренировки:**",
@@ -116,8 +134,14 @@ async def handle_skilltrainer_response(update: Update, context: ContextTypes.DEF
         await update.message.reply_text(hint)
         return
 
+    # Ответ на вопрос/упражнение локального прогона QUIZ/DRILL
+    run = session.data.get('local_run')
+    if run and run.current:
+        await handle_local_answer(update, session, run, user_text)
+        return
+
     # 🔒 ОБЕЗЛИЧИВАНИЕ ПЕРСОНАЛЬНЫХ ДАННЫХ
-    sanitized_text = mask_pii(user_text)
+    sanitized_text = await mask_pii_async(user_text)
 
     # Сохраняем ОБЕЗЛИЧЕННЫЙ ответ
     session.add_answer(session.current_step, sanitized_text)
@@ -138,8 +162,8 @@ async def handle_skilltrainer_response(update: Update, context: ContextTypes.DEF
 # ==============================================================================
 # ОБРАБОТКА ВЫБОРА РЕЖИМА
 # ==============================================================================
-async def handle_skilltrainer_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка выбора режима тренировки"""
+async def handle_skilltrainer_mode(update: Update, context: ContextTypes.DEFAULT_TYPE, mode_data: str):
+    """Обработка выбора режима тренировки: st_mode_<режим>"""
     query = update.callback_query
     await query.answer()
     user_id = query.from_user.id
@@ -149,16 +173,10 @@ async def handle_skilltrainer_mode(update: Update, context: ContextTypes.DEFAULT
         return
 
     session = active_skill_sessions[user_id]
-    mode_data = query.data.replace('st_mode_', '')
 
     # 🔧 ИСПРАВЛЕНИЕ: обрабатываем 'info' и 'select' до проверки режимов
     if mode_data == 'info':
-        descriptions_text = "**📚 ОПИСАНИЯ РЕЖИМОВ ТРЕНИРОВКИ:**\n"
-        for description in TRAINING_MODE_DESCRIPTIONS.values():
-            descriptions_text += f"{description}\n"
-        keyboard = [[InlineKeyboardButton("🔙 Назад к выбору", callback_data="st_mode_select")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(descriptions_text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+        await query.edit_message_text(MODE_DESCRIPTIONS_TEXT, reply_markup=ui.markup('st_modes_back'), parse_mode=ParseMode.MARKDOWN)
         return
 
     if mode_data == 'select':
@@ -168,13 +186,7 @@ async def handle_skilltrainer_mode(update: Update, context: ContextTypes.DEFAULT
         return
 
     if mode_data == 'cancel':
-        if user_id in active_skill_sessions:
-            del active_skill_sessions[user_id]
-        if user_id in user_conversation_history:
-            del user_conversation_history[user_id]
-        await query.edit_message_text("❌ Сессия SKILLTRAINER отменена.")
-        from .calculator import show_business_menu_from_callback
-        await show_business_menu_from_callback(update, context)
+        await cancel_skilltrainer_session(update, context)
         return
 
     mode_map = {
@@ -195,26 +207,28 @@ async def handle_skilltrainer_mode(update: Update, context: ContextTypes.DEFAULT
         await query.edit_message_text("❓ Неизвестный режим.")
 
 
+async def cancel_skilltrainer_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопка «❌ Отмена» при выборе режима (st_cancel)"""
+    query = update.callback_query
+    await query.answer()
+    user_id = query.from_user.id
+    if user_id in active_skill_sessions:
+        del active_skill_sessions[user_id]
+    if user_id in user_conversation_history:
+        del user_conversation_history[user_id]
+    await query.edit_message_text("❌ Сессия SKILLTRAINER отменена.")
+    from .calculator import show_business_menu_from_callback
+    await show_business_menu_from_callback(update, context)
+
+
 # ==============================================================================
 # ЗАПУСК ТРЕНИРОВКИ
 # ==============================================================================
 async def start_training_session(update: Update, context: ContextTypes.DEFAULT_TYPE, session: SkillSession):
     """Запуск тренировочной сессии"""
     hud = generate_hud(session)
-    training_prompts = {
-        TrainingMode.SIM: "🎭 **РЕЖИМ: SIM (Симуляция)**\nСейчас я создам реалистичную ситуацию для отработки вашего навыка. Готовы начать симуляцию?",
-        TrainingMode.DRILL: "💪 **РЕЖИМ: DRILL (Отработка)**\nСейчас мы будем отрабатывать конкретные техники. Начнем с базовых упражнений. Готовы?",
-        TrainingMode.BUILD: "🏗️ **РЕЖИМ: BUILD (Построение)**\nСейчас мы построим пошаговую стратегию развития вашего навыка. Начнем с фундамента. Готовы?",
-        TrainingMode.CASE: "📋 **РЕЖИМ: CASE (Кейс)**\nСейчас мы разберем реальный кейс применения вашего навыка. Готовы к анализу?",
-        TrainingMode.QUIZ: "❓ **РЕЖИМ: QUIZ (Тест)**\nСейчас я задам вопросы для проверки ваших знаний. Готовы к тесту?"
-    }
-    prompt = training_prompts.get(session.selected_mode, "Начинаем тренировку...")
-    keyboard = [
-        [InlineKeyboardButton("✅ Начать тренировку", callback_data="st_start_training")],
-        [InlineKeyboardButton("🔙 Выбрать другой режим", callback_data="st_mode_select")],
-        [InlineKeyboardButton("❌ Завершить", callback_data="st_finish_early")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    prompt = TRAINING_PROMPTS.get(session.selected_mode, "Начинаем тренировку...")
+    reply_markup = ui.markup('st_training_start')
     if update.callback_query:
         await update.callback_query.edit_message_text(
             f"{hud}{prompt}",
@@ -232,24 +246,10 @@ async def start_training_session(update: Update, context: ContextTypes.DEFAULT_T
 # ==============================================================================
 # ГЕНЕРАЦИЯ ЗАДАНИЯ
 # ==============================================================================
-async def handle_training_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Генерация и отправка тренировочного задания через Groq"""
-    query = update.callback_query
-    await query.answer()
-    user_id = query.from_user.id
-
-    if user_id not in active_skill_sessions:
-        await query.edit_message_text("❌ Сессия не найдена.")
-        return
-
-    session = active_skill_sessions[user_id]
-    session.state = SessionState.TRAINING
-    groq_client = context.application.bot_data.get('groq_client')
-
-    if groq_client:
-        try:
-            answers_text = "".join([f"Вопрос {i+1}: {answer}" for i, answer in session.answers.items()])
-            training_request = f"""Пользователь хочет развить навык. Вот его ответы на диагностику:
+def generate_training_task(groq_client, session: SkillSession) -> str:
+    """Персональное задание через Groq по ответам диагностики (промах банка заданий)"""
+    answers_text = "".join([f"Вопрос {i+1}: {answer}" for i, answer in session.answers.items()])
+    training_request = f"""Пользователь хочет развить навык. Вот его ответы на диагностику:
 {answers_text}
 Выбранный режим тренировки: {session.selected_mode.name if session.selected_mode else 'Не выбран'}
 Создай одно тренировочное задание в выбранном режиме. Задание должно быть:
@@ -267,24 +267,50 @@ async def handle_training_start(update: Update, context: ContextTypes.DEFAULT_TY
 3. [Критерий 3]
 **ПОДСКАЗКА:** [Короткая подсказка ≤240 символов]"""
 
-            messages = [{"role": "system", "content": SYSTEM_PROMPTS['skilltrainer']}, {"role": "user", "content": training_request}]
-            await query.edit_message_text(f"{generate_hud(session)}🎯 Генерирую задание...")
-            chat_completion = groq_client.chat.completions.create(
-                messages=messages,
-                model="llama-3.1-8b-instant",
-                max_tokens=1500
-            )
-            training_task = chat_completion.choices[0].message.content
-            session.data = {'training_task': training_task}
+    messages = [{"role": "system", "content": SYSTEM_PROMPTS['skilltrainer']}, {"role": "user", "content": training_request}]
+    with tracer.span('llm'):
+        chat_completion = groq_client.chat.completions.create(
+            messages=messages,
+            model="llama-3.1-8b-instant",
+            max_tokens=1500
+        )
+    return chat_completion.choices[0].message.content
+
+
+async def handle_training_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Отправка тренировочного задания: из банка заданий, при промахе — генерация через Groq"""
+    query = update.callback_query
+    await query.answer()
+    user_id = query.from_user.id
+
+    if user_id not in active_skill_sessions:
+        await query.edit_message_text("❌ Сессия не найдена.")
+        return
+
+    session = active_skill_sessions[user_id]
+    session.state = SessionState.TRAINING
+    groq_client = context.application.bot_data.get('groq_client')
+
+    # ⚡ QUIZ / DRILL — локальный движок по банку элементов, без LLM
+    run = start_run(session)
+    if run:
+        session.data['local_run'] = run
+        await send_local_item(update, session, run)
+        return
+
+    # 📦 Сначала — банк заданий: готовое задание по навыку/режиму/уровню без вызова LLM
+    training_task = task_bank.take(user_id, session)
+    task_bank.schedule_refill(session, groq_client)
+
+    if training_task or groq_client:
+        try:
+            if training_task is None:
+                await query.edit_message_text(f"{generate_hud(session)}🎯 Генерирую задание...")
+                training_task = generate_training_task(groq_client, session)
+            session.data['training_task'] = training_task
             session.training_complete = True
             check_gate(session, "training_complete")
-            keyboard = [
-                [InlineKeyboardButton("✅ Задание выполнено", callback_data="st_task_done")],
-                [InlineKeyboardButton("💡 Нужна подсказка", callback_data="st_need_hint")],
-                [InlineKeyboardButton("🔄 Другое задание", callback_data="st_another_task")],
-                [InlineKeyboardButton("🏁 Завершить сессию", callback_data="st_finish_session")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            reply_markup = ui.markup('st_task')
             await query.edit_message_text(
                 f"{generate_hud(session)}{training_task}",
                 reply_markup=reply_markup,
@@ -303,6 +329,51 @@ async def handle_training_start(update: Update, context: ContextTypes.DEFAULT_TY
         )
 
 
+# ==============================================================================
+# ЛОКАЛЬНЫЙ ДВИЖОК QUIZ / DRILL
+# ==============================================================================
+async def send_local_item(update: Update, session: SkillSession, run: LocalRun):
+    """Отправка следующего вопроса/упражнения локального прогона (или итога)"""
+    item = run.next_item()
+    if item is None:
+        await finish_local_run(update, session, run)
+        return
+    header = f"{generate_hud(session)}\n{'❓' if run.kind == 'quiz' else '💪'} **{run.answered + 1}/{run.total}.** {item.prompt}"
+    if run.kind == 'quiz':
+        options = "\n".join(f"{i}. {option}" for i, option in enumerate(item.options, 1))
+        reply_markup = ui.markup('st_quiz', item_id=item.id, options=len(item.options))
+        text = f"{header}\n{options}"
+    else:
+        reply_markup = ui.markup('st_finish_session')
+        text = f"{header}\n✍️ Напишите ответ сообщением."
+    if update.callback_query:
+        await update.callback_query.message.reply_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+    elif update.message:
+        await update.message.reply_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+
+
+async def handle_local_answer(update: Update, session: SkillSession, run: LocalRun, answer: str):
+    """Локальная оценка ответа и переход к следующему элементу"""
+    _, feedback = run.score(answer)
+    message = update.callback_query.message if update.callback_query else update.message
+    await message.reply_text(feedback)
+    if run.current is None:  # ответ принят — дальше; иначе ждём корректный вариант
+        await send_local_item(update, session, run)
+
+
+async def finish_local_run(update: Update, session: SkillSession, run: LocalRun):
+    """Итог локального прогона"""
+    session.data.pop('local_run', None)
+    session.data['training_task'] = run.summary()
+    session.training_complete = True
+    check_gate(session, "training_complete")
+    message = update.callback_query.message if update.callback_query else update.message
+    await message.reply_text(
+        f"{generate_hud(session)}\n{run.summary()}",
+        reply_markup=ui.markup('st_next_task')
+    )
+
+
 # ==============================================================================
 # ЗАВЕРШЕНИЕ ИНТЕРВЬЮ
 # ==============================================================================
@@ -351,13 +422,13 @@ async def finish_skilltrainer_session(update: Update, context: ContextTypes.DEFA
             elif update.message:
                 await update.message.reply_text(f"{generate_hud(session)}🎓 Формирую Finish Packet...")
 
-            chat_completion = groq_client.chat.completions.create(
-                messages=messages,
-                model="llama-3.1-8b-instant",
-                max_tokens=4000
-            )
+            with tracer.span('llm'):
+                chat_completion = groq_client.chat.completions.create(
+                    messages=messages,
+                    model="llama-3.1-8b-instant",
+                    max_tokens=4000
+                )
             ai_response = chat_completion.choices[0].message.content
-            session.finish_packet = format_finish_packet(session, ai_response)
             await update_usage_stats(session.user_id, 'skilltrainer')
 
             # Очистка после завершения
@@ -367,31 +438,12 @@ async def finish_skilltrainer_session(update: Update, context: ContextTypes.DEFA
                 del user_conversation_history[session.user_id]
 
             # Финальное меню
-            keyboard = [
-                [InlineKeyboardButton("🎁 Пригласить друга", callback_data="st_referral")],
-                [InlineKeyboardButton("🔄 Новая сессия", callback_data="st_new_session")],
-                [InlineKeyboardButton("🔙 В меню", callback_data="main_menu")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            parts = split_message_efficiently(session.finish_packet)
-            for part in parts:
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(part)
-                elif update.message:
-                    await update.message.reply_text(part)
+            reply_markup = ui.markup('st_finish_packet')
 
-            if update.callback_query:
-                await update.callback_query.message.reply_text(
-                    "✅ **СЕССИЯ SKILLTRAINER ЗАВЕРШЕНА!**\nВы можете пригласить друга или начать новую сессию.",
-                    reply_markup=reply_markup,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            elif update.message:
-                await update.message.reply_text(
-                    "✅ **СЕССИЯ SKILLTRAINER ЗАВЕРШЕНА!**\nВы можете пригласить друга или начать новую сессию.",
-                    reply_markup=reply_markup,
-                    parse_mode=ParseMode.MARKDOWN
-                )
+            # Finish Packet — одним документом с краткой подписью (один запрос к Bot API)
+            packet = build_packet_data(session, ai_response)
+            context.user_data['last_finish_packet'] = packet
+            await send_finish_packet(update, packet, DEFAULT_EXPORT_FORMAT, reply_markup)
         except Exception as e:
             logger.error(f"Ошибка генерации Finish Packet: {e}")
             if update.callback_query:
@@ -409,6 +461,18 @@ async def finish_skilltrainer_session(update: Update, context: ContextTypes.DEFA
             )
 
 
+async def send_finish_packet(update: Update, packet: dict, fmt: str, reply_markup=None):
+    """Отправка Finish Packet файлом из буфера в памяти"""
+    message = update.callback_query.message if update.callback_query else update.message
+    document = render_packet(packet, fmt)
+    await message.reply_document(
+        document=document,
+        filename=packet_filename(packet, fmt),
+        caption=packet_summary(packet),
+        reply_markup=reply_markup
+    )
+
+
 # ==============================================================================
 # ОБРАБОТКА ДЕЙСТВИЙ ПОСЛЕ ЗАДАНИЯ
 # ==============================================================================
@@ -443,12 +507,7 @@ async def handle_skilltrainer_actions(update: Update, context: ContextTypes.DEFA
             f"{generate_hud(session)}\n✅ **Отлично! Задание выполнено.**\nХотите получить еще одно задание или завершить сессию?",
             parse_mode=ParseMode.MARKDOWN
         )
-        keyboard = [
-            [InlineKeyboardButton("🔄 Еще задание", callback_data="st_another_task")],
-            [InlineKeyboardButton("🏁 Завершить сессию", callback_data="st_finish_session")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.message.reply_text("Выберите действие:", reply_markup=reply_markup)
+        await query.message.reply_text("Выберите действие:", reply_markup=ui.markup('st_next_task'))
 
     elif action == "st_need_hint":
         hint = generate_hint(session)
@@ -462,12 +521,47 @@ async def handle_skilltrainer_actions(update: Update, context: ContextTypes.DEFA
         await finish_skilltrainer_session(update, context, session)
 
 
+async def handle_packet_export(update: Update, context: ContextTypes.DEFAULT_TYPE, fmt: str):
+    """Повторная выгрузка Finish Packet: st_export_<формат>"""
+    query = update.callback_query
+    await query.answer()
+    packet = context.user_data.get('last_finish_packet')
+    if not packet:
+        await query.message.reply_text("❌ Finish Packet не найден. Завершите сессию заново.")
+        return
+    # Неизвестный суффикс (старая или подделанная кнопка) — формат по умолчанию, а не ValueError
+    await send_finish_packet(update, packet, fmt if fmt in EXPORT_FORMATS else DEFAULT_EXPORT_FORMAT)
+
+
+async def handle_quiz_option(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str):
+    """Кнопка варианта QUIZ: st_quiz_<id вопроса>_<номер с нуля>"""
+    query = update.callback_query
+    session = active_skill_sessions.get(query.from_user.id)
+    if session is None:
+        await query.answer()
+        await query.edit_message_text("❌ Сессия не найдена.")
+        return
+    item_id, _, index = payload.rpartition('_')
+    run = session.data.get('local_run')
+    # Повторное нажатие или кнопка старого вопроса не должны отвечать на текущий
+    if not (run and run.current and run.current.id == item_id and index.isdigit()):
+        await query.answer("Этот вопрос уже закрыт.")
+        return
+    await query.answer()
+    await handle_local_answer(update, session, run, str(int(index) + 1))
+
+
 # ==============================================================================
 # НАСТРОЙКА ОБРАБОТЧИКОВ
 # ==============================================================================
 def setup_skilltrainer_handlers(application: Application):
     """Регистрация всех обработчиков SKILLTRAINER"""
-    application.add_handler(CallbackQueryHandler(handle_skilltrainer_mode, pattern='^st_mode_.+$'))
-    application.add_handler(CallbackQueryHandler(handle_training_start, pattern='^st_start_training$'))
-    application.add_handler(CallbackQueryHandler(handle_skilltrainer_actions, pattern='^st_.+$'))
+    callback_router.route('st_mode_', handle_skilltrainer_mode, prefix=True)
+    callback_router.route('st_cancel', cancel_skilltrainer_session)
+    callback_router.route('st_start_training', handle_training_start)
+    callback_router.route('st_export_', handle_packet_export, prefix=True)
+    callback_router.route('st_quiz_', handle_quiz_option, prefix=True)
+    for action in ('st_referral', 'st_new_session', 'st_task_done', 'st_need_hint',
+                   'st_another_task', 'st_finish_early', 'st_finish_session'):
+        callback_router.route(action, handle_skilltrainer_actions)
     logger.info("SKILLTRAINER обработчики настроены")
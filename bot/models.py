@@ -1,11 +1,18 @@
 """Модели данных бота"""
 import time
 import hashlib
-from typing import Dict, Any, List, Optional, Set
+import json
+import sys
+import zlib
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from collections import OrderedDict
 from enum import Enum
 
+from .config import logger
+
+HISTORY_COMPRESS_LEVEL = 6
+
 
 class LRUCache:
     """Кэш с алгоритмом LRU (Least Recently Used)"""
@@ -106,8 +113,55 @@ class TrainingMode(Enum):
     QUIZ = "quiz"
 
 
+class SkillGate(Enum):
+    """Гейты SKILLTRAINER; порядок членов задаёт номер бита в маске сессии"""
+    INTERVIEW_COMPLETE = "interview_complete"
+    MODE_SELECTED = "mode_selected"
+    TRAINING_COMPLETE = "training_complete"
+
+
+GATE_BITS: Dict[str, int] = {gate.value: 1 << index for index, gate in enumerate(SkillGate)}
+
+
+class GateSet:
+    """Представление битовой маски гейтов сессии как множества id (add / in / len / итерация)"""
+    __slots__ = ('_session',)
+
+    def __init__(self, session: 'SkillSession'):
+        self._session = session
+
+    def add(self, gate_id: str):
+        self._session.gates_mask |= GATE_BITS[gate_id]
+
+    def update(self, gate_ids):
+        for gate_id in gate_ids:
+            self.add(gate_id)
+
+    def discard(self, gate_id: str):
+        self._session.gates_mask &= ~GATE_BITS.get(gate_id, 0)
+
+    def __contains__(self, gate_id: str) -> bool:
+        return bool(self._session.gates_mask & GATE_BITS.get(gate_id, 0))
+
+    def __iter__(self):
+        mask = self._session.gates_mask
+        return (gate_id for gate_id, bit in GATE_BITS.items() if mask & bit)
+
+    def __len__(self) -> int:
+        return bin(self._session.gates_mask).count('1')
+
+    def __bool__(self) -> bool:
+        return bool(self._session.gates_mask)
+
+
 class SkillSession:
     """Сессия SKILLTRAINER"""
+    __slots__ = (
+        'user_id', 'state', 'current_step', 'max_steps', 'answers', 'selected_mode',
+        'gates_mask', 'last_hint', 'created_at', 'progress', 'finish_packet',
+        'training_complete', 'data',
+    )
+
     def __init__(self, user_id: int):
         self.user_id = user_id
         self.state: SessionState = SessionState.INTERVIEW
@@ -115,12 +169,18 @@ class SkillSession:
         self.max_steps: int = 8
         self.answers: Dict[int, str] = {}
         self.selected_mode: Optional[TrainingMode] = None
-        self.gates_passed: Set[str] = set()
+        self.gates_mask: int = 0
         self.last_hint: Optional[str] = None
         self.created_at: datetime = datetime.now()
         self.progress: float = 0.0
         self.finish_packet: Optional[str] = None
         self.training_complete: bool = False
+        self.data: Dict[str, Any] = {}
+
+    @property
+    def gates_passed(self) -> GateSet:
+        """Пройденные гейты (битовая маска gates_mask в виде множества)"""
+        return GateSet(self)
 
     def update_progress(self):
         """Обновить прогресс сессии"""
@@ -134,7 +194,7 @@ class SkillSession:
 
     def pass_gate(self, gate_id: str):
         """Отметить пройденный гейт"""
-        self.gates_passed.add(gate_id)
+        self.gates_mask |= GATE_BITS[gate_id]
 
     def set_hint(self, hint: str):
         """Установить подсказку"""
@@ -143,7 +203,131 @@ class SkillSession:
 
     def is_gate_passed(self, gate_id: str) -> bool:
         """Проверить пройден ли гейт"""
-        return gate_id in self.gates_passed
+        return bool(self.gates_mask & GATE_BITS.get(gate_id, 0))
+
+
+class ConversationHistory:
+    """
+    История диалога с AI фиксированной ёмкости: кольцевой буфер реплик
+    (роль, текст). Старые реплики перезаписываются, срезов и копий нет.
+    У затихшего пользователя реплики упаковываются в один zlib-блоб (pack)
+    и распаковываются при следующем обращении.
+    """
+    __slots__ = ('_turns', '_start', '_size', '_packed', 'last_activity')
+
+    def __init__(self, capacity: int = 15):
+        self._turns: List[Optional[tuple]] = [None] * capacity
+        self._start = 0
+        self._size = 0
+        self._packed: Optional[bytes] = None
+        self.last_activity: float = time.monotonic()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def packed(self) -> bool:
+        return self._packed is not None
+
+    def append(self, role: str, content: str):
+        """Добавить реплику, вытеснив самую старую при заполнении"""
+        if self._packed is not None:
+            self.unpack()
+        capacity = len(self._turns)
+        self._turns[(self._start + self._size) % capacity] = (role, content)
+        if self._size < capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % capacity
+
+    def messages(self, limit: Optional[int] = None):
+        """Последние limit реплик в формате сообщений API (от старых к новым)"""
+        if self._packed is not None:
+            self.unpack()
+        count = self._size if limit is None else min(limit, self._size)
+        capacity = len(self._turns)
+        for offset in range(self._size - count, self._size):
+            role, content = self._turns[(self._start + offset) % capacity]
+            yield {"role": role, "content": content}
+
+    def pack(self) -> Tuple[int, int]:
+        """Упаковать реплики в сжатый блоб. Возвращает (байт до, байт после)"""
+        if self._packed is not None or not self._size:
+            return 0, 0
+        turns = [turn for turn in (self._turns[self._start:] + self._turns[:self._start]) if turn is not None]
+        raw = json.dumps(turns, ensure_ascii=False).encode('utf-8')
+        self._packed = zlib.compress(raw, HISTORY_COMPRESS_LEVEL)
+        raw_size = sum(sys.getsizeof(role) + sys.getsizeof(content) for role, content in turns)
+        self._turns = [None] * len(self._turns)
+        self._start = 0
+        return raw_size, len(self._packed)
+
+    def unpack(self):
+        """Восстановить реплики из блоба (порядок — от старых к новым)"""
+        turns = json.loads(zlib.decompress(self._packed))
+        self._packed = None
+        for index, (role, content) in enumerate(turns):
+            self._turns[index] = (role, content)
+        self._start = 0
+        self._size = len(turns)
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def expired(self, ttl_seconds: float) -> bool:
+        return self.idle_seconds() > ttl_seconds
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_activity
+
+
+class HistoryStore(dict):
+    """
+    {user_id: ConversationHistory} с уровнями хранения: активные истории —
+    строками, затихшие дольше idle_seconds — сжатыми, истёкшие по TTL удаляются.
+    Проход по хранилищу (compact) запускается из обработчиков не чаще
+    раза в sweep_interval секунд.
+    """
+    def __init__(self, idle_seconds: float, ttl_seconds: float, sweep_interval: float = 60.0):
+        super().__init__()
+        self.idle_seconds = idle_seconds
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+        self.stats = {'packed': 0, 'expired': 0, 'raw_bytes': 0, 'packed_bytes': 0, 'pack_seconds': 0.0}
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.stats['raw_bytes'] / self.stats['packed_bytes'] if self.stats['packed_bytes'] else 0.0
+
+    def maybe_compact(self):
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.compact()
+
+    def compact(self):
+        """Сжать затихшие истории и удалить истёкшие"""
+        self._last_sweep = time.monotonic()
+        started = time.perf_counter()
+        packed = 0
+        for user_id, history in list(self.items()):
+            idle = history.idle_seconds()
+            if idle > self.ttl_seconds:
+                del self[user_id]
+                self.stats['expired'] += 1
+            elif idle > self.idle_seconds and not history.packed:
+                raw_size, packed_size = history.pack()
+                if packed_size:
+                    packed += 1
+                    self.stats['raw_bytes'] += raw_size
+                    self.stats['packed_bytes'] += packed_size
+        elapsed = time.perf_counter() - started
+        self.stats['packed'] += packed
+        self.stats['pack_seconds'] += elapsed
+        if packed:
+            logger.info(
+                f"История: сжато {packed} за {elapsed * 1000:.1f} мс, "
+                f"коэффициент {self.compression_ratio:.1f}x, всего {len(self)}"
+            )
 
 
 # ==============================================================================
@@ -156,6 +340,7 @@ rate_limiter = RateLimiter(max_requests=15, window_seconds=60)
 ai_cache = AIResponseCache(max_size=100)
 active_skill_sessions: Dict[int, SkillSession] = {}
 
-# Новый кэш истории с TTL = 1 час
-# Формат: {user_id: {"history": [{"role": "...", "content": "..."}], "last_activity": datetime}}
-user_conversation_history: Dict[int, Dict[str, Any]] = {}
+# Кэш истории с TTL = 1 час: {user_id: ConversationHistory}; после 5 минут тишины — сжатие
+HISTORY_TTL_SECONDS = 3600
+HISTORY_IDLE_SECONDS = 300
+user_conversation_history = HistoryStore(idle_seconds=HISTORY_IDLE_SECONDS, ttl_seconds=HISTORY_TTL_SECONDS)
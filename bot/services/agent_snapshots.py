@@ -0,0 +1,120 @@
+"""Снимки сессий UAF-агентов: сохранение после перехода между блоками и ленивое восстановление"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from ..config import logger, AGENT_SNAPSHOT_DIR
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_TTL = timedelta(days=7)
+
+
+class AgentSnapshotStore:
+    """
+    Хранилище снимков в JSON-файлах (по файлу на пользователя).
+    Запись атомарная: временный файл + os.replace.
+    Индекс пользователей со снимками держится в памяти, чтобы ленивое
+    восстановление не трогало диск на каждом сообщении.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._index = set()
+        if os.path.isdir(directory):
+            self._index = {
+                int(name[:-5]) for name in os.listdir(directory)
+                if name.endswith('.json') and name[:-5].lstrip('-').isdigit()
+            }
+        self.stats = {
+            'saves': 0,
+            'save_bytes_total': 0,
+            'last_save_bytes': 0,
+            'restores': 0,
+            'restore_ms_total': 0.0,
+            'last_restore_ms': 0.0,
+        }
+
+    def _path(self, user_id: int) -> str:
+        return os.path.join(self.directory, f"{int(user_id)}.json")
+
+    def has(self, user_id: int) -> bool:
+        """Есть ли сохранённый снимок пользователя"""
+        return user_id in self._index
+
+    def save(self, user_id: int, snapshot: Dict[str, Any]):
+        """Сохранить снимок пользователя"""
+        payload = json.dumps(
+            {'v': SNAPSHOT_VERSION, 'saved_at': datetime.now().isoformat(), **snapshot},
+            ensure_ascii=False, separators=(',', ':'), default=str
+        ).encode('utf-8')
+        path = self._path(user_id)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить снимок агента {user_id}: {e}")
+            return
+        self._index.add(user_id)
+        self.stats['saves'] += 1
+        self.stats['save_bytes_total'] += len(payload)
+        self.stats['last_save_bytes'] = len(payload)
+        logger.info(f"Снимок агента {user_id}: блок {snapshot.get('session', {}).get('current_block')}, {len(payload)} байт")
+
+    def load(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Загрузить снимок (None — нет, устарел или повреждён)"""
+        if user_id not in self._index:
+            return None
+        path = self._path(user_id)
+        try:
+            with open(path, 'rb') as f:
+                snapshot = json.loads(f.read().decode('utf-8'))
+            saved_at = datetime.fromisoformat(snapshot['saved_at'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Повреждённый снимок агента {user_id}: {e}")
+            self.delete(user_id)
+            return None
+        if snapshot.get('v') != SNAPSHOT_VERSION or datetime.now() - saved_at > SNAPSHOT_TTL:
+            self.delete(user_id)
+            return None
+        return snapshot
+
+    def delete(self, user_id: int):
+        """Удалить снимок пользователя"""
+        if user_id not in self._index:
+            return
+        self._index.discard(user_id)
+        try:
+            os.remove(self._path(user_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Не удалось удалить снимок агента {user_id}: {e}")
+
+    def restore_agent(self, user_id: int, groq_client):
+        """Восстановить агента из снимка (None — снимка нет)"""
+        started = time.perf_counter()
+        snapshot = self.load(user_id)
+        if snapshot is None:
+            return None
+        agent_type = snapshot.get('agent')
+        if agent_type == 'orchestrator':
+            from ..agents.implementations.orchestrator_agent import OrchestratorAgent
+            agent = OrchestratorAgent(user_id, groq_client)
+        else:
+            logger.warning(f"Неизвестный тип агента в снимке {user_id}: {agent_type}")
+            return None
+        agent.load_snapshot(snapshot)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats['restores'] += 1
+        self.stats['restore_ms_total'] += elapsed_ms
+        self.stats['last_restore_ms'] = elapsed_ms
+        logger.info(f"Агент {agent_type} пользователя {user_id} восстановлен из снимка за {elapsed_ms:.1f} мс "
+                    f"(блок {agent.get_current_block()})")
+        return agent
+
+
+agent_snapshot_store = AgentSnapshotStore(AGENT_SNAPSHOT_DIR)
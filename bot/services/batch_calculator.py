@@ -0,0 +1,284 @@
+"""Пакетный расчёт экономики маркетплейса: CSV/XLSX с SKU → метрики и рекомендации массивами NumPy"""
+import csv
+import io
+import math
+import os
+import re
+from typing import Dict, IO, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import BENCHMARKS, RECOMMENDATION_RULES, RECOMMENDATION_OK
+
+BATCH_EXTENSIONS = ('.csv', '.xlsx')
+BATCH_CHUNK_ROWS = 10_000       # строк в одном массиве — потолок памяти не зависит от размера файла
+BATCH_MAX_ROWS = 200_000
+
+# Входные колонки в порядке calculate_economy_metrics и их допустимые заголовки
+INPUT_COLUMNS = ('себестоимость', 'цена', 'комиссия_%', 'логистика_%', 'acos_%', 'налог_%')
+COLUMN_ALIASES = {
+    'sku': ('sku', 'артикул', 'товар', 'название', 'id'),
+    'себестоимость': ('себестоимость', 'закупка', 'cost'),
+    'цена': ('цена', 'ценапродажи', 'продажнаяцена', 'price'),
+    'комиссия_%': ('комиссия', 'комиссиямп', 'комиссиямаркетплейса', 'commission', 'fee'),
+    'логистика_%': ('логистика', 'логистикаfbs', 'logistics'),
+    'acos_%': ('acos', 'реклама', 'drr', 'дрр'),
+    'налог_%': ('налог', 'налогусн', 'усн', 'tax'),
+}
+OUTPUT_METRICS = (
+    'комиссия', 'логистика', 'реклама', 'налог', 'cm1', 'маржа_cm1_%',
+    'cm2', 'маржа_cm2_%', 'чистая_прибыль', 'чистая_маржа_%', 'наценка_%',
+)
+
+_HEADER_JUNK_RE = re.compile(r'\(.*?\)|руб\.?|₽|[\s_%,.]+')
+
+
+class BatchError(ValueError):
+    """Файл нельзя обработать (нет колонок, неподдерживаемый формат и т.п.)"""
+
+
+def economy_metrics_batch(inputs: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Векторный аналог calculate_economy_metrics: inputs — массив (n, 6)
+    в порядке INPUT_COLUMNS, результат — те же ключи, значения — массивы длины n.
+    """
+    себестоимость, цена, комиссия_процент, логистика_процент, acos_процент, налог_процент = inputs.T
+    выручка = цена
+    комиссия = выручка * комиссия_процент / 100
+    логистика = выручка * логистика_процент / 100
+    cm1 = выручка - себестоимость - комиссия - логистика
+    реклама = выручка * acos_процент / 100
+    cm2 = cm1 - реклама
+    налог = выручка * налог_процент / 100
+    чистая_прибыль = cm2 - налог
+
+    def percent_of(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        result = np.zeros_like(numerator)
+        np.divide(numerator * 100, denominator, out=result, where=denominator > 0)
+        return result
+
+    return {
+        'выручка': выручка,
+        'себестоимость': себестоимость,
+        'комиссия': комиссия,
+        'комиссия_%': комиссия_процент,
+        'логистика': логистика,
+        'логистика_%': логистика_процент,
+        'cm1': cm1,
+        'маржа_cm1_%': percent_of(cm1, выручка),
+        'реклама': реклама,
+        'acos_%': acos_процент,
+        'cm2': cm2,
+        'маржа_cm2_%': percent_of(cm2, выручка),
+        'налог': налог,
+        'налог_%': налог_процент,
+        'чистая_прибыль': чистая_прибыль,
+        'чистая_маржа_%': percent_of(чистая_прибыль, выручка),
+        'наценка_%': percent_of(цена - себестоимость, себестоимость),
+    }
+
+
+def recommendation_codes(metrics: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Рекомендации по всем строкам сразу: по 2 бита на правило RECOMMENDATION_RULES
+    (01 — выше порога, 10 — ниже), код строки — их сумма.
+    """
+    codes = np.zeros(len(metrics['выручка']), dtype=np.int32)
+    for index, (metric, benchmark, high_key, _, low_key, _) in enumerate(RECOMMENDATION_RULES):
+        values = metrics[metric]
+        high = values > BENCHMARKS[benchmark][high_key]
+        low = ~high & (values < BENCHMARKS[benchmark][low_key])
+        codes |= high.astype(np.int32) << (2 * index)
+        codes |= low.astype(np.int32) << (2 * index + 1)
+    return codes
+
+
+_RECOMMENDATION_TEXT_CACHE: Dict[int, str] = {}
+
+
+def recommendation_text(code: int) -> str:
+    """Текст рекомендаций по коду строки (комбинаций мало — кэшируется)"""
+    text = _RECOMMENDATION_TEXT_CACHE.get(code)
+    if text is None:
+        parts = []
+        for index, (_, _, _, high_text, _, low_text) in enumerate(RECOMMENDATION_RULES):
+            if code >> (2 * index) & 1:
+                parts.append(high_text)
+            elif code >> (2 * index + 1) & 1:
+                parts.append(low_text)
+        text = _RECOMMENDATION_TEXT_CACHE[code] = " | ".join(parts) if parts else RECOMMENDATION_OK
+    return text
+
+
+def normalize_header(name) -> str:
+    return _HEADER_JUNK_RE.sub('', str(name or '').lower())
+
+
+def resolve_columns(header: Sequence) -> Tuple[Optional[int], List[int]]:
+    """Индексы колонки SKU (может отсутствовать) и шести входных колонок"""
+    normalized = [normalize_header(name) for name in header]
+    positions = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        for index, name in enumerate(normalized):
+            if name in aliases and index not in positions.values():
+                positions[column] = index
+                break
+    missing = [column for column in INPUT_COLUMNS if column not in positions]
+    if missing:
+        raise BatchError(f"Не найдены колонки: {', '.join(missing)}")
+    return positions.get('sku'), [positions[column] for column in INPUT_COLUMNS]
+
+
+def _read_csv_rows(path: str) -> Iterator[Sequence]:
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def _read_xlsx_rows(path: str) -> Iterator[Sequence]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise BatchError("Для XLSX нужен пакет openpyxl. Сохраните таблицу как CSV.")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(path: str) -> Iterator[Sequence]:
+    """Строки файла (включая заголовок) потоком, без загрузки таблицы целиком"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return _read_csv_rows(path)
+    if extension == '.xlsx':
+        return _read_xlsx_rows(path)
+    raise BatchError(f"Поддерживаются файлы {', '.join(BATCH_EXTENSIONS)}")
+
+
+def _to_number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # «1 234,50» из русской локали Excel
+        return float(str(value).replace('\xa0', '').replace(' ', '').replace(',', '.'))
+
+
+class BatchSummary:
+    """Агрегаты по файлу, накапливаемые по чанкам"""
+    __slots__ = ('rows', 'skipped', 'truncated', 'profitable', 'net_profit_sum', 'net_margin_sum', 'recommendation_counts')
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.truncated = False
+        self.profitable = 0
+        self.net_profit_sum = 0.0
+        self.net_margin_sum = 0.0
+        self.recommendation_counts = np.zeros(2 * len(RECOMMENDATION_RULES), dtype=np.int64)
+
+    def add_chunk(self, metrics: Dict[str, np.ndarray], codes: np.ndarray):
+        self.rows += len(codes)
+        self.profitable += int(np.count_nonzero(metrics['чистая_прибыль'] > 0))
+        self.net_profit_sum += float(metrics['чистая_прибыль'].sum())
+        self.net_margin_sum += float(metrics['чистая_маржа_%'].sum())
+        for bit in range(len(self.recommendation_counts)):
+            self.recommendation_counts[bit] += int(np.count_nonzero(codes >> bit & 1))
+
+    def top_recommendations(self, limit: int = 3) -> List[Tuple[str, int]]:
+        texts = []
+        for _, _, _, high_text, _, low_text in RECOMMENDATION_RULES:
+            texts.extend((high_text, low_text))
+        ranked = sorted(zip(texts, self.recommendation_counts.tolist()), key=lambda item: -item[1])
+        return [(text, count) for text, count in ranked[:limit] if count]
+
+    def report(self) -> str:
+        if not self.rows:
+            return "❌ В файле нет строк с корректными числами."
+        lines = [
+            "📦 **ПАКЕТНЫЙ РАСЧЁТ**",
+            f"• Обработано SKU: {self.rows}" + (f" (пропущено строк с ошибками: {self.skipped})" if self.skipped else ""),
+            f"• Прибыльных: {self.profitable} ({self.profitable / self.rows:.0%})",
+            f"• Средняя чистая прибыль: {self.net_profit_sum / self.rows:.1f} ₽ на единицу",
+            f"• Средняя чистая маржа: {self.net_margin_sum / self.rows:.1f}%",
+        ]
+        if self.truncated:
+            lines.append(f"⚠️ Обработаны первые {BATCH_MAX_ROWS} строк.")
+        top = self.top_recommendations()
+        if top:
+            lines.append("💡 **ЧАЩЕ ВСЕГО:**")
+            lines.extend(f"• {text} — {count} SKU" for text, count in top)
+        return "\n".join(lines)
+
+
+OUTPUT_HEADER = ('sku', *INPUT_COLUMNS, *OUTPUT_METRICS, 'рекомендации')
+# Строка результата одним %-форматом: вдвое быстрее csv.writer на 18 числах
+_FORMULA_PREFIXES = ('=', '+', '-', '@')
+_ROW_FORMAT = ';'.join(['%s'] + ['%.2f'] * (len(INPUT_COLUMNS) + len(OUTPUT_METRICS)) + ['%s']) + '\r\n'
+
+
+def _csv_field(value: str) -> str:
+    # Ячейка с =, +, - или @ в начале — формула для Excel: экранируем апострофом
+    if value.startswith(_FORMULA_PREFIXES):
+        value = "'" + value
+    if any(char in value for char in ';"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _write_chunk(text: IO[str], skus: List[str], inputs: np.ndarray, summary: BatchSummary):
+    metrics = economy_metrics_batch(inputs)
+    codes = recommendation_codes(metrics)
+    summary.add_chunk(metrics, codes)
+    columns = np.column_stack([inputs] + [metrics[name] for name in OUTPUT_METRICS]).tolist()
+    text.writelines(
+        _ROW_FORMAT % (_csv_field(sku), *values, recommendation_text(code))
+        for sku, values, code in zip(skus, columns, codes.tolist())
+    )
+
+
+def process_batch(path: str, output: IO[bytes], chunk_rows: int = BATCH_CHUNK_ROWS) -> BatchSummary:
+    """
+    Построчно читает файл, считает метрики чанками по chunk_rows строк
+    и пишет CSV с результатами в output (бинарный поток).
+    """
+    rows = read_rows(path)
+    header = next(rows, None)
+    if header is None:
+        raise BatchError("Файл пустой.")
+    sku_index, input_indexes = resolve_columns(header)
+
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    text.write(';'.join(OUTPUT_HEADER) + '\r\n')
+
+    summary = BatchSummary()
+    buffer = np.empty((chunk_rows, len(INPUT_COLUMNS)), dtype=np.float64)
+    skus: List[str] = []
+    for row_number, row in enumerate(rows, start=2):
+        if summary.rows + len(skus) >= BATCH_MAX_ROWS:
+            summary.truncated = True
+            break
+        if not row or all(cell in (None, '') for cell in row):
+            continue
+        try:
+            values = [_to_number(row[index]) for index in input_indexes]
+        except (ValueError, IndexError, TypeError):
+            summary.skipped += 1
+            continue
+        # nan и inf из «nan»/«inf» в ячейке испортили бы итоги и рекомендации
+        if not all(math.isfinite(value) and value >= 0 for value in values):
+            summary.skipped += 1
+            continue
+        buffer[len(skus)] = values
+        skus.append(str(row[sku_index]) if sku_index is not None and sku_index < len(row) else str(row_number))
+        if len(skus) == chunk_rows:
+            _write_chunk(text, skus, buffer, summary)
+            skus = []
+    if skus:
+        _write_chunk(text, skus, buffer[:len(skus)], summary)
+    text.flush()
+    text.detach()
+    return summary
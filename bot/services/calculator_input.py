@@ -0,0 +1,84 @@
+"""Разбор всех шести значений калькулятора из одного сообщения: позиционно или «ключ=значение»"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .batch_calculator import COLUMN_ALIASES, INPUT_COLUMNS, normalize_header
+
+# Десятичная запятая — только 1–2 цифры после неё, иначе «500,1500» читается как два числа.
+# Минус — знак, только если перед ним нет цифры: «500-1500» остаётся двумя числами
+_NUMBER = r'(?:(?<![\d.,])-)?\d+(?:\.\d+|,\d{1,2}(?!\d))?'
+_NUMBER_RE = re.compile(_NUMBER)
+_PAIR_RE = re.compile(rf'([a-zа-яё_%]+(?:\s+[a-zа-яё]+)?)\s*[:=]\s*({_NUMBER})\s*%?', re.IGNORECASE)
+# Правка готового расчёта: «цена 1700», «acos=12%; налог 7» — разделитель необязателен
+_CHANGE_RE = re.compile(rf'([a-zа-яё_]+(?:\s+[a-zа-яё]+)?)\s*[:=]?\s*({_NUMBER})\s*%?', re.IGNORECASE)
+
+NEGATIVE_VALUE_ERROR = "Число должно быть положительным."
+CALCULATOR_INPUT_HELP = (
+    "Можно одним сообщением: `500 1500 15 10 8 6` или "
+    "`себестоимость=500 цена=1500 комиссия=15 логистика=10 acos=8 налог=6`"
+)
+
+
+def _to_float(number: str) -> float:
+    return float(number.replace(',', '.'))
+
+
+def _column_for(label: str) -> Optional[str]:
+    key = normalize_header(label)
+    for column in INPUT_COLUMNS:
+        if key in COLUMN_ALIASES[column]:
+            return column
+    return None
+
+
+def parse_calculator_input(text: str) -> Tuple[Optional[List[float]], Optional[str]]:
+    """
+    Шесть значений в порядке INPUT_COLUMNS или (None, причина).
+    (None, None) — в тексте нет попытки ввести всё сразу (одно число и т.п.).
+    """
+    pairs = _PAIR_RE.findall(text)
+    if pairs:
+        values = {}
+        for label, number in pairs:
+            column = _column_for(label)
+            if column is None:
+                return None, f"Неизвестное поле: {label}"
+            values[column] = _to_float(number)
+        missing = [column.rstrip('_%') for column in INPUT_COLUMNS if column not in values]
+        if missing:
+            return None, f"Не хватает: {', '.join(missing)}"
+        if min(values.values()) < 0:
+            return None, NEGATIVE_VALUE_ERROR
+        return [values[column] for column in INPUT_COLUMNS], None
+
+    numbers = _NUMBER_RE.findall(text)
+    if len(numbers) < 2:
+        return None, None
+    if len(numbers) != len(INPUT_COLUMNS):
+        return None, f"Нужно {len(INPUT_COLUMNS)} чисел, получено {len(numbers)}"
+    values = [_to_float(number) for number in numbers]
+    if min(values) < 0:
+        return None, NEGATIVE_VALUE_ERROR
+    return values, None
+
+
+def parse_calculator_changes(text: str) -> Optional[Dict[int, float]]:
+    """
+    {индекс входа: новое значение} для правки текущего расчёта или None,
+    если сообщение — не только пары «поле значение» с известными полями.
+    Отрицательные значения возвращаются как есть — их отклоняет обработчик.
+    """
+    changes = {}
+    for label, number in _CHANGE_RE.findall(text):
+        column = _column_for(label)
+        if column is None:
+            return None
+        changes[INPUT_COLUMNS.index(column)] = _to_float(number)
+    if not changes or _CHANGE_RE.sub('', text).strip(' ,;\n'):
+        return None
+    return changes
+
+
+def memo_key(data: List[float]) -> Tuple[float, ...]:
+    """Нормализованный ключ входа для кэша результатов (500 и 500.0 — одно и то же)"""
+    return tuple(round(value, 4) for value in data)
@@ -0,0 +1,119 @@
+"""
+Единый маршрутизатор нажатий inline-кнопок: callback_data разбирается один раз,
+обработчик находится по словарю, а не перебором цепочки CallbackQueryHandler с regex.
+"""
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from ..config import logger
+from .tracing import tracer
+
+SEPARATORS = '_:'
+REPORT_EVERY = 1000         # сводка по времени маршрутизации в лог раз в столько нажатий
+
+
+class ParsedCallback(NamedTuple):
+    namespace: str          # 'st'
+    action: str             # 'mode'
+    args: Tuple[str, ...]   # ('sim',) — хвост после префиксного маршрута
+
+
+class Route(NamedTuple):
+    key: str
+    handler: Callable
+    prefix: bool
+
+
+def _split_key(key: str) -> Tuple[str, str]:
+    """'st_mode_' → ('st', 'mode'); 'main_menu' → ('main', 'menu')"""
+    key = key.rstrip(SEPARATORS)
+    for index, char in enumerate(key):
+        if char in SEPARATORS:
+            return key[:index], key[index + 1:]
+    return key, ''
+
+
+class CallbackRouter:
+    """
+    Точные маршруты ('main_menu') и префиксные ('st_mode_' — хвост уходит аргументом)
+    лежат в двух словарях. Поиск: точное совпадение, затем префиксы по позициям
+    разделителей справа налево — не больше одного обращения к словарю на разделитель.
+    Перекрывающиеся регистрации (префикс, под который попадает другой маршрут)
+    отклоняются при запуске: у каждого callback_data ровно один обработчик.
+    """
+    def __init__(self):
+        self._exact: Dict[str, Route] = {}
+        self._prefixes: Dict[str, Route] = {}
+        self.stats = {'clicks': 0, 'unrouted': 0, 'route_ns': 0, 'max_route_ns': 0}
+
+    def route(self, key: str, handler: Callable, prefix: bool = False) -> None:
+        """
+        Зарегистрировать обработчик. Префиксный ключ заканчивается разделителем
+        ('demo_', 'orch_cmd:'), обработчик получает хвост третьим аргументом.
+        """
+        if prefix and key[-1:] not in SEPARATORS:
+            raise ValueError(f"Префиксный маршрут {key!r} должен заканчиваться одним из '{SEPARATORS}'")
+        conflict = self._conflict(key, prefix)
+        if conflict is not None:
+            raise ValueError(
+                f"Маршрут {key!r} ({handler.__name__}) пересекается с {conflict.key!r} ({conflict.handler.__name__})"
+            )
+        (self._prefixes if prefix else self._exact)[key] = Route(key, handler, prefix)
+
+    def _conflict(self, key: str, prefix: bool) -> Optional[Route]:
+        if not prefix and key in self._exact:
+            return self._exact[key]
+        for existing in self._prefixes.values():
+            if key.startswith(existing.key) or (prefix and existing.key.startswith(key)):
+                return existing
+        if prefix:
+            for existing in self._exact.values():
+                if existing.key.startswith(key):
+                    return existing
+        return None
+
+    def resolve(self, data: str) -> Tuple[Optional[Route], ParsedCallback]:
+        """callback_data → (маршрут, разбор) за один проход"""
+        route = self._exact.get(data)
+        if route is not None:
+            return route, ParsedCallback(*_split_key(data), ())
+        for index in range(len(data) - 2, -1, -1):
+            if data[index] in SEPARATORS:
+                route = self._prefixes.get(data[:index + 1])
+                if route is not None:
+                    return route, ParsedCallback(*_split_key(route.key), (data[index + 1:],))
+        return None, ParsedCallback(*_split_key(data), ())
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Единственный CallbackQueryHandler приложения"""
+        query = update.callback_query
+        with tracer.span('route'):
+            started = time.perf_counter_ns()
+            route, parsed = self.resolve(query.data or '')
+            elapsed = time.perf_counter_ns() - started
+        self.stats['clicks'] += 1
+        self.stats['route_ns'] += elapsed
+        self.stats['max_route_ns'] = max(self.stats['max_route_ns'], elapsed)
+        if route is None:
+            self.stats['unrouted'] += 1
+            logger.warning(f"Нет маршрута для callback_data={query.data!r}")
+            await query.answer()
+            return None
+        logger.debug(f"callback {query.data!r} → {route.handler.__name__}: маршрут за {elapsed / 1000:.1f} мкс")
+        if self.stats['clicks'] % REPORT_EVERY == 0:
+            logger.info(f"Маршрутизатор кнопок: {self.report()}")
+        return await route.handler(update, context, *parsed.args)
+
+    def report(self) -> str:
+        clicks = self.stats['clicks']
+        average = self.stats['route_ns'] / clicks / 1000 if clicks else 0.0
+        return (
+            f"нажатий {clicks}, без маршрута {self.stats['unrouted']}, "
+            f"маршрут в среднем {average:.1f} мкс, максимум {self.stats['max_route_ns'] / 1000:.1f} мкс"
+        )
+
+
+callback_router = CallbackRouter()
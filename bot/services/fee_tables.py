@@ -0,0 +1,121 @@
+"""Тарифы маркетплейсов по категориям и сравнение площадок одним векторным расчётом"""
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from .batch_calculator import INPUT_COLUMNS, economy_metrics_batch
+
+FEES_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'marketplace_fees.yaml')
+
+
+class MarketplaceResult(NamedTuple):
+    marketplace: str
+    title: str
+    commission: float
+    logistics: float        # % от цены с учётом фиксированной части
+    net_profit: float
+    net_margin: float
+
+
+class FeeTables:
+    """
+    Тарифы из версионированного YAML. Ставки лежат в массивах
+    (площадка × категория), индекс (marketplace, category) → строка/столбец.
+    """
+    def __init__(self, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+        self.version: str = str(data.get('version', '0'))
+        defaults = data.get('defaults', {})
+        self.default_acos = float(defaults.get('acos', 10))
+        self.default_tax = float(defaults.get('tax', 6))
+
+        self.categories: List[str] = list(data['categories'])
+        self.category_titles = {key: value.get('title', key) for key, value in data['categories'].items()}
+        self._category_patterns = [
+            (key, re.compile(r'\b(?:' + '|'.join(map(re.escape, value.get('keywords', []))) + r')', re.IGNORECASE))
+            for key, value in data['categories'].items() if value.get('keywords')
+        ]
+        self.marketplaces: List[str] = list(data['marketplaces'])
+        self.marketplace_titles = {key: value.get('title', key) for key, value in data['marketplaces'].items()}
+
+        shape = (len(self.marketplaces), len(self.categories))
+        self.commission = np.full(shape, np.nan)
+        self.logistics = np.full(shape, np.nan)
+        self.logistics_fixed = np.zeros(len(self.marketplaces))
+        self.index: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        for row, marketplace in enumerate(self.marketplaces):
+            entry = data['marketplaces'][marketplace]
+            self.logistics_fixed[row] = float(entry.get('logistics_fixed', 0))
+            for category, rates in entry.get('rates', {}).items():
+                column = self.categories.index(category)
+                self.commission[row, column] = float(rates['commission'])
+                self.logistics[row, column] = float(rates['logistics'])
+                self.index[(marketplace, category)] = (row, column)
+
+    def rates(self, marketplace: str, category: str) -> Optional[Tuple[float, float, float]]:
+        """(комиссия %, логистика %, логистика руб) для площадки и категории"""
+        position = self.index.get((marketplace, category))
+        if position is None:
+            return None
+        row, column = position
+        return float(self.commission[row, column]), float(self.logistics[row, column]), float(self.logistics_fixed[row])
+
+    def find_category(self, text: str) -> Optional[str]:
+        """Категория по названию кнопки или свободному тексту"""
+        for key, title in self.category_titles.items():
+            if text.strip().lower() in (key, title.lower()):
+                return key
+        for key, pattern in self._category_patterns:
+            if pattern.search(text):
+                return key
+        return None
+
+    def compare(self, cost: float, price: float, category: str,
+                acos: Optional[float] = None, tax: Optional[float] = None) -> List[MarketplaceResult]:
+        """Метрики на всех площадках, где есть категория, одним проходом; лучшие — первыми"""
+        column = self.categories.index(category)
+        rows = np.flatnonzero(~np.isnan(self.commission[:, column]))
+        logistics = self.logistics[rows, column] + (self.logistics_fixed[rows] / price * 100 if price > 0 else 0.0)
+        inputs = np.empty((len(rows), len(INPUT_COLUMNS)), dtype=np.float64)
+        inputs[:, 0] = cost
+        inputs[:, 1] = price
+        inputs[:, 2] = self.commission[rows, column]
+        inputs[:, 3] = logistics
+        inputs[:, 4] = self.default_acos if acos is None else acos
+        inputs[:, 5] = self.default_tax if tax is None else tax
+        metrics = economy_metrics_batch(inputs)
+        order = np.argsort(-metrics['чистая_прибыль'], kind='stable')
+        return [
+            MarketplaceResult(
+                marketplace=self.marketplaces[rows[i]],
+                title=self.marketplace_titles[self.marketplaces[rows[i]]],
+                commission=float(inputs[i, 2]),
+                logistics=float(inputs[i, 3]),
+                net_profit=float(metrics['чистая_прибыль'][i]),
+                net_margin=float(metrics['чистая_маржа_%'][i]),
+            )
+            for i in order
+        ]
+
+    def format_comparison(self, results: List[MarketplaceResult], category: str) -> str:
+        """Рейтинг площадок одним сообщением"""
+        lines = [
+            f"🏪 **СРАВНЕНИЕ ПЛОЩАДОК: {self.category_titles[category].upper()}**",
+            f"(тарифы v{self.version}, ACOS {self.default_acos:g}%, налог {self.default_tax:g}%)",
+            "```",
+            f"{'':<3}{'Площадка':<14}{'Ком.':>5}{'Лог.':>6}{'Приб.':>8}{'Маржа':>7}",
+        ]
+        for place, result in enumerate(results, 1):
+            lines.append(
+                f"{place:<3}{result.title[:13]:<14}{result.commission:>4.0f}%{result.logistics:>5.1f}%"
+                f"{result.net_profit:>8.0f}{result.net_margin:>6.1f}%"
+            )
+        lines.append("```")
+        return "\n".join(lines)
+
+
+fee_tables = FeeTables(FEES_PATH)
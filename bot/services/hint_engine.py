@@ -0,0 +1,108 @@
+"""Подбор подсказок SKILLTRAINER по ответам сессии: инвертированный индекс корней и BM25"""
+import math
+import os
+import random
+import re
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from ..models import SkillSession
+
+HINTS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'hints.yaml')
+
+MAX_HINT_LENGTH = 240
+MIN_ROOT_LENGTH = 3
+MODE_BOOST = 1.5        # подсказки выбранного режима при равной релевантности выше
+CONTEXT_BOOST = 3.0     # слова текущего запроса важнее ответов интервью
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r'[\w-]+')
+
+
+class Hint(NamedTuple):
+    id: str
+    text: str
+    modes: Tuple[str, ...]
+
+
+class HintIndex:
+    """
+    Корпус подсказок с индексом «корень → [(подсказка, вес BM25)]».
+    Веса считаются при загрузке, поэтому запрос — это поиск корней по
+    префиксам слов ответа и сумма готовых весов.
+    """
+    def __init__(self, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+        self.version: str = str(data.get('version', '0'))
+        self.hints: List[Hint] = []
+        keywords: List[List[str]] = []
+        for entry in data.get('hints', []):
+            text = entry['text']
+            if len(text) > MAX_HINT_LENGTH:
+                raise ValueError(f"Подсказка {entry['id']} длиннее {MAX_HINT_LENGTH} символов")
+            self.hints.append(Hint(entry['id'], text, tuple(entry.get('modes') or ())))
+            keywords.append([word.lower() for word in entry.get('keywords', [])])
+
+        doc_freq: Dict[str, int] = defaultdict(int)
+        for roots in keywords:
+            for root in set(roots):
+                doc_freq[root] += 1
+        avg_len = sum(len(roots) for roots in keywords) / len(keywords) if keywords else 1.0
+        total = len(self.hints)
+
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for hint_id, roots in enumerate(keywords):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(roots) / avg_len)
+            for root in set(roots):
+                idf = math.log(1 + (total - doc_freq[root] + 0.5) / (doc_freq[root] + 0.5))
+                self.postings[root].append((hint_id, idf * (BM25_K1 + 1) / (1 + norm)))
+        self.max_root_length = max((len(root) for root in self.postings), default=0)
+        self.general = [hint_id for hint_id, hint in enumerate(self.hints) if not hint.modes]
+
+    def roots_in(self, text: str) -> set:
+        """Корни корпуса, с которых начинаются слова текста"""
+        found = set()
+        for word in _WORD_RE.findall(text.lower()):
+            for length in range(MIN_ROOT_LENGTH, min(len(word), self.max_root_length) + 1):
+                prefix = word[:length]
+                if prefix in self.postings:
+                    found.add(prefix)
+        return found
+
+    def search(self, text: str, mode: Optional[str] = None, context: str = "") -> List[Tuple[float, int]]:
+        """Подсказки по убыванию релевантности: [(оценка, индекс)]"""
+        weights = dict.fromkeys(self.roots_in(text), 1.0)
+        weights.update(dict.fromkeys(self.roots_in(context), CONTEXT_BOOST))
+        scores: Dict[int, float] = defaultdict(float)
+        for root, boost in weights.items():
+            for hint_id, weight in self.postings[root]:
+                scores[hint_id] += weight * boost
+        ranked = []
+        for hint_id, score in scores.items():
+            modes = self.hints[hint_id].modes
+            if modes:
+                if mode not in modes:
+                    continue
+                score *= MODE_BOOST
+            ranked.append((score, hint_id))
+        ranked.sort(reverse=True)
+        return ranked
+
+    def pick(self, session: SkillSession, context: str = "") -> str:
+        """Лучшая подсказка для сессии, отличная от предыдущей"""
+        mode = session.selected_mode.value if session.selected_mode else None
+        # Ответы в сессии уже обезличены (mask_pii); контекст — текущий запрос пользователя
+        for _, hint_id in self.search(" ".join(session.answers.values()), mode, context):
+            if self.hints[hint_id].text != session.last_hint:
+                return self.hints[hint_id].text
+        # Ничего не нашлось — общая подсказка, как и раньше, случайно
+        pool = [self.hints[hint_id].text for hint_id in self.general]
+        fresh = [text for text in pool if text != session.last_hint]
+        return random.choice(fresh or pool)
+
+
+hint_index = HintIndex(HINTS_PATH)
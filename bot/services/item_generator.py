@@ -0,0 +1,72 @@
+"""
+Офлайн-генерация новых элементов QUIZ / DRILL через Groq.
+Результат печатается в YAML для ревью и ручного добавления в bot/data/training_items.yaml.
+Запуск: python -m bot.services.item_generator <quiz|drill> <навык> [количество]
+"""
+import json
+import sys
+
+import yaml
+from groq import Groq
+
+from ..config import GROQ_API_KEY
+from .skill_catalog import SKILL_TITLES
+
+PROMPTS = {
+    'quiz': (
+        "Составь {count} вопросов теста по навыку «{skill}». Сложность 1–3. "
+        "Верни только JSON-массив объектов: "
+        '{{"id": "...", "difficulty": 1, "question": "...", "options": ["...", "...", "..."], '
+        '"answer": <индекс верного варианта>, "explanation": "..."}}'
+    ),
+    'drill': (
+        "Составь {count} коротких письменных упражнений по навыку «{skill}». Сложность 1–3. "
+        "Для каждого — 2–3 ключевых пункта, по которым проверяется ответ, и корни слов-маркеров. "
+        "Верни только JSON-массив объектов: "
+        '{{"id": "...", "difficulty": 1, "prompt": "...", '
+        '"key_points": [{{"label": "...", "keywords": ["..."]}}]}}'
+    ),
+}
+REQUIRED_KEYS = {
+    'quiz': {'id', 'difficulty', 'question', 'options', 'answer'},
+    'drill': {'id', 'difficulty', 'prompt', 'key_points'},
+}
+
+
+def generate_items(client, kind: str, skill: str, count: int) -> list:
+    """Запросить элементы у LLM и отбросить невалидные"""
+    prompt = PROMPTS[kind].format(count=count, skill=SKILL_TITLES.get(skill, skill))
+    completion = client.chat.completions.create(
+        messages=[{"role": "user", "content": prompt}],
+        model="llama-3.1-8b-instant",
+        max_tokens=3000,
+        temperature=0.7
+    )
+    content = completion.choices[0].message.content
+    items = json.loads(content[content.find('['):content.rfind(']') + 1])
+    valid = []
+    for item in items:
+        if not REQUIRED_KEYS[kind] <= set(item):
+            continue
+        if kind == 'quiz' and not 0 <= int(item['answer']) < len(item['options']):
+            continue
+        item['id'] = f"{skill[:3]}-{kind[0]}-{item['id']}"
+        valid.append(item)
+    return valid
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in PROMPTS:
+        print(__doc__)
+        sys.exit(1)
+    if not GROQ_API_KEY:
+        print("GROQ_API_KEY не установлен")
+        sys.exit(1)
+    kind, skill = sys.argv[1], sys.argv[2]
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    items = generate_items(Groq(api_key=GROQ_API_KEY), kind, skill, count)
+    print(yaml.safe_dump({kind: {skill: items}}, allow_unicode=True, sort_keys=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Разбиение длинного текста на сообщения Telegram за один проход: граница абзаца → строки →
+предложения → слова, длина в UTF-16 (как считает Telegram), разметка Markdown не рвётся между частями.
+"""
+import re
+from typing import List
+
+MESSAGE_LIMIT = 4096
+MIN_FILL = 0.5          # граница выше уровнем берётся, только если часть заполнена хотя бы наполовину
+MARKDOWN_RESERVE = 4    # место под закрывающий маркер: самый длинный — «\n```»
+# Меньший лимит не вмещает символ вне BMP (и открывающий «```\n» с резервом): части не двигались бы
+MIN_LENGTH = 2
+MIN_MARKDOWN_LENGTH = len('```\n') + MARKDOWN_RESERVE + MIN_LENGTH
+
+_SENTENCE_ENDS = ('. ', '! ', '? ', '… ', '.\n', '!\n', '?\n')
+_LEADING_SPACE_RE = re.compile(r'\s*')
+# Маркеры Markdown (legacy): экранирование и ссылки пропускаются целиком
+_MARKER_RE = re.compile(r'\\.|```|[`*_]|\[[^\[\]\n]{0,500}\]\([^()\s]{0,500}\)', re.S)
+_LINK_RE = re.compile(r'\[[^\[\]\n]{0,500}\]\([^()\s]{0,500}\)')
+# Символы, перед которыми нельзя резать: продолжают предыдущий графем (ZWJ, селекторы, тон кожи, диакритика)
+_CLUSTER_TAIL_RE = re.compile('[\u200d\ufe0e\ufe0f\u0300-\u036f\U0001f3fb-\U0001f3ff\U000e0020-\U000e007f]')
+
+
+def telegram_length(text: str) -> int:
+    """Длина в кодовых единицах UTF-16 — так Telegram считает лимит 4096"""
+    return len(text) if text.isascii() else len(text.encode('utf-16-le')) // 2
+
+
+def _opening(marker: str) -> str:
+    return marker + '\n' if marker == '```' else marker
+
+
+def _closing(marker: str) -> str:
+    return '\n' + marker if marker == '```' else marker
+
+
+def _window(text: str, start: int, budget: int) -> str:
+    """Самый длинный кусок с позиции start, который укладывается в budget единиц UTF-16"""
+    window = text[start:start + budget]
+    excess = telegram_length(window) - budget
+    while excess > 0:
+        # символ вне BMP занимает две единицы: снимаем не больше нужного, чтобы окно осталось полным
+        window = window[:len(window) - (excess + 1) // 2]
+        excess = telegram_length(window) - budget
+    return window
+
+
+def _cut_point(window: str, following: str) -> int:
+    """
+    Позиция разреза: абзац → строка → предложение → слово в верхней половине окна, иначе лучшее
+    из найденного, иначе жёсткий рез не внутри эмодзи (following — символ сразу за окном).
+    """
+    half = int(len(window) * MIN_FILL)
+    candidates = (
+        window.rfind('\n\n'),
+        window.rfind('\n'),
+        max(window.rfind(end) for end in _SENTENCE_ENDS) + 1 or -1,
+        max(window.rfind(' '), window.rfind('\t')),
+    )
+    for position in candidates:
+        if position >= half:
+            return position
+    best = max(candidates)
+    if best > 0:
+        return best
+    text = window + following
+    cut = len(window)
+    while cut > 1 and (_CLUSTER_TAIL_RE.match(text, cut) or text[cut - 1] == '\u200d'):
+        cut -= 1
+    return cut
+
+
+def _scan_markers(chunk: str, marker: str) -> str:
+    """
+    Какой маркер открыт в конце куска. Legacy Markdown не вкладывает сущности:
+    внутри открытой сущности чужие маркеры — обычный текст.
+    """
+    for match in _MARKER_RE.finditer(chunk):
+        token = match.group()
+        if len(token) > 1 and token != '```':
+            continue            # \x или ссылка
+        if not marker:
+            marker = token
+        elif token == marker:
+            marker = ''
+    return marker
+
+
+def split_message(text: str, max_length: int = MESSAGE_LIMIT, markdown: bool = False) -> List[str]:
+    """
+    Части не длиннее max_length (UTF-16). Каждая часть — одно окно: граница ищется
+    rfind-ами справа налево, поэтому текст просматривается один раз. В режиме Markdown
+    маркер, открытый на разрезе, закрывается в конце части и открывается в начале следующей.
+    ValueError — если max_length меньше MIN_LENGTH (MIN_MARKDOWN_LENGTH для Markdown).
+    """
+    min_length = MIN_MARKDOWN_LENGTH if markdown else MIN_LENGTH
+    if max_length < min_length:
+        raise ValueError(f"max_length={max_length} меньше минимума {min_length}")
+    if telegram_length(text) <= max_length:
+        return [text]
+    parts: List[str] = []
+    marker = ''
+    position = _LEADING_SPACE_RE.match(text).end()
+    while position < len(text):
+        prefix = _opening(marker)
+        window = _window(text, position, max_length - len(prefix) - (MARKDOWN_RESERVE if markdown else 0))
+        if position + len(window) >= len(text):
+            cut = len(window)
+        else:
+            cut = _cut_point(window, text[position + len(window)])
+            if markdown:
+                cut = _markdown_safe_cut(text, position, window, cut)
+        chunk = window[:cut]
+        if markdown:
+            marker_after = _scan_markers(chunk, marker)
+            body = (prefix + chunk).rstrip()
+            if body != prefix.rstrip():
+                parts.append(body + _closing(marker_after))
+            marker = marker_after
+        elif chunk.strip():
+            parts.append(chunk.rstrip())
+        position = _LEADING_SPACE_RE.match(text, position + cut).end()
+    return parts
+
+
+def _markdown_safe_cut(text: str, position: int, window: str, cut: int) -> int:
+    """Не резать ссылку, экранирование и ``` посередине"""
+    link_start = window.rfind('[', 0, cut)
+    if link_start > 0:
+        link = _LINK_RE.match(text, position + link_start)
+        if link and link.end() > position + cut:
+            cut = link_start
+    while cut > 1 and (window[cut - 1] == '\\' or window[cut - 1] == '`' == text[position + cut]):
+        cut -= 1
+    return cut
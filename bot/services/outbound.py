@@ -0,0 +1,257 @@
+"""
+Планировщик исходящих сообщений: token bucket на чат и на бота, очередь по приоритету,
+автоматический повтор после RetryAfter и склейка подряд идущих коротких сообщений в один чат.
+Подключается как rate limiter приложения — через него идут все вызовы Bot API из обработчиков.
+"""
+import asyncio
+import bisect
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from ..config import logger
+from .message_split import MESSAGE_LIMIT
+from .tracing import tracer
+
+# Лимиты Telegram: ~30 сообщений/с на бота, ~1/с в личный чат, 20/мин в группу.
+# Корзина пропускает burst + rate·t за t секунд, поэтому на бота burst + rate ≤ 30
+GLOBAL_RATE = 25.0
+GLOBAL_BURST = 5
+PRIVATE_CHAT_RATE = 1.0
+PRIVATE_CHAT_BURST = 3
+GROUP_CHAT_RATE = 20 / 60
+GROUP_CHAT_BURST = 5
+MAX_RETRIES = 3
+COALESCE_SEPARATOR = "\n\n"
+IDLE_BUCKETS_LIMIT = 10_000      # сверх этого полные (простаивающие) корзины чатов удаляются
+
+PRIORITY_INTERACTIVE = 0         # ответ на действие пользователя
+PRIORITY_BULK = 10               # продолжения длинных ответов, рассылки
+
+# Методы, которые отправляют или меняют сообщения в чате, — только они идут через очередь
+QUEUED_PREFIXES = ('send', 'edit', 'copyMessage', 'forwardMessage')
+# Склеивать можно только простой текст без клавиатур и разметки сущностями
+_COALESCE_BLOCKERS = ('reply_markup', 'entities', 'reply_parameters', 'link_preview_options')
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше capacity про запас"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до свободного токена (0 — можно отправлять)"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    @property
+    def full(self) -> bool:
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ('key', 'chat_id', 'callback', 'args', 'kwargs', 'endpoint', 'data', 'futures', 'attempts')
+
+    def __init__(self, key: Tuple[int, int], chat_id: Any, callback: Callable, args: Any,
+                 kwargs: Dict[str, Any], endpoint: str, data: Dict[str, Any]):
+        self.key = key                      # (приоритет, порядковый номер)
+        self.chat_id = chat_id
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.endpoint = endpoint
+        self.data = data
+        self.futures: List[asyncio.Future] = []
+        self.attempts = 0
+
+    def __lt__(self, other: '_Job') -> bool:
+        return self.key < other.key
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """
+    Один фоновый воркер выбирает из очереди первое по (приоритет, порядок) задание,
+    чей чат свободен и не исчерпал корзину. В каждом чате одновременно летит не больше
+    одного запроса, поэтому порядок сообщений в чате сохраняется. После RetryAfter
+    очередь целиком ставится на паузу, а задание возвращается на своё место.
+    """
+    __slots__ = ('_queue', '_buckets', '_global', '_in_flight', '_paused_until',
+                 '_wakeup', '_worker', '_sequence', '_closing', 'stats')
+
+    def __init__(self):
+        self._queue: List[_Job] = []
+        self._buckets: Dict[Any, TokenBucket] = {}
+        self._global = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._in_flight: set = set()
+        self._paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._sequence = itertools.count()
+        self._closing = False
+        self.stats = {'sent': 0, 'coalesced': 0, 'retry_after': 0}
+
+    async def initialize(self) -> None:
+        self._closing = False
+        self._start()
+
+    async def shutdown(self) -> None:
+        # Воркер останавливаем флагом, а не cancel(): в 3.11 wait_for может проглотить отмену
+        self._closing = True
+        self._wakeup.set()
+        if self._worker:
+            await self._worker
+            self._worker = None
+        for job in self._queue:
+            for future in job.futures:
+                if not future.done():
+                    future.cancel()
+        self._queue.clear()
+
+    def _start(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        # Спан включает ожидание в очереди: медленная отправка видна вместе с причиной
+        with tracer.span(endpoint):
+            return await self._process_request(callback, args, kwargs, endpoint, data, rate_limit_args)
+
+    async def _process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if not endpoint.startswith(QUEUED_PREFIXES):
+            return await self._call_with_retry(callback, args, kwargs)
+
+        priority = (rate_limit_args or {}).get('priority', PRIORITY_INTERACTIVE)
+        chat_id = data.get('chat_id', data.get('inline_message_id'))
+        future = asyncio.get_running_loop().create_future()
+        job = self._coalesce(endpoint, data, chat_id, priority)
+        if job is None:
+            job = _Job((priority, next(self._sequence)), chat_id, callback, args, kwargs, endpoint, data)
+            bisect.insort(self._queue, job)
+        job.futures.append(future)
+        self._start()
+        self._wakeup.set()
+        return await future
+
+    def _coalesce(self, endpoint: str, data: Dict[str, Any], chat_id: Any, priority: int) -> Optional[_Job]:
+        """Дописать текст к последнему ожидающему сообщению того же чата, если это безопасно"""
+        if endpoint != 'sendMessage' or any(data.get(key) for key in _COALESCE_BLOCKERS):
+            return None
+        last = next((job for job in reversed(self._queue) if job.chat_id == chat_id), None)
+        if (last is None or last.endpoint != 'sendMessage' or last.key[0] != priority
+                or any(last.data.get(key) for key in _COALESCE_BLOCKERS)
+                or last.data.get('parse_mode') != data.get('parse_mode')
+                or last.data.get('message_thread_id') != data.get('message_thread_id')):
+            return None
+        text = f"{last.data['text']}{COALESCE_SEPARATOR}{data['text']}"
+        if len(text) > MESSAGE_LIMIT:
+            return None
+        # args задания ссылаются на тот же словарь data — запрос уйдёт уже со склеенным текстом
+        last.data['text'] = text
+        self.stats['coalesced'] += 1
+        return last
+
+    def _bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= IDLE_BUCKETS_LIMIT:
+                self._buckets = {key: value for key, value in self._buckets.items() if not value.full}
+            group = isinstance(chat_id, int) and chat_id < 0
+            bucket = self._buckets[chat_id] = (
+                TokenBucket(GROUP_CHAT_RATE, GROUP_CHAT_BURST) if group
+                else TokenBucket(PRIVATE_CHAT_RATE, PRIVATE_CHAT_BURST)
+            )
+        return bucket
+
+    def _next_job(self, now: float) -> Tuple[Optional[_Job], float]:
+        """Первое готовое задание или (None, сколько ждать до ближайшего)"""
+        wait = max(self._paused_until - now, self._global.delay(now))
+        if wait > 0:
+            return None, wait
+        wait = float('inf')
+        for index, job in enumerate(self._queue):
+            if job.chat_id in self._in_flight:
+                continue
+            delay = self._bucket(job.chat_id).delay(now)
+            if delay == 0:
+                del self._queue[index]
+                return job, 0.0
+            wait = min(wait, delay)
+        return None, wait
+
+    async def _run(self) -> None:
+        while not self._closing:
+            job, wait = self._next_job(time.monotonic())
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), None if wait == float('inf') else wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if all(future.done() for future in job.futures):
+                continue    # все ожидающие отменены — отправлять некому
+            self._global.consume()
+            self._bucket(job.chat_id).consume()
+            self._in_flight.add(job.chat_id)
+            asyncio.create_task(self._deliver(job))
+
+    async def _deliver(self, job: _Job) -> None:
+        try:
+            result = await job.callback(*job.args, **job.kwargs)
+        except RetryAfter as e:
+            job.attempts += 1
+            self.stats['retry_after'] += 1
+            if job.attempts > MAX_RETRIES:
+                self._resolve(job, exception=e)
+            else:
+                logger.warning(f"Flood control: пауза {e.retry_after} с (чат {job.chat_id}, попытка {job.attempts})")
+                self._paused_until = max(self._paused_until, time.monotonic() + float(e.retry_after))
+                bisect.insort(self._queue, job)
+        except Exception as e:
+            self._resolve(job, exception=e)
+        else:
+            self.stats['sent'] += 1
+            self._resolve(job, result=result)
+        finally:
+            self._in_flight.discard(job.chat_id)
+            self._wakeup.set()
+
+    @staticmethod
+    def _resolve(job: _Job, result: Any = None, exception: Optional[BaseException] = None) -> None:
+        for future in job.futures:
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    async def _call_with_retry(self, callback, args, kwargs):
+        """Запросы вне очереди (ответы на callback/inline, служебные методы): только повтор после RetryAfter"""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.stats['retry_after'] += 1
+                await asyncio.sleep(float(e.retry_after))
+
+
+def send_in_background(bot, chat_id: int, text: str, priority: int = PRIORITY_BULK, **kwargs) -> asyncio.Task:
+    """Поставить сообщение в очередь и сразу вернуть future доставки (Task с Message)"""
+    if getattr(bot, 'rate_limiter', None) is not None:
+        kwargs['rate_limit_args'] = {'priority': priority}
+    return asyncio.ensure_future(bot.send_message(chat_id=chat_id, text=text, **kwargs))
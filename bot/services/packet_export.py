@@ -0,0 +1,130 @@
+"""Экспорт Finish Packet SKILLTRAINER одним файлом (Markdown / HTML / JSON) в памяти"""
+import io
+import json
+import html
+from datetime import datetime
+from typing import Dict, Any, Callable, TextIO
+
+from ..config import SKILLTRAINER_QUESTIONS, SKILLTRAINER_GATES, SKILLTRAINER_VERSION
+from ..models import SkillSession
+
+EXPORT_FORMATS = {
+    'md': ('text/markdown', 'Markdown'),
+    'html': ('text/html', 'HTML'),
+    'json': ('application/json', 'JSON'),
+}
+DEFAULT_EXPORT_FORMAT = 'md'
+SEPARATOR = "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+
+
+def build_packet_data(session: SkillSession, ai_response: str) -> Dict[str, Any]:
+    """Структура Finish Packet — общий источник для всех форматов экспорта"""
+    answers = []
+    for step, answer in session.answers.items():
+        if step < len(SKILLTRAINER_QUESTIONS):
+            question = SKILLTRAINER_QUESTIONS[step]
+            label, _, text = question.partition(':**')
+            answers.append({
+                'step': label.split('**Шаг')[-1].strip(),
+                'question': text.strip(),
+                'answer': answer,
+            })
+    return {
+        'version': SKILLTRAINER_VERSION,
+        'finished_at': datetime.now().strftime('%d.%m.%Y %H:%M'),
+        'user_id': session.user_id,
+        'mode': session.selected_mode.name if session.selected_mode else None,
+        'progress': int(session.progress * 100),
+        'answers': answers,
+        'program': ai_response,
+        'gates': [
+            {'id': gate_id, 'description': SKILLTRAINER_GATES[gate_id]['description']}
+            for gate_id in session.gates_passed if gate_id in SKILLTRAINER_GATES
+        ],
+        'gates_total': len(SKILLTRAINER_GATES),
+    }
+
+
+def _write_markdown(packet: Dict[str, Any], out: TextIO):
+    out.write(f"# 🎓 FINISH PACKET — SKILLTRAINER {packet['version']}\n\n")
+    out.write(f"- **📅 Сессия завершена:** {packet['finished_at']}\n")
+    out.write(f"- **👤 Пользователь ID:** {packet['user_id']}\n")
+    out.write(f"- **🎯 Режим тренировки:** {packet['mode'] or 'Не выбран'}\n")
+    out.write(f"- **📊 Прогресс:** {packet['progress']}%\n\n")
+    out.write("## 🔍 Ключевые ответы\n\n")
+    for item in packet['answers']:
+        out.write(f"**{item['step']}.** {item['question']}\n\n> {item['answer']}\n\n")
+    out.write("## 🎯 Персонализированная программа\n\n")
+    out.write(packet['program'])
+    out.write(f"\n\n## 📋 Пройденные гейты: {len(packet['gates'])}/{packet['gates_total']}\n\n")
+    for gate in packet['gates']:
+        out.write(f"- {gate['description']}\n")
+
+
+def _write_html(packet: Dict[str, Any], out: TextIO):
+    esc = html.escape
+    out.write(
+        "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">"
+        f"<title>Finish Packet — SKILLTRAINER {esc(packet['version'])}</title>"
+        "<style>body{font-family:sans-serif;max-width:760px;margin:2em auto;line-height:1.5}"
+        "blockquote{margin:0 0 1em;padding-left:1em;border-left:3px solid #ccc}</style>"
+        "</head><body>\n"
+    )
+    out.write(f"<h1>🎓 FINISH PACKET — SKILLTRAINER {esc(packet['version'])}</h1>\n<ul>")
+    out.write(f"<li><b>📅 Сессия завершена:</b> {esc(packet['finished_at'])}</li>")
+    out.write(f"<li><b>👤 Пользователь ID:</b> {packet['user_id']}</li>")
+    out.write(f"<li><b>🎯 Режим тренировки:</b> {esc(packet['mode'] or 'Не выбран')}</li>")
+    out.write(f"<li><b>📊 Прогресс:</b> {packet['progress']}%</li></ul>\n")
+    out.write("<h2>🔍 Ключевые ответы</h2>\n")
+    for item in packet['answers']:
+        out.write(f"<p><b>{esc(item['step'])}.</b> {esc(item['question'])}</p>"
+                  f"<blockquote>{esc(item['answer'])}</blockquote>\n")
+    out.write("<h2>🎯 Персонализированная программа</h2>\n")
+    for paragraph in packet['program'].split('\n\n'):
+        out.write(f"<p>{esc(paragraph).replace(chr(10), '<br>')}</p>\n")
+    out.write(f"<h2>📋 Пройденные гейты: {len(packet['gates'])}/{packet['gates_total']}</h2>\n<ul>")
+    for gate in packet['gates']:
+        out.write(f"<li>{esc(gate['description'])}</li>")
+    out.write("</ul>\n</body></html>\n")
+
+
+def _write_json(packet: Dict[str, Any], out: TextIO):
+    json.dump(packet, out, ensure_ascii=False, indent=2)
+
+
+_WRITERS: Dict[str, Callable[[Dict[str, Any], TextIO], None]] = {
+    'md': _write_markdown,
+    'html': _write_html,
+    'json': _write_json,
+}
+
+
+def render_packet(packet: Dict[str, Any], fmt: str = DEFAULT_EXPORT_FORMAT) -> io.BytesIO:
+    """Рендерит пакет потоком в буфер в памяти (без временных файлов)"""
+    if fmt not in _WRITERS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+    buffer = io.BytesIO()
+    out = io.TextIOWrapper(buffer, encoding='utf-8', newline='\n', write_through=True)
+    _WRITERS[fmt](packet, out)
+    out.flush()
+    out.detach()  # буфер остаётся открытым после сборки обёртки
+    buffer.seek(0)
+    return buffer
+
+
+def packet_filename(packet: Dict[str, Any], fmt: str = DEFAULT_EXPORT_FORMAT) -> str:
+    """Имя файла экспорта"""
+    return f"finish_packet_{packet['user_id']}_{datetime.now().strftime('%Y%m%d_%H%M')}.{fmt}"
+
+
+def packet_summary(packet: Dict[str, Any]) -> str:
+    """Короткая подпись к файлу (укладывается в лимит caption 1024 символа)"""
+    return (
+        f"🎓 FINISH PACKET — SKILLTRAINER {packet['version']}\n"
+        f"{SEPARATOR}\n"
+        f"🎯 Режим: {packet['mode'] or 'Не выбран'}\n"
+        f"📊 Прогресс: {packet['progress']}%\n"
+        f"📋 Гейты: {len(packet['gates'])}/{packet['gates_total']}\n"
+        f"{SEPARATOR}\n"
+        "📎 Полная программа — в файле. Другие форматы — кнопками ниже."
+    )
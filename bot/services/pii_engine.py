@@ -0,0 +1,100 @@
+"""
+Обезличивание ПДн (152-ФЗ) за один проход: все детекторы собраны при импорте в одно
+регулярное выражение, замены идут слева направо и не перекрываются. Повторяющиеся
+короткие сообщения берутся из памяти, очень длинные маскируются в рабочем потоке.
+"""
+import asyncio
+import re
+from typing import Dict, NamedTuple
+
+from .tracing import tracer
+
+MEMO_SIZE = 2048            # столько разных коротких сообщений помним
+MEMO_MAX_LENGTH = 512       # длиннее — не запоминаем: повторяются в основном короткие ответы
+THREAD_MIN_LENGTH = 16_000  # с этой длины mask_async уходит в рабочий поток
+
+# \b перед уже съеденным первым символом: граница слова между ним и предыдущим символом
+WORD_START = r'(?:(?<=\w)(?<!\w\w)|(?<=\w\W))'
+FULL_NAME = r'[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+\b'
+
+
+class Detector(NamedTuple):
+    token: str          # 'PHONE' → <PHONE>
+    first: str          # класс первого символа совпадения
+    rest: str           # выражение после первого символа
+    word_start: bool    # перед совпадением нужна граница слова
+
+
+# Порядок — приоритет для совпадений, начинающихся в одной позиции: узкие форматы
+# (паспорт, карта, ИНН) раньше телефона, иначе их съедает его широкий шаблон.
+DETECTORS = (
+    # ФИО — три слова с заглавной буквы
+    Detector('PERSON', r'[А-ЯЁ]', FULL_NAME[6:], True),
+    # Имя после «зовут», «имя», «это» (любой регистр): слово остаётся, имя заменяется.
+    # До ФИО не дотягивается — его замаскирует своя ветка, как при прежних отдельных проходах.
+    Detector('NAMED', r'[зЗиИэЭ]',
+             rf'(?i:(?P<trigger>(?<=[зЗ])овут|(?<=[иИ])мя|(?<=[эЭ])то)\s+(?:(?-i:(?!\b{FULL_NAME}))[а-яёa-z\s]){{2,30}})',
+             True),
+    Detector('EMAIL', r'[A-Za-z0-9._%+\-]', r'[A-Za-z0-9._%+-]*@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', True),
+    Detector('PASSPORT', r'\d', r'\d\s\d{2}\s\d{6}\b', True),
+    Detector('CARD', r'\d', r'\d{3}[\s\-]?(?:\d{4}[\s\-]?){2}\d{4}\b', True),
+    Detector('TAX_ID', r'\d', r'(?:\d{9}|\d{11})\b', True),
+    Detector('PHONE', r'[+\d]', r'(?:(?<=\+)\d|(?<=\d))[\d\-\s\(\)]{7,}\d', False),
+)
+
+
+def compile_detectors(detectors=DETECTORS) -> re.Pattern:
+    """
+    Выражение начинается с общего класса первых символов: движок re пропускает
+    неподходящие позиции без захода в ветки. Каждая ветка проверяет свой первый
+    символ ретроспективой и отмечается пустой группой с именем токена в конце.
+    """
+    first_chars = ''.join(detector.first[1:-1] if detector.first.startswith('[') else detector.first
+                          for detector in detectors)
+    branches = [
+        f"(?<={detector.first}){WORD_START if detector.word_start else ''}{detector.rest}(?P<{detector.token}>)"
+        for detector in detectors
+    ]
+    return re.compile(f"[{first_chars}](?:{'|'.join(branches)})")
+
+
+class PiiEngine:
+    def __init__(self, memo_size: int = MEMO_SIZE):
+        self.pattern = compile_detectors()
+        self.memo_size = memo_size
+        self._memo: Dict[str, str] = {}
+        self.stats = {'calls': 0, 'memo_hits': 0, 'threaded': 0}
+
+    @staticmethod
+    def _replace(match: re.Match) -> str:
+        token = match.lastgroup
+        if token == 'NAMED':
+            return f"{match.string[match.start():match.end('trigger')]} <PERSON>"
+        return f"<{token}>"
+
+    def mask(self, text: str) -> str:
+        """Заменяет персональные данные на токены <PERSON>, <EMAIL>, <PHONE>..."""
+        self.stats['calls'] += 1
+        memo = self.memo_size and len(text) <= MEMO_MAX_LENGTH
+        if memo:
+            cached = self._memo.get(text)
+            if cached is not None:
+                self.stats['memo_hits'] += 1
+                return cached
+        masked = self.pattern.sub(self._replace, text)
+        if memo:
+            if len(self._memo) >= self.memo_size:
+                self._memo.clear()
+            self._memo[text] = masked
+        return masked
+
+    async def mask_async(self, text: str) -> str:
+        """mask для обработчиков: вставка из десятков КБ не задерживает остальные апдейты"""
+        with tracer.span('mask_pii'):
+            if len(text) < THREAD_MIN_LENGTH:
+                return self.mask(text)
+            self.stats['threaded'] += 1
+            return await asyncio.to_thread(self.mask, text)
+
+
+pii_engine = PiiEngine()
@@ -0,0 +1,97 @@
+"""What-if для калькулятора: сетка чувствительности цена × ACOS/комиссия и цены безубыточности в замкнутой форме"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch_calculator import INPUT_COLUMNS, economy_metrics_batch
+
+PRICE_MULTIPLIERS = (0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3)
+GRID_AXES = {
+    # ось: (индекс во входных данных, подпись, значения в %)
+    'acos': (INPUT_COLUMNS.index('acos_%'), 'ACOS', (0, 5, 10, 15, 20, 25)),
+    'commission': (INPUT_COLUMNS.index('комиссия_%'), 'Комиссия', (5, 10, 15, 20, 25, 30)),
+}
+
+
+def _cost_and_share(data: Sequence[float]) -> Tuple[float, float]:
+    """Себестоимость и доля цены, уходящая на комиссию, логистику, рекламу и налог"""
+    себестоимость, _, комиссия, логистика, acos, налог = data
+    return себестоимость, (комиссия + логистика + acos + налог) / 100
+
+
+def target_margin_price(data: Sequence[float], margin_percent: float) -> Optional[float]:
+    """
+    Цена с заданной чистой маржой. Чистая прибыль = P·(1 − s) − C, где s — доля
+    процентных затрат, поэтому маржа m даёт P = C / (1 − s − m). None — недостижимо.
+    """
+    себестоимость, share = _cost_and_share(data)
+    denominator = 1 - share - margin_percent / 100
+    if denominator <= 0:
+        return None
+    return себестоимость / denominator
+
+
+def break_even_price(data: Sequence[float]) -> Optional[float]:
+    """Цена, при которой чистая прибыль равна нулю"""
+    return target_margin_price(data, 0)
+
+
+def max_break_even_acos(data: Sequence[float]) -> float:
+    """Максимальный ACOS (%), при котором текущая цена ещё безубыточна"""
+    себестоимость, цена, комиссия, логистика, _, налог = data
+    if цена <= 0:
+        return 0.0
+    return 100 - комиссия - логистика - налог - себестоимость / цена * 100
+
+
+def sensitivity_grid(data: Sequence[float], axis: str = 'acos',
+                     multipliers: Sequence[float] = PRICE_MULTIPLIERS) -> Tuple[np.ndarray, Tuple[float, ...], np.ndarray]:
+    """
+    Чистая маржа (%) на сетке «цена × ось» одним векторным расчётом.
+    Возвращает (цены, значения оси, матрицу len(цены) × len(оси)).
+    """
+    column, _, values = GRID_AXES[axis]
+    prices = np.asarray(multipliers, dtype=np.float64) * data[1]
+    inputs = np.tile(np.asarray(data, dtype=np.float64), (len(prices) * len(values), 1))
+    inputs[:, 1] = np.repeat(prices, len(values))
+    inputs[:, column] = np.tile(np.asarray(values, dtype=np.float64), len(prices))
+    margins = economy_metrics_batch(inputs)['чистая_маржа_%'].reshape(len(prices), len(values))
+    return prices, values, margins
+
+
+def format_grid(data: Sequence[float], axis: str = 'acos') -> str:
+    """Сетка и ключевые цены одним сообщением (моноширинная таблица в Markdown)"""
+    prices, values, margins = sensitivity_grid(data, axis)
+    column, title, _ = GRID_AXES[axis]
+    rows: List[str] = [f"{'Цена':>7}│" + ''.join(f"{value:>5}" for value in values)]
+    rows.append('─' * 7 + '┼' + '─' * (5 * len(values)))
+    for multiplier, price, line in zip(PRICE_MULTIPLIERS, prices, margins):
+        mark = '*' if multiplier == 1.0 else ' '
+        rows.append(f"{price:>6.0f}{mark}│" + ''.join(f"{margin:>5.0f}" for margin in line))
+
+    lines = [
+        f"📈 **ЧИСТАЯ МАРЖА, %: ЦЕНА × {title.upper()}**",
+        "```",
+        *rows,
+        # Легенда внутри блока: одиночная * вне его открыла бы жирный шрифт Markdown
+        f"* — текущая цена; сейчас {title} {data[column]:.0f}%",
+        "```",
+        *price_points(data),
+    ]
+    return "\n".join(lines)
+
+
+def price_points(data: Sequence[float], target_margins: Sequence[float] = (20, 30)) -> List[str]:
+    """Строки с ценой безубыточности, целевыми ценами и допустимым ACOS"""
+    lines = []
+    break_even = break_even_price(data)
+    lines.append(
+        f"• Безубыточность: {break_even:.1f} ₽" if break_even is not None
+        else "• Безубыточность недостижима: процентные затраты ≥ 100% цены"
+    )
+    for margin in target_margins:
+        price = target_margin_price(data, margin)
+        if price is not None:
+            lines.append(f"• Цена для маржи {margin:.0f}%: {price:.1f} ₽")
+    lines.append(f"• Макс. ACOS без убытка при текущей цене: {max(0.0, max_break_even_acos(data)):.1f}%")
+    return lines
@@ -0,0 +1,175 @@
+"""Монте-Карло для юнит-экономики: диапазоны входов → распределение чистой маржи и вероятность убытка"""
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .batch_calculator import COLUMN_ALIASES, INPUT_COLUMNS, economy_metrics_batch, normalize_header
+
+SIMULATION_DRAWS = 100_000
+PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 8
+RETURNS = 'возвраты_%'
+
+# Сценарий по умолчанию: колебания относительно введённых значений
+DEFAULT_SPREAD = {
+    'acos_%': 0.5,         # ±50% от текущего ACOS
+    'логистика_%': 0.3,    # ±30% от текущей логистики
+}
+DEFAULT_RETURNS = (0.0, 10.0)
+
+_NUMBER = r'\d+(?:[.,]\d+)?'
+_SEPARATOR = r'\s*(?:-|–|\.\.|±)\s*'
+# a±b или a-b[-c] целиком; смешанную запись («5-20±3») пропускаем, а не режем посреди числа
+_RANGE_RE = re.compile(
+    rf'([a-zа-яё%_]+)\s*[:=]?\s*'
+    rf'({_NUMBER}(?:\s*±\s*{_NUMBER}|(?:\s*(?:-|–|\.\.)\s*{_NUMBER}){{0,2}}))(?!\d|[.,]\d|{_SEPARATOR}\d)',
+    re.IGNORECASE
+)
+_RETURNS_ALIASES = ('возвраты', 'возврат', 'returns')
+
+
+class Distribution(NamedTuple):
+    """fixed (x), uniform (a, b), normal (среднее, σ), triangular (мин, мода, макс)"""
+    kind: str
+    params: tuple
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        if self.kind == 'uniform':
+            return rng.uniform(*self.params, size)
+        if self.kind == 'normal':
+            return np.maximum(rng.normal(*self.params, size), 0.0)
+        if self.kind == 'triangular':
+            low, mode, high = self.params
+            return rng.triangular(low, mode, high, size) if high > low else np.full(size, mode)
+        return np.full(size, self.params[0])
+
+    def describe(self) -> str:
+        if self.kind == 'uniform':
+            return f"{self.params[0]:g}–{self.params[1]:g}"
+        if self.kind == 'normal':
+            return f"{self.params[0]:g}±{self.params[1]:g}"
+        if self.kind == 'triangular':
+            return "–".join(f"{value:g}" for value in self.params)
+        return f"{self.params[0]:g}"
+
+
+def _parse_spec(spec: str) -> Optional[Distribution]:
+    if '±' in spec:
+        mean, sigma = (float(part.strip().replace(',', '.')) for part in spec.split('±'))
+        return Distribution('normal', (mean, sigma))
+    values = sorted(float(part.replace(',', '.')) for part in re.findall(_NUMBER, spec))
+    if len(values) == 1:
+        return Distribution('fixed', (values[0],))
+    if len(values) == 2:
+        return Distribution('uniform', (values[0], values[1]))
+    if len(values) == 3:
+        return Distribution('triangular', tuple(values))
+    return None
+
+
+def parse_ranges(text: str) -> Dict[str, Distribution]:
+    """
+    «acos 5-20; логистика 10±2; возвраты 0-5-15» → {колонка: распределение}.
+    a-b — равномерно, a±b — нормально, a-b-c — треугольное, одно число — фиксировано.
+    """
+    ranges: Dict[str, Distribution] = {}
+    for name, spec in _RANGE_RE.findall(text):
+        key = normalize_header(name)
+        if key in _RETURNS_ALIASES:
+            column = RETURNS
+        else:
+            column = next((column for column, aliases in COLUMN_ALIASES.items()
+                           if column in INPUT_COLUMNS and key in aliases), None)
+        distribution = _parse_spec(spec)
+        if column and distribution:
+            ranges[column] = distribution
+    return ranges
+
+
+def default_ranges(base: Sequence[float]) -> Dict[str, Distribution]:
+    """Типичный разброс вокруг введённых значений, если пользователь ничего не задал"""
+    ranges = {}
+    for column, spread in DEFAULT_SPREAD.items():
+        value = base[INPUT_COLUMNS.index(column)]
+        ranges[column] = Distribution('uniform', (value * (1 - spread), value * (1 + spread)))
+    ranges[RETURNS] = Distribution('uniform', DEFAULT_RETURNS)
+    return ranges
+
+
+class SimulationResult(NamedTuple):
+    draws: int
+    ranges: Dict[str, Distribution]
+    loss_probability: float
+    mean_margin: float
+    mean_profit: float
+    margin_percentiles: Dict[int, float]
+    profit_percentiles: Dict[int, float]
+    histogram: List[int]
+    bin_edges: List[float]
+    elapsed_ms: float
+
+
+def simulate(base: Sequence[float], ranges: Dict[str, Distribution],
+             draws: int = SIMULATION_DRAWS, seed: Optional[int] = None) -> SimulationResult:
+    """
+    Все draws прогонов — один векторный вызов economy_metrics_batch.
+    Возвраты доля r: на одну продажу приходится 1/(1−r) отправок и r/(1−r)
+    обратных доставок, поэтому логистика на продажу умножается на (1+r)/(1−r).
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    inputs = np.empty((draws, len(INPUT_COLUMNS)), dtype=np.float64)
+    for index, column in enumerate(INPUT_COLUMNS):
+        distribution = ranges.get(column) or Distribution('fixed', (base[index],))
+        inputs[:, index] = distribution.sample(rng, draws)
+    if RETURNS in ranges:
+        returns = np.clip(ranges[RETURNS].sample(rng, draws) / 100, 0.0, 0.95)
+        inputs[:, INPUT_COLUMNS.index('логистика_%')] *= (1 + returns) / (1 - returns)
+
+    metrics = economy_metrics_batch(inputs)
+    margin = metrics['чистая_маржа_%']
+    profit = metrics['чистая_прибыль']
+    # Один проход перцентилей: P1/P99 обрезают хвосты гистограммы, остальные — в отчёт
+    low, *margin_bands, high = np.percentile(margin, (1, *PERCENTILES, 99)).tolist()
+    histogram, edges = np.histogram(np.clip(margin, low, high), bins=HISTOGRAM_BINS, range=(low, high) if high > low else None)
+    return SimulationResult(
+        draws=draws,
+        ranges=ranges,
+        loss_probability=float(np.count_nonzero(profit < 0) / draws),
+        mean_margin=float(margin.mean()),
+        mean_profit=float(profit.mean()),
+        margin_percentiles=dict(zip(PERCENTILES, margin_bands)),
+        profit_percentiles=dict(zip(PERCENTILES, np.percentile(profit, PERCENTILES).tolist())),
+        histogram=histogram.tolist(),
+        bin_edges=edges.tolist(),
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+_BARS = ' ▏▎▍▌▋▊▉█'
+
+
+def format_simulation(result: SimulationResult) -> str:
+    """Отчёт симуляции одним сообщением"""
+    ranges = "; ".join(
+        f"{column.rstrip('_%')} {distribution.describe()}{'%' if column.endswith('%') else ' ₽'}"
+        for column, distribution in result.ranges.items()
+    )
+    lines = [
+        f"🎲 **РИСК-СИМУЛЯЦИЯ** ({result.draws} прогонов, {result.elapsed_ms:.0f} мс)",
+        f"Диапазоны: {ranges}",
+        f"• Вероятность убытка: **{result.loss_probability:.1%}**",
+        f"• Средняя чистая маржа: {result.mean_margin:.1f}% ({result.mean_profit:.1f} ₽ на единицу)",
+        "• Маржа, перцентили: " + " | ".join(f"P{p}: {value:.1f}%" for p, value in result.margin_percentiles.items()),
+        f"• Прибыль P5–P95: {result.profit_percentiles[5]:.1f} … {result.profit_percentiles[95]:.1f} ₽",
+        "```",
+    ]
+    peak = max(result.histogram) or 1
+    for count, left, right in zip(result.histogram, result.bin_edges, result.bin_edges[1:]):
+        width = count / peak * 12
+        bar = '█' * int(width) + (_BARS[int((width % 1) * 8)] if width % 1 else '')
+        lines.append(f"{left:>6.1f}…{right:>5.1f}% {bar}")
+    lines.append("```")
+    return "\n".join(lines)
@@ -0,0 +1,155 @@
+"""Сценарии калькулятора: пересчёт по общим формулам, перерисовка затронутых секций и сравнение расчётов"""
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .batch_calculator import INPUT_COLUMNS, economy_metrics_batch
+
+MAX_SAVED_SCENARIOS = 10
+
+
+def _metrics(values: Dict[str, float]) -> Dict[str, float]:
+    """Метрики одной строкой через economy_metrics_batch — формулы не дублируются"""
+    row = economy_metrics_batch(np.array([[values[column] for column in INPUT_COLUMNS]], dtype=np.float64))
+    return {name: float(column[0]) for name, column in row.items()}
+
+
+# Что показывает сравнение сценариев: (ключ, подпись, единица)
+DIFF_ROWS = (
+    ('цена', 'Цена', '₽'),
+    ('себестоимость', 'Себест.', '₽'),
+    ('комиссия_%', 'Комиссия', '%'),
+    ('логистика_%', 'Логистика', '%'),
+    ('acos_%', 'ACOS', '%'),
+    ('налог_%', 'Налог', '%'),
+    ('cm1', 'CM1', '₽'),
+    ('cm2', 'CM2', '₽'),
+    ('чистая_прибыль', 'Прибыль', '₽'),
+    ('чистая_маржа_%', 'Маржа', '%'),
+)
+
+
+class Scenario:
+    """Входы и метрики одного расчёта; правка входа сообщает, какие метрики изменились"""
+    __slots__ = ('name', 'values')
+
+    def __init__(self, data: Sequence[float], name: str = ''):
+        self.name = name
+        self.values: Dict[str, float] = dict(zip(INPUT_COLUMNS, map(float, data)))
+        self.values.update(_metrics(self.values))
+
+    @property
+    def data(self) -> List[float]:
+        return [self.values[column] for column in INPUT_COLUMNS]
+
+    @property
+    def metrics(self) -> Dict[str, float]:
+        """Словарь в формате calculate_economy_metrics"""
+        return self.values
+
+    def copy(self, name: str = '') -> 'Scenario':
+        clone = Scenario.__new__(Scenario)
+        clone.name = name
+        clone.values = dict(self.values)
+        return clone
+
+    def update(self, changes: Dict[int, float]) -> Set[str]:
+        """
+        Применить {индекс входа: значение}; вернуть имена изменившихся входов и метрик.
+        Без изменившихся входов пересчёта нет.
+        """
+        dirty: Set[str] = set()
+        for index, value in changes.items():
+            column = INPUT_COLUMNS[index]
+            if self.values[column] != value:
+                self.values[column] = float(value)
+                dirty.add(column)
+        if not dirty:
+            return dirty
+        for metric, value in _metrics(self.values).items():
+            if value != self.values[metric]:
+                self.values[metric] = value
+                dirty.add(metric)
+        return dirty
+
+
+class ReportSection(NamedTuple):
+    name: str
+    depends_on: frozenset
+    render: Callable[[Scenario], str]
+
+
+class IncrementalReport:
+    """Отчёт из секций; после правки перерисовываются только секции с изменившимися метриками"""
+    def __init__(self, sections: Sequence[ReportSection], scenario: Scenario):
+        self.sections = sections
+        self.texts: Dict[str, str] = {section.name: section.render(scenario) for section in sections}
+
+    def refresh(self, scenario: Scenario, changed: Set[str]) -> List[str]:
+        """Перерисовать затронутые секции; вернуть имена тех, чей текст действительно изменился"""
+        updated = []
+        for section in self.sections:
+            if section.depends_on.isdisjoint(changed):
+                continue
+            text = section.render(scenario)
+            if text != self.texts[section.name]:
+                self.texts[section.name] = text
+                updated.append(section.name)
+        return updated
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.texts[section.name] for section in self.sections)
+
+
+class ScenarioBook:
+    """
+    Сценарии пользователя: текущий расчёт, состояние до последней правки,
+    сохранённые варианты и сообщение с отчётом, которое редактируется на месте.
+    """
+    def __init__(self):
+        self.current: Optional[Scenario] = None
+        self.previous: Optional[Scenario] = None
+        self.saved: List[Scenario] = []
+        self.report: Optional[IncrementalReport] = None
+        self.message: Optional[Tuple[int, int]] = None   # (chat_id, message_id) отчёта
+
+    def start(self, scenario: Scenario, sections: Sequence[ReportSection]) -> IncrementalReport:
+        """Новый расчёт; прежний остаётся доступен для сравнения"""
+        if self.current is not None:
+            self.previous = self.current
+        self.current = scenario
+        self.report = IncrementalReport(sections, scenario)
+        self.message = None
+        return self.report
+
+    def apply(self, changes: Dict[int, float]) -> List[str]:
+        """Правка текущего расчёта; вернёт перерисованные секции отчёта"""
+        before = self.current.copy()
+        changed = self.current.update(changes)
+        if not changed:
+            return []
+        self.previous = before
+        return self.report.refresh(self.current, changed)
+
+    def save(self, name: str = '') -> Scenario:
+        scenario = self.current.copy(name or f"Сценарий {len(self.saved) + 1}")
+        self.saved = [item for item in self.saved if item.name != scenario.name][-(MAX_SAVED_SCENARIOS - 1):]
+        self.saved.append(scenario)
+        return scenario
+
+    def find(self, name: str) -> Optional[Scenario]:
+        name = name.strip().lower()
+        return next((item for item in self.saved if item.name.lower() == name), None)
+
+
+def format_diff(before: Scenario, after: Scenario) -> str:
+    """Два сценария рядом: значения и разница (моноширинная таблица в Markdown)"""
+    before_name = (before.name or "Было")[:9]
+    after_name = (after.name or "Стало")[:9]
+    rows = [f"{'':<10}{before_name:>9}{after_name:>9}{'Δ':>8}"]
+    for key, title, unit in DIFF_ROWS:
+        old, new = before.values[key], after.values[key]
+        delta = f"{new - old:+.1f}" if new != old else "·"
+        rows.append(f"{title:<10}{old:>8.1f}{unit}{new:>8.1f}{unit}{delta:>8}")
+    return "\n".join(["↔️ **СРАВНЕНИЕ СЦЕНАРИЕВ**", "```", *rows, "```"])
@@ -0,0 +1,69 @@
+"""Каталог навыков SKILLTRAINER: нормализация ответа шага 1 и уровень из шага 2"""
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+from ..models import SkillSession
+
+SKILLS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'skills.yaml')
+
+# Индексы ответов диагностики (SKILLTRAINER_QUESTIONS)
+SKILL_ANSWER_STEP = 0
+LEVEL_ANSWER_STEP = 1
+
+# Корзины уровня по самооценке 1–10
+LEVEL_BUCKETS = (
+    ('novice', 1, 3),
+    ('intermediate', 4, 7),
+    ('advanced', 8, 10),
+)
+DEFAULT_LEVEL = 'intermediate'
+
+
+def _load_catalog(path: str) -> Tuple[Dict[str, str], Dict[str, re.Pattern]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    titles = {}
+    patterns = {}
+    for skill_id, skill in config.get('skills', {}).items():
+        titles[skill_id] = skill.get('title', skill_id)
+        roots = [re.escape(root).replace(r'\ ', r'\w*\s+') for root in skill.get('keywords', [])]
+        patterns[skill_id] = re.compile(r'\b(?:' + '|'.join(roots) + r')', re.IGNORECASE)
+    return titles, patterns
+
+
+SKILL_TITLES, _SKILL_PATTERNS = _load_catalog(SKILLS_PATH)
+
+
+def canonical_skill(text: str) -> Optional[str]:
+    """Id навыка по свободному ответу (больше совпавших корней — выше приоритет)"""
+    if not text:
+        return None
+    best_id, best_score = None, 0
+    for skill_id, pattern in _SKILL_PATTERNS.items():
+        score = len(pattern.findall(text))
+        if score > best_score:
+            best_id, best_score = skill_id, score
+    return best_id
+
+
+def level_bucket(answer: Optional[str]) -> str:
+    """Корзина уровня по ответу «от 1 до 10» (первое число в ответе)"""
+    match = re.search(r'\d+', answer or '')
+    if not match:
+        return DEFAULT_LEVEL
+    level = int(match.group(0))
+    for bucket, low, high in LEVEL_BUCKETS:
+        if low <= level <= high:
+            return bucket
+    return LEVEL_BUCKETS[-1][0] if level > 10 else LEVEL_BUCKETS[0][0]
+
+
+def session_skill_key(session: SkillSession) -> Tuple[Optional[str], str]:
+    """(id навыка, корзина уровня) для сессии"""
+    return (
+        canonical_skill(session.answers.get(SKILL_ANSWER_STEP, '')),
+        level_bucket(session.answers.get(LEVEL_ANSWER_STEP)),
+    )
@@ -0,0 +1,318 @@
+"""
+Подписки на ежедневные инструменты (фраза дня, гороскоп разума): текст генерируется один раз
+в день на тему, рассылка идёт в локальное время подписчика с ограничением темпа и курсором,
+сохраняемым на диск, — после падения рассылка продолжается с места остановки.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from telegram.error import BadRequest, Forbidden
+
+from ..config import logger, SYSTEM_PROMPTS, SUBSCRIPTIONS_PATH
+from .outbound import PRIORITY_BULK, TokenBucket, send_in_background
+
+SUBSCRIPTION_TOPICS = {
+    'daily_phrase': "🌟 Фраза дня",
+    'mind_horoscope': "🔮 Гороскоп разума",
+}
+DEFAULT_TIME = "08:00"
+DEFAULT_UTC_OFFSET = 3 * 60          # МСК, минуты
+TIME_PRESETS = ("07:00", "08:00", "09:00", "12:00", "20:00", "21:00")
+
+# Рассылка берёт меньше общего лимита бота (25/с), чтобы ответы пользователям не ждали
+BROADCAST_RATE = 15.0
+BROADCAST_BURST = 5
+BROADCAST_BATCH = 25                 # столько отправок одновременно; курсор двигается после пачки
+CHECKPOINT_SECONDS = 2.0             # не чаще — запись курсора на диск (≈ 30 сообщений)
+CATCHUP_MINUTES = 30                 # пропущенные за простой минуты досылаются, если простой короче
+TICK_SECONDS = 20
+KEEP_DAYS = 2                        # тексты и отчёты рассылок старше — удаляются
+
+_TIME_RE = re.compile(r'^([01]?\d|2[0-3])[:.]([0-5]\d)$')
+_OFFSET_RE = re.compile(r'^(?:utc|gmt|мск)?([+-]\d{1,2})(?::?(\d{2}))?$', re.IGNORECASE)
+
+
+def parse_time(text: str) -> Optional[int]:
+    """«8:30» → минута суток"""
+    match = _TIME_RE.match(text.strip())
+    return int(match.group(1)) * 60 + int(match.group(2)) if match else None
+
+
+def parse_utc_offset(text: str) -> Optional[int]:
+    """«UTC+5», «+5:30», «мск» → смещение в минутах"""
+    text = text.strip().lower()
+    if text in ('мск', 'msk'):
+        return DEFAULT_UTC_OFFSET
+    match = _OFFSET_RE.match(text)
+    if not match:
+        return None
+    hours = int(match.group(1))
+    minutes = int(match.group(2) or 0)
+    offset = hours * 60 + (minutes if hours >= 0 else -minutes)
+    return offset if -12 * 60 <= offset <= 14 * 60 else None
+
+
+def format_offset(offset: int) -> str:
+    sign = '+' if offset >= 0 else '-'
+    hours, minutes = divmod(abs(offset), 60)
+    return f"UTC{sign}{hours}" + (f":{minutes:02d}" if minutes else "")
+
+
+class SubscriptionService:
+    """
+    Подписчики хранятся вместе с индексом «минута UTC → тема → пользователи»,
+    поэтому выбор тех, кому пора отправлять, не перебирает всю базу.
+    Каждая рассылка — снимок получателей и курсор по нему; состояние пишется
+    атомарно (tmp + os.replace), при рестарте незавершённые рассылки продолжаются.
+    Доставка «хотя бы один раз»: после падения повторяются отправки с последней
+    записи курсора — не больше CHECKPOINT_SECONDS рассылки.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # user_id → тема → {'time': 'ЧЧ:ММ', 'offset': минуты}
+        self.subscriptions: Dict[int, Dict[str, dict]] = {}
+        self.by_minute: Dict[int, Dict[str, Set[int]]] = {}
+        self.daily: Dict[str, str] = {}         # 'ГГГГ-ММ-ДД:тема' → текст
+        self.runs: Dict[str, dict] = {}         # 'ГГГГ-ММ-ДДTММММ:тема' → получатели, курсор, счётчики
+        self.last_tick: Optional[str] = None
+        self.stats = {'delivered': 0, 'blocked': 0, 'failed': 0}
+        self._bucket = TokenBucket(BROADCAST_RATE, BROADCAST_BURST)
+        self._task: Optional[asyncio.Task] = None
+        self._saved_at = 0.0
+        self._load()
+
+    # --- подписки -----------------------------------------------------------
+
+    @staticmethod
+    def utc_minute(local_time: str, offset: int) -> int:
+        return (parse_time(local_time) - offset) % (24 * 60)
+
+    def topics(self, user_id: int) -> Dict[str, dict]:
+        return self.subscriptions.get(user_id, {})
+
+    def subscribe(self, user_id: int, topic: str, local_time: Optional[str] = None,
+                  offset: Optional[int] = None) -> dict:
+        """Подписать на тему (или поменять время); без времени берётся текущее пользователя"""
+        current = self.topics(user_id)
+        reference = next(iter(current.values()), {})
+        entry = {
+            'time': local_time or reference.get('time', DEFAULT_TIME),
+            'offset': reference.get('offset', DEFAULT_UTC_OFFSET) if offset is None else offset,
+        }
+        self._unindex(user_id, topic)
+        self.subscriptions.setdefault(user_id, {})[topic] = entry
+        self._index(user_id, topic, entry)
+        self._save()
+        return entry
+
+    def set_schedule(self, user_id: int, local_time: Optional[str] = None, offset: Optional[int] = None):
+        """Новое время и/или часовой пояс для всех тем пользователя"""
+        for topic in list(self.topics(user_id)):
+            self.subscribe(user_id, topic, local_time, offset)
+
+    def unsubscribe(self, user_id: int, topic: Optional[str] = None, save: bool = True):
+        for name in [topic] if topic else list(self.topics(user_id)):
+            self._unindex(user_id, name)
+            self.subscriptions.get(user_id, {}).pop(name, None)
+        if not self.subscriptions.get(user_id):
+            self.subscriptions.pop(user_id, None)
+        if save:
+            self._save()
+
+    def _index(self, user_id: int, topic: str, entry: dict):
+        minute = self.utc_minute(entry['time'], entry['offset'])
+        self.by_minute.setdefault(minute, {}).setdefault(topic, set()).add(user_id)
+
+    def _unindex(self, user_id: int, topic: str):
+        entry = self.topics(user_id).get(topic)
+        if not entry:
+            return
+        minute = self.utc_minute(entry['time'], entry['offset'])
+        topics = self.by_minute.get(minute, {})
+        topics.get(topic, set()).discard(user_id)
+        if not topics.get(topic):
+            topics.pop(topic, None)
+            if not topics:
+                self.by_minute.pop(minute, None)
+
+    # --- ежедневный текст ---------------------------------------------------
+
+    async def content_for(self, topic: str, day: str, groq_client) -> Optional[str]:
+        """Текст темы на день: один вызов LLM на всех подписчиков"""
+        key = f"{day}:{topic}"
+        if key not in self.daily and groq_client:
+            try:
+                chat_completion = await asyncio.to_thread(
+                    groq_client.chat.completions.create,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPTS[topic]},
+                        {"role": "user", "content": f"Сегодня {day}."}
+                    ],
+                    model="llama-3.1-8b-instant",
+                    max_tokens=300
+                )
+                self.daily[key] = chat_completion.choices[0].message.content.strip()
+                self._save()
+            except Exception as e:
+                logger.error(f"Не удалось подготовить «{topic}» на {day}: {e}")
+        return self.daily.get(key)
+
+    # --- рассылка -----------------------------------------------------------
+
+    def _due_minutes(self, now: datetime) -> List[datetime]:
+        """Минуты с прошлого тика по текущую (не больше CATCHUP_MINUTES назад)"""
+        current = now.replace(second=0, microsecond=0)
+        start = current
+        if self.last_tick:
+            previous = datetime.fromisoformat(self.last_tick)
+            start = max(previous + timedelta(minutes=1), current - timedelta(minutes=CATCHUP_MINUTES))
+        minutes = []
+        while start <= current:
+            minutes.append(start)
+            start += timedelta(minutes=1)
+        return minutes
+
+    def _plan_runs(self, now: datetime):
+        for moment in self._due_minutes(now):
+            minute = moment.hour * 60 + moment.minute
+            for topic, users in self.by_minute.get(minute, {}).items():
+                run_id = f"{moment.date().isoformat()}T{minute:04d}:{topic}"
+                if users and run_id not in self.runs:
+                    # День подписчика — по его часовому поясу: вечером UTC у него может быть уже завтра
+                    self.runs[run_id] = {
+                        'topic': topic, 'recipients': sorted(users), 'cursor': 0,
+                        'delivered': 0, 'blocked': 0, 'failed': 0, 'seconds': 0.0, 'finished': False,
+                    }
+            self.last_tick = moment.isoformat()
+        self._save()
+
+    async def tick(self, bot, groq_client, now: Optional[datetime] = None):
+        """Запланировать наступившие рассылки и довести до конца все незавершённые"""
+        now = now or datetime.now(timezone.utc)
+        self._plan_runs(now)
+        for run_id, run in list(self.runs.items()):
+            if run['finished']:
+                continue
+            text = await self.content_for(run['topic'], self._local_day(run, now), groq_client)
+            if text is None:
+                continue        # LLM недоступен — повторим на следующем тике
+            await self._fan_out(bot, run_id, run, f"{SUBSCRIPTION_TOPICS[run['topic']]}\n\n{text}")
+        self._prune(now)
+
+    def _local_day(self, run: dict, now: datetime) -> str:
+        """Дата по часовому поясу первого получателя (у большинства подписчиков он один — МСК)"""
+        recipients = run['recipients']
+        entry = self.topics(recipients[0]).get(run['topic']) if recipients else None
+        offset = entry['offset'] if entry else DEFAULT_UTC_OFFSET
+        return (now + timedelta(minutes=offset)).date().isoformat()
+
+    async def _fan_out(self, bot, run_id: str, run: dict, text: str):
+        recipients = run['recipients']
+        while run['cursor'] < len(recipients):
+            started = time.monotonic()
+            batch = recipients[run['cursor']:run['cursor'] + BROADCAST_BATCH]
+            deliveries: List[Tuple[int, asyncio.Task]] = []
+            for user_id in batch:
+                delay = self._bucket.delay(time.monotonic())
+                if delay:
+                    await asyncio.sleep(delay)
+                    self._bucket.delay(time.monotonic())
+                self._bucket.consume()
+                deliveries.append((user_id, send_in_background(bot, user_id, text, priority=PRIORITY_BULK)))
+            for user_id, delivery in deliveries:
+                try:
+                    await delivery
+                    run['delivered'] += 1
+                except (Forbidden, BadRequest) as e:
+                    # Бот заблокирован или чата больше нет — не повторяем и снимаем подписки
+                    if isinstance(e, BadRequest) and 'chat not found' not in str(e).lower():
+                        run['failed'] += 1
+                        continue
+                    run['blocked'] += 1
+                    self.unsubscribe(user_id, save=False)
+                except Exception as e:
+                    run['failed'] += 1
+                    logger.warning(f"Рассылка {run_id}: не доставлено {user_id}: {e}")
+            run['cursor'] += len(batch)
+            run['seconds'] += time.monotonic() - started
+            if time.monotonic() - self._saved_at >= CHECKPOINT_SECONDS:
+                self._save()
+        run['finished'] = True
+        for key in self.stats:
+            self.stats[key] += run[key]
+        self._save()
+        logger.info(f"Рассылка {run_id}: {self.report(run)}")
+
+    @staticmethod
+    def report(run: dict) -> str:
+        rate = run['delivered'] / run['seconds'] if run['seconds'] else 0.0
+        return (
+            f"доставлено {run['delivered']}, заблокировали {run['blocked']}, ошибок {run['failed']} "
+            f"из {len(run['recipients'])} за {run['seconds']:.1f} с ({rate:.1f} сообщ./с)"
+        )
+
+    def _prune(self, now: datetime):
+        cutoff = (now - timedelta(days=KEEP_DAYS)).date().isoformat()
+        self.daily = {key: value for key, value in self.daily.items() if key[:10] >= cutoff}
+        self.runs = {key: value for key, value in self.runs.items() if not value['finished'] or key[:10] >= cutoff}
+
+    # --- фоновый цикл -------------------------------------------------------
+
+    def start(self, application):
+        """Запустить цикл рассылок рядом с приложением"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(application))
+
+    async def _run(self, application):
+        while True:
+            try:
+                await self.tick(application.bot, application.bot_data.get('groq_client'))
+            except Exception as e:
+                logger.error(f"Ошибка цикла рассылок: {e}")
+            await asyncio.sleep(TICK_SECONDS)
+
+    # --- хранение -----------------------------------------------------------
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for user_id, topics in data.get('subscriptions', {}).items():
+                for topic, entry in topics.items():
+                    if topic in SUBSCRIPTION_TOPICS:
+                        self.subscriptions.setdefault(int(user_id), {})[topic] = entry
+                        self._index(int(user_id), topic, entry)
+            self.daily = data.get('daily', {})
+            self.runs = data.get('runs', {})
+            self.last_tick = data.get('last_tick')
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Не удалось загрузить подписки: {e}")
+
+    def _save(self):
+        self._saved_at = time.monotonic()
+        if not self.path:
+            return
+        data = {
+            'subscriptions': {str(user_id): topics for user_id, topics in self.subscriptions.items()},
+            'daily': self.daily,
+            'runs': self.runs,
+            'last_tick': self.last_tick,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить подписки: {e}")
+
+
+subscription_service = SubscriptionService(SUBSCRIPTIONS_PATH)
@@ -0,0 +1,201 @@
+"""Банк тренировочных заданий SKILLTRAINER по (навык, режим, уровень) с фоновым пополнением"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..config import logger, SYSTEM_PROMPTS, TASK_BANK_PATH
+from ..models import LRUCache, SkillSession, TrainingMode
+from .skill_catalog import SKILL_TITLES, session_skill_key
+from .tracing import tracer
+
+BankKey = Tuple[str, str, str]  # (навык, режим, уровень)
+
+MAX_TASKS_PER_KEY = 20      # потолок заданий на ключ
+MAX_SERVED_USERS = 5000     # столько пользователей помним (давно не заходившие вытесняются)
+SERVED_SAVE_SECONDS = 10.0  # не чаще — запись выданных заданий на диск
+MIN_UNUSED_STOCK = 3        # ниже — запускаем фоновое пополнение
+LEVEL_TITLES = {'novice': 'новичок', 'intermediate': 'средний уровень', 'advanced': 'продвинутый'}
+
+# Задание в банке общее для всех пользователей, поэтому промт не содержит их ответов
+REFILL_PROMPT = """Создай одно тренировочное задание для развития навыка «{skill}».
+Режим тренировки: {mode}. Уровень ученика: {level}.
+Задание должно быть:
+1. Практическим и конкретным
+2. Соответствовать выбранному режиму
+3. Иметь четкую инструкцию
+4. Быть выполнимым за 5-15 минут
+5. Включать критерии успешного выполнения (DOD)
+Формат ответа:
+**ЗАДАНИЕ:** [Название задания]
+**ИНСТРУКЦИЯ:** [Пошаговая инструкция]
+**КРИТЕРИИ УСПЕХА (DOD):
+1. [Критерий 1]
+2. [Критерий 2]
+3. [Критерий 3]
+**ПОДСКАЗКА:** [Короткая подсказка ≤240 символов]"""
+
+
+def _task_id(task: str) -> str:
+    return hashlib.md5(task.encode('utf-8')).hexdigest()[:12]
+
+
+class TaskBank:
+    """
+    Переиспользуемые задания: новому пользователю отдаётся ещё не виденное им
+    задание из банка, LLM вызывается только при промахе. Пополнение — в фоне.
+    Выданные задания хранятся рядом с банком (<банк>.served.json) и переживают перезапуск;
+    файл пишется не чаще SERVED_SAVE_SECONDS, поэтому при остановке процесса могут повториться
+    только задания, выданные за последние секунды (штатного завершения с записью у бота нет).
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.served_path = f"{os.path.splitext(path)[0]}.served.json" if path else None
+        self.tasks: Dict[BankKey, List[str]] = {}
+        self.served = LRUCache(max_size=MAX_SERVED_USERS)  # user_id → множество id выданных заданий
+        self._served_saved_at = 0.0
+        self._served_dirty = False
+        self.stats = {'hits': 0, 'misses': 0, 'bypass': 0, 'refills': 0, 'refill_errors': 0}
+        self._refilling: Set[BankKey] = set()
+        self._background: Set[asyncio.Task] = set()
+        self._load()
+
+    @staticmethod
+    def key_for(session: SkillSession) -> Optional[BankKey]:
+        """Ключ банка для сессии (None — навык не распознан или режим не выбран)"""
+        skill, level = session_skill_key(session)
+        if not skill or not session.selected_mode:
+            return None
+        return skill, session.selected_mode.value, level
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def take(self, user_id: int, session: SkillSession) -> Optional[str]:
+        """Выдать пользователю неиспользованное им задание из банка"""
+        key = self.key_for(session)
+        if key is None:
+            self.stats['bypass'] += 1
+            return None
+        served: Set[str] = self.served.get(user_id) or set()
+        for task in self.tasks.get(key, ()):
+            task_id = _task_id(task)
+            if task_id not in served:
+                served.add(task_id)
+                self.served.set(user_id, served)
+                self.stats['hits'] += 1
+                self._save_served()
+                return task
+        self.stats['misses'] += 1
+        return None
+
+    def add(self, key: BankKey, task: str):
+        """Добавить задание в банк"""
+        bucket = self.tasks.setdefault(key, [])
+        if task in bucket:
+            return
+        bucket.append(task)
+        del bucket[:-MAX_TASKS_PER_KEY]
+
+    def unused_stock(self, key: BankKey, user_id: int) -> int:
+        """Сколько заданий ключа пользователь ещё не видел"""
+        served = self.served.get(user_id) or set()
+        return sum(1 for task in self.tasks.get(key, ()) if _task_id(task) not in served)
+
+    def schedule_refill(self, session: SkillSession, groq_client):
+        """Запустить фоновое пополнение ключа сессии, если запас заканчивается"""
+        key = self.key_for(session)
+        if key is None or not groq_client or key in self._refilling:
+            return
+        if self.unused_stock(key, session.user_id) >= MIN_UNUSED_STOCK:
+            return
+        if len(self.tasks.get(key, ())) >= MAX_TASKS_PER_KEY:
+            return
+        self._refilling.add(key)
+        task = asyncio.create_task(self._refill(key, groq_client))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refill(self, key: BankKey, groq_client):
+        skill, mode, level = key
+        prompt = REFILL_PROMPT.format(
+            skill=SKILL_TITLES.get(skill, skill),
+            mode=TrainingMode(mode).name,
+            level=LEVEL_TITLES.get(level, level)
+        )
+        try:
+            with tracer.span('llm'):
+                chat_completion = await asyncio.to_thread(
+                    groq_client.chat.completions.create,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPTS['skilltrainer']},
+                        {"role": "user", "content": prompt}
+                    ],
+                    model="llama-3.1-8b-instant",
+                    max_tokens=1500
+                )
+            self.add(key, chat_completion.choices[0].message.content)
+            self.stats['refills'] += 1
+            self._save()
+            if self._served_dirty:
+                self._save_served(force=True)
+        except Exception as e:
+            self.stats['refill_errors'] += 1
+            logger.error(f"Ошибка пополнения банка заданий {key}: {e}")
+        finally:
+            self._refilling.discard(key)
+        logger.info(f"Банк заданий {key}: {len(self.tasks.get(key, ()))} заданий, hit rate {self.hit_rate:.0%}")
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for entry in data.get('tasks', []):
+                self.tasks[tuple(entry['key'])] = list(entry['items'])[-MAX_TASKS_PER_KEY:]
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Не удалось загрузить банк заданий: {e}")
+        if self.served_path and os.path.exists(self.served_path):
+            try:
+                with open(self.served_path, 'r', encoding='utf-8') as f:
+                    # Порядок в файле — от давно заходивших к недавним, как в LRU
+                    for user_id, task_ids in json.load(f).items():
+                        self.served.set(int(user_id), set(task_ids))
+            except (OSError, ValueError, AttributeError) as e:
+                logger.error(f"Не удалось загрузить выданные задания: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {'tasks': [{'key': list(key), 'items': items} for key, items in self.tasks.items()]}
+        self._write(self.path, data, "банк заданий")
+
+    def _save_served(self, force: bool = False):
+        if not self.served_path:
+            return
+        self._served_dirty = True
+        if not force and time.monotonic() - self._served_saved_at < SERVED_SAVE_SECONDS:
+            return
+        self._served_saved_at = time.monotonic()
+        self._served_dirty = False
+        data = {str(user_id): sorted(task_ids) for user_id, task_ids in self.served.cache.items()}
+        self._write(self.served_path, data, "выданные задания")
+
+    @staticmethod
+    def _write(path: str, data, title: str):
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить {title}: {e}")
+
+
+task_bank = TaskBank(TASK_BANK_PATH)
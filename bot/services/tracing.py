@@ -0,0 +1,201 @@
+"""
+Трассировка апдейтов: корневой спан на каждый сэмплированный апдейт во входной точке
+(webhook или polling) и дочерние — на маршрутизацию, обезличивание, кэш, вызов LLM и
+каждую отправку в Telegram. Готовые трассы лежат в кольцевом буфере, медленные — в
+отдельном, админ смотрит их командой /traces.
+
+Текущая трасса передаётся через contextvars, поэтому задачи, созданные из обработчика
+(фоновые отправки), пишут спаны в ту же трассу. Без сэмплирования span() — одно чтение
+ContextVar и общий пустой контекст-менеджер.
+"""
+import itertools
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Deque, List, Optional
+
+from ..config import TRACE_SAMPLE_RATE, TRACE_SLOW_MS
+
+TRACE_CAPACITY = 200        # столько последних трасс и столько медленных держим в памяти
+MAX_SPANS = 64              # спанов в одной трассе больше не пишем (длинные рассылки)
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'parent', 'start', 'duration', 'error', '_token')
+
+    def __init__(self, trace: 'Trace', name: str):
+        self.trace = trace
+        self.name = name
+        self.parent: Optional[Span] = None
+        self.start = 0.0
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def __enter__(self) -> 'Span':
+        self.parent = _current_span.get()
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        if len(self.trace.spans) < MAX_SPANS:
+            self.trace.spans.append(self)
+        else:
+            self.trace.dropped += 1
+
+    @property
+    def depth(self) -> int:
+        depth, parent = 0, self.parent
+        while parent is not None:
+            depth, parent = depth + 1, parent.parent
+        return depth
+
+
+class Trace:
+    __slots__ = ('trace_id', 'label', 'started_at', 'root', 'spans', 'dropped')
+
+    def __init__(self, trace_id: int, name: str, label: str):
+        self.trace_id = trace_id
+        self.label = label                  # 'message 123456' — тип апдейта и пользователь
+        self.started_at = datetime.now()
+        self.root = Span(self, name)
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.root.duration or 0.0) * 1000
+
+    def format(self) -> str:
+        lines = [f"#{self.trace_id} {self.root.name} {self.label} — {self.duration_ms:.0f} мс "
+                 f"({self.started_at:%H:%M:%S})"]
+        for span in sorted(self.spans, key=lambda span: span.start):
+            if span is self.root:
+                continue
+            offset = (span.start - self.root.start) * 1000
+            duration = f"{span.duration * 1000:.2f} мс" if span.duration is not None else "не завершён"
+            error = f" ✗ {span.error}" if span.error else ""
+            lines.append(f"{'  ' * span.depth}+{offset:.0f} {span.name}: {duration}{error}")
+        if self.dropped:
+            lines.append(f"  … ещё {self.dropped} спанов не записано")
+        return "\n".join(lines)
+
+
+class _TraceScope:
+    """Корневой спан: по выходу трасса уходит в буферы"""
+    __slots__ = ('tracer', 'trace', '_token')
+
+    def __init__(self, tracer: 'Tracer', trace: Trace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self) -> Trace:
+        self._token = _current_trace.set(self.trace)
+        self.trace.root.__enter__()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.trace.root.__exit__(exc_type, exc, tb)
+        _current_trace.reset(self._token)
+        self.tracer._finish(self.trace)
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+class _UnsampledScope:
+    """Апдейт не попал в выборку: вложенные trace() (webhook → process_update) не бросают жребий заново"""
+    __slots__ = ('_token',)
+
+    def __enter__(self):
+        self._token = _unsampled.set(True)
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _unsampled.reset(self._token)
+
+
+_NULL_SCOPE = _NullScope()
+_unsampled: ContextVar[bool] = ContextVar('unsampled', default=False)
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0, slow_ms: float = 1500.0, capacity: int = TRACE_CAPACITY):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.recent: Deque[Trace] = deque(maxlen=capacity)
+        self.slow: Deque[Trace] = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self.stats = {'traced': 0, 'slow': 0}
+
+    def trace(self, name: str, label: str = ''):
+        """
+        Корневой спан апдейта; без сэмплирования — пустой. Решение о выборке одно на апдейт:
+        внутри уже открытой трассы или апдейта, не попавшего в выборку, — тоже пустой.
+        """
+        if not self.sample_rate or _current_trace.get() is not None or _unsampled.get():
+            return _NULL_SCOPE
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return _UnsampledScope()
+        return _TraceScope(self, Trace(next(self._ids), name, label))
+
+    def span(self, name: str):
+        """Дочерний спан текущей трассы (вне трассы — пустой)"""
+        trace = _current_trace.get()
+        if trace is None:
+            return _NULL_SCOPE
+        return Span(trace, name)
+
+    def _finish(self, trace: Trace) -> None:
+        self.stats['traced'] += 1
+        self.recent.append(trace)
+        if trace.duration_ms >= self.slow_ms:
+            self.stats['slow'] += 1
+            self.slow.append(trace)
+
+    def report(self, limit: int = 5) -> str:
+        """Сводка и самые медленные из недавних медленных трасс"""
+        header = (
+            f"Трассировка: сэмплирование {self.sample_rate:.0%}, порог {self.slow_ms:.0f} мс, "
+            f"записано {self.stats['traced']}, медленных {self.stats['slow']}"
+        )
+        durations = sorted(trace.duration_ms for trace in self.recent)
+        if durations:
+            header += (
+                f"\nПоследние {len(durations)}: p50 {durations[len(durations) // 2]:.0f} мс, "
+                f"p95 {durations[int(len(durations) * 0.95)]:.0f} мс, максимум {durations[-1]:.0f} мс"
+            )
+        slowest = sorted(self.slow, key=lambda trace: trace.duration_ms, reverse=True)[:limit]
+        if not slowest:
+            return header + "\nМедленных трасс пока нет."
+        return "\n\n".join([header] + [trace.format() for trace in slowest])
+
+
+def update_label(update) -> str:
+    """'message 123456' — тип апдейта и id пользователя для заголовка трассы"""
+    if update.callback_query:
+        kind = 'callback'
+    elif update.message:
+        kind = 'message'
+    else:
+        kind = 'update'
+    user = update.effective_user
+    return f"{kind} {user.id}" if user else kind
+
+
+tracer = Tracer(TRACE_SAMPLE_RATE, TRACE_SLOW_MS)
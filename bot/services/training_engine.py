@@ -0,0 +1,168 @@
+"""Локальный движок QUIZ / DRILL для SKILLTRAINER: банк элементов, адаптивный подбор и оценка без LLM"""
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from ..models import SkillSession, TrainingMode
+from .skill_catalog import session_skill_key
+
+ITEMS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'training_items.yaml')
+
+RUN_LENGTH = 5              # элементов за один прогон
+DRILL_PASS_SCORE = 0.6      # доля ключевых пунктов для зачёта упражнения
+GENERAL_SKILL = 'general'   # элементы для любого навыка
+LEVEL_DIFFICULTY = {'novice': 1, 'intermediate': 2, 'advanced': 3}
+MODE_KINDS = {TrainingMode.QUIZ: 'quiz', TrainingMode.DRILL: 'drill'}
+OPTION_LETTERS = 'abcdабвг'
+
+
+class TrainingItem(NamedTuple):
+    """Элемент банка: вопрос теста или упражнение"""
+    id: str
+    kind: str
+    skill: str
+    difficulty: int
+    prompt: str
+    options: Tuple[str, ...] = ()
+    answer: Optional[int] = None
+    explanation: str = ''
+    key_points: Tuple[Tuple[str, Tuple[str, ...]], ...] = ()
+
+
+class ItemBank:
+    """Банк элементов из версионированного YAML, загружается один раз при старте"""
+    def __init__(self, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+        self.version: str = str(data.get('version', '0'))
+        self.items: Dict[Tuple[str, str], List[TrainingItem]] = {}
+        for skill, entries in (data.get('quiz') or {}).items():
+            self.items[('quiz', skill)] = [
+                TrainingItem(
+                    id=entry['id'], kind='quiz', skill=skill,
+                    difficulty=int(entry.get('difficulty', 2)),
+                    prompt=entry['question'],
+                    options=tuple(entry['options']),
+                    answer=int(entry['answer']),
+                    explanation=entry.get('explanation', ''),
+                ) for entry in entries
+            ]
+        for skill, entries in (data.get('drill') or {}).items():
+            self.items[('drill', skill)] = [
+                TrainingItem(
+                    id=entry['id'], kind='drill', skill=skill,
+                    difficulty=int(entry.get('difficulty', 2)),
+                    prompt=entry['prompt'],
+                    key_points=tuple(
+                        (point['label'], tuple(word.lower() for word in point['keywords']))
+                        for point in entry.get('key_points', [])
+                    ),
+                ) for entry in entries
+            ]
+
+    def candidates(self, kind: str, skill: Optional[str]) -> List[TrainingItem]:
+        """Элементы навыка, затем общие"""
+        items = list(self.items.get((kind, skill), [])) if skill else []
+        return items + self.items.get((kind, GENERAL_SKILL), [])
+
+
+class LocalRun:
+    """Прогон QUIZ/DRILL: адаптивная сложность по принципу «лесенки»"""
+    __slots__ = ('kind', 'items', 'asked', 'target', 'current', 'correct', 'answered', 'bank_version')
+
+    def __init__(self, kind: str, items: List[TrainingItem], target: int, bank_version: str):
+        self.kind = kind
+        self.items = items
+        self.asked: List[str] = []
+        self.target = target
+        self.current: Optional[TrainingItem] = None
+        self.correct = 0
+        self.answered = 0
+        self.bank_version = bank_version
+
+    @property
+    def total(self) -> int:
+        return min(RUN_LENGTH, len(self.items))
+
+    @property
+    def finished(self) -> bool:
+        return self.answered >= self.total
+
+    def next_item(self) -> Optional[TrainingItem]:
+        """Неиспользованный элемент с ближайшей к целевой сложностью"""
+        if self.finished:
+            self.current = None
+            return None
+        unused = [item for item in self.items if item.id not in self.asked]
+        if not unused:
+            self.current = None
+            return None
+        # min() стабилен: при равной сложности выигрывают элементы навыка (идут первыми)
+        item = min(unused, key=lambda candidate: abs(candidate.difficulty - self.target))
+        self.asked.append(item.id)
+        self.current = item
+        return item
+
+    def score(self, answer: str) -> Tuple[bool, str]:
+        """Оценка ответа на текущий элемент. Возвращает (зачтено, обратная связь)"""
+        item = self.current
+        if item is None:
+            return False, "Нет активного вопроса."
+        if item.kind == 'quiz':
+            choice = parse_option(answer, item.options)
+            if choice is None:
+                return False, f"Ответьте номером варианта (1–{len(item.options)})."
+            passed = choice == item.answer
+            feedback = ("✅ Верно! " if passed else f"❌ Правильный ответ: {item.options[item.answer]}. ") + item.explanation
+        else:
+            text = answer.lower()
+            missed = [label for label, words in item.key_points if not any(word in text for word in words)]
+            ratio = 1 - len(missed) / len(item.key_points) if item.key_points else 1.0
+            passed = ratio >= DRILL_PASS_SCORE
+            feedback = f"{'✅ Зачтено' if passed else '🔁 Почти'}: {int(ratio * 100)}% ключевых пунктов."
+            if missed:
+                feedback += "\nДобавьте: " + "; ".join(missed)
+        self.answered += 1
+        self.correct += int(passed)
+        self.target = min(3, self.target + 1) if passed else max(1, self.target - 1)
+        self.current = None
+        return passed, feedback
+
+    def summary(self) -> str:
+        return (
+            f"🏁 Итог: {self.correct}/{self.answered} "
+            f"({'тест' if self.kind == 'quiz' else 'упражнения'}, банк v{self.bank_version})"
+        )
+
+
+def parse_option(answer: str, options: Tuple[str, ...]) -> Optional[int]:
+    """Номер варианта из «2», «b», «Б» или полного текста варианта"""
+    text = answer.strip().lower()
+    match = re.match(r'^(\d+)\b', text)
+    if match:
+        index = int(match.group(1)) - 1
+        return index if 0 <= index < len(options) else None
+    if len(text) == 1 and text in OPTION_LETTERS:
+        index = OPTION_LETTERS.index(text) % 4
+        return index if index < len(options) else None
+    for index, option in enumerate(options):
+        if text == option.lower():
+            return index
+    return None
+
+
+def start_run(session: SkillSession) -> Optional[LocalRun]:
+    """Новый локальный прогон для режимов QUIZ/DRILL (None — режим не локальный или банк пуст)"""
+    kind = MODE_KINDS.get(session.selected_mode)
+    if kind is None:
+        return None
+    skill, level = session_skill_key(session)
+    items = item_bank.candidates(kind, skill)
+    if not items:
+        return None
+    return LocalRun(kind, items, LEVEL_DIFFICULTY.get(level, 2), item_bank.version)
+
+
+item_bank = ItemBank(ITEMS_PATH)
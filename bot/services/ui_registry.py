@@ -0,0 +1,86 @@
+"""
+Реестр меню: тексты и клавиатуры из bot/data/menus.yaml собираются один раз при запуске,
+обработчики берут готовые объекты по id. Объекты PTB неизменяемы, поэтому одну разметку
+можно отдавать во все чаты.
+"""
+import os
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import yaml
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+MENUS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'menus.yaml')
+RENDERED_LIMIT = 1024       # столько разных наборов параметров шаблонов держим в памяти
+
+
+class Menu(NamedTuple):
+    text: Optional[str]
+    markup: Optional[InlineKeyboardMarkup]
+    parse_mode: Optional[str]
+
+
+def build_markup(rows, params: Optional[Dict[str, object]] = None) -> InlineKeyboardMarkup:
+    """Ряды [надпись, callback_data] → InlineKeyboardMarkup с подстановкой {параметров}"""
+    if params:
+        rows = [[(label.format_map(params), data.format_map(params)) for label, data in row] for row in rows]
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(label, callback_data=data) for label, data in row] for row in rows
+    ])
+
+
+class UiRegistry:
+    """
+    Статичные меню — готовые Menu в словаре. Шаблоны (params в YAML или builder,
+    зарегистрированный через template) рендерятся при первом запросе с данными
+    значениями и дальше отдаются из кэша по ключу (id, параметры).
+    """
+    def __init__(self, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+        self.version: str = str(data.get('version', '0'))
+        self._menus: Dict[str, Menu] = {}
+        self._templates: Dict[str, dict] = {}
+        self._builders: Dict[str, Callable[..., Menu]] = {}
+        self._rendered: Dict[Tuple, Menu] = {}
+        for menu_id, entry in data['menus'].items():
+            if entry.get('params'):
+                self._templates[menu_id] = entry
+            else:
+                self._menus[menu_id] = self._build(entry)
+
+    @staticmethod
+    def _build(entry: dict, params: Optional[Dict[str, object]] = None) -> Menu:
+        text = entry.get('text')
+        if text is not None and params:
+            text = text.format_map(params)
+        rows = entry.get('rows')
+        return Menu(text, build_markup(rows, params) if rows else None, entry.get('parse_mode'))
+
+    def template(self, menu_id: str):
+        """Декоратор: builder(**params) → Menu для меню, которые не описать в YAML"""
+        def register(builder: Callable[..., Menu]) -> Callable[..., Menu]:
+            self._builders[menu_id] = builder
+            return builder
+        return register
+
+    def menu(self, menu_id: str, **params) -> Menu:
+        if not params:
+            return self._menus[menu_id]
+        key = (menu_id, *sorted(params.items()))
+        menu = self._rendered.get(key)
+        if menu is None:
+            if len(self._rendered) >= RENDERED_LIMIT:
+                self._rendered.clear()
+            builder = self._builders.get(menu_id)
+            menu = builder(**params) if builder else self._build(self._templates[menu_id], params)
+            self._rendered[key] = menu
+        return menu
+
+    def markup(self, menu_id: str, **params) -> Optional[InlineKeyboardMarkup]:
+        return self.menu(menu_id, **params).markup
+
+    def text(self, menu_id: str, **params) -> Optional[str]:
+        return self.menu(menu_id, **params).text
+
+
+ui = UiRegistry(MENUS_PATH)
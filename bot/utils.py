@@ -1,79 +1,106 @@
 """Вспомогательные функции бота"""
-import random
-import re
+import asyncio
 from typing import List, Tuple
-from datetime import datetime
+from telegram.constants import ParseMode
 from .models import SkillSession
-from .config import SKILLTRAINER_QUESTIONS, SKILLTRAINER_GATES, SKILLTRAINER_VERSION
+from .config import SKILLTRAINER_GATES
+from .services.hint_engine import hint_index
+from .services.message_split import MESSAGE_LIMIT, split_message, telegram_length
+from .services.pii_engine import pii_engine
+from .services.outbound import PRIORITY_BULK, PRIORITY_INTERACTIVE, send_in_background
+
+
+SANITIZE_REMOVED = '<>{}`|\\-\t'   # опасные для разметки и промта символы
+SANITIZE_KEPT = '\r'                 # непечатаемый, но сохраняется
+SANITIZE_MARGIN = 256                # запас сверх max_length на удаляемые символы
+# Частые удаляемые символы: убираются str.replace, и обычный текст до translate не доходит
+SANITIZE_FREQUENT = '\n' + SANITIZE_REMOVED
+
+
+class _SanitizeTable(dict):
+    """
+    Таблица удаления для str.translate: опасные символы и непечатаемые символы BMP
+    заполнены при импорте, символы вне BMP классифицируются при первой встрече
+    и запоминаются.
+    """
+    def __missing__(self, code: int):
+        char = chr(code)
+        value = code if char.isprintable() or char in SANITIZE_KEPT else None
+        self[code] = value
+        return value
+
+
+SANITIZE_TABLE = _SanitizeTable(
+    {code: None for code in range(0x10000) if not chr(code).isprintable() and chr(code) not in SANITIZE_KEPT}
+)
+SANITIZE_TABLE.update(dict.fromkeys(map(ord, SANITIZE_REMOVED)))
+
+
+def _sanitize_chunk(chunk: str) -> str:
+    for char in SANITIZE_FREQUENT:
+        if char in chunk:
+            chunk = chunk.replace(char, '')
+    if not chunk.isprintable():
+        # Остались управляющие, невидимые и т.п. — один проход по таблице удаления
+        chunk = chunk.translate(SANITIZE_TABLE)
+    return chunk
 
 
 def sanitize_user_input(text: str, max_length: int = 2000) -> str:
-    """Очистка пользовательского ввода от опасных символов"""
+    """
+    Очистка пользовательского ввода от опасных символов. Результат тот же, что у
+    удаления SANITIZE_REMOVED и всех непечатаемых символов, кроме \\r, с обрезкой
+    до max_length, но обрабатывается только начало текста: max_length + запас,
+    и следующие куски — лишь если удалённые символы съели запас.
+    """
     if not text:
         return ""
-    cleaned = re.sub(r'[<>{}`|\\\-\t]', '', text)
-    cleaned = ''.join(char for char in cleaned if char.isprintable() or char in '\r')
+    end = max_length + SANITIZE_MARGIN
+    cleaned = _sanitize_chunk(text[:end])
+    while len(cleaned) < max_length and end < len(text):
+        cleaned += _sanitize_chunk(text[end:end + max_length])
+        end += max_length
     return cleaned[:max_length]
 
 
 def mask_pii(text: str) -> str:
-    """Заменяет персональные данные на токены (PII masking для 152-ФЗ)"""
-    # 1. ФИО (3 слова с заглавной буквы)
-    text = re.sub(r'\b([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\b', '<PERSON>', text)
-    # 2. Имя после "зовут", "имя" и т.д. (любой регистр, одно или несколько слов)
-    text = re.sub(r'\b(зовут|имя|это|зовут\s+меня|зовут\s+его|зовут\s+её)\s+([а-яёa-z\s]{2,30})', r'\1 <PERSON>', text, flags=re.IGNORECASE)
-    # 3. Email
-    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '<EMAIL>', text)
-    # 4. Телефон
-    text = re.sub(r'\+?\d[\d\-\s\(\)]{7,}\d', '<PHONE>', text)
-    # 5. ИНН (10 или 12 цифр)
-    text = re.sub(r'\b\d{10}\b|\b\d{12}\b', '<TAX_ID>', text)
-    # 6. Банковская карта
-    text = re.sub(r'\b(?:\d{4}[\s\-]?){3}\d{4}\b', '<CARD>', text)
-    # 7. Паспорт
-    text = re.sub(r'\b\d{2}\s\d{2}\s\d{6}\b', '<PASSPORT>', text)
-    return text
-
-
-def split_message_efficiently(text: str, max_length: int = 4096) -> List[str]:
-    """Разделение длинного сообщения на части для Telegram"""
-    if len(text) <= max_length:
-        return [text]
-    sentences = text.split('. ')
-    parts = []
-    current_part = ""
-    for sentence in sentences:
-        test_part = current_part + sentence + ". "
-        if len(test_part) <= max_length:
-            current_part = test_part
-        else:
-            if current_part:
-                parts.append(current_part.strip())
-            current_part = sentence + ". "
-    if current_part:
-        parts.append(current_part.strip())
-    final_parts = []
-    for part in parts:
-        if len(part) > max_length:
-            for i in range(0, len(part), max_length):
-                final_parts.append(part[i:i + max_length])
-        else:
-            final_parts.append(part)
-    return final_parts
+    """Заменяет персональные данные на токены (PII masking для 152-ФЗ, см. services.pii_engine)"""
+    return pii_engine.mask(text)
+
+
+async def mask_pii_async(text: str) -> str:
+    """mask_pii для обработчиков: очень длинный текст маскируется в рабочем потоке"""
+    return await pii_engine.mask_async(text)
+
+
+def split_message_efficiently(text: str, max_length: int = MESSAGE_LIMIT, markdown: bool = False) -> List[str]:
+    """Разделение длинного сообщения на части для Telegram (см. services.message_split)"""
+    return split_message(text, max_length, markdown)
 
 
 async def send_long_message(chat_id: int, text: str, context, prefix: str = "", parse_mode=None):
-    """Отправляет длинное сообщение по частям"""
-    parts = split_message_efficiently(text)
+    """
+    Отправляет длинное сообщение по частям. Все части сразу встают в очередь
+    планировщика (первая — с интерактивным приоритетом), темп задаёт он.
+    """
+    # Место под префикс и счётчик «(12/12)» вычитаем из лимита заранее
+    header_length = telegram_length(prefix) + 10 if prefix else 10
+    parts = split_message_efficiently(
+        text, MESSAGE_LIMIT - header_length, markdown=parse_mode == ParseMode.MARKDOWN
+    )
     total_parts = len(parts)
+    deliveries = []
     for i, part in enumerate(parts, 1):
         part_prefix = prefix if total_parts == 1 else f"{prefix}({i}/{total_parts})"
         full_text = part_prefix + "\n" + part if part_prefix else part
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=full_text,
+        deliveries.append(send_in_background(
+            context.bot, chat_id, full_text,
+            priority=PRIORITY_INTERACTIVE if i == 1 else PRIORITY_BULK,
             parse_mode=parse_mode
-        )
+        ))
+        if getattr(context.bot, 'rate_limiter', None) is None:
+            await deliveries[-1]    # без планировщика порядок частей держим сами
+    return await asyncio.gather(*deliveries)
 
 
 def get_calculator_data_safe(context, index: int, default: float = 0.0) -> float:
@@ -98,17 +125,8 @@ def generate_hud(session: SkillSession) -> str:
 
 
 def generate_hint(session: SkillSession, context: str = "") -> str:
-    """Генерация подсказки для пользователя"""
-    hints_library = [
-        "💡 Совет: Будьте конкретнее в ответах. Вместо 'хочу лучше общаться' попробуйте 'хочу научиться задавать открытые вопросы в диалоге'.",
-        "💡 Напоминание: Регулярность важнее длительности. Лучше 15 минут ежедневно, чем 2 часа раз в неделю.",
-        "💡 Подсказка: Сфокусируйтесь на одном микро-навыке за раз. Разбейте большую цель на маленькие достижимые шаги.",
-        "💡 Идея: Записывайте свои успехи. Даже маленькие победы создают прогресс и мотивацию.",
-        "💡 Метод: Используйте технику '5 почему' чтобы докопаться до корня проблемы с навыком."
-    ]
-    if context and "сложн" in context.lower():
-        return "💡 Если сложно: Начните с самого простого действия. Даже 2 минуты практики лучше, чем ничего."
-    return random.choice(hints_library)
+    """Подсказка по ответам сессии и выбранному режиму (поиск по корпусу hints.yaml, без LLM)"""
+    return hint_index.pick(session, context)
 
 
 def check_gate(session: SkillSession, gate_id: str) -> Tuple[bool, str]:
@@ -123,24 +141,3 @@ def check_gate(session: SkillSession, gate_id: str) -> Tuple[bool, str]:
         return False, f"⏳ {gate['description']}"
 
 
-def format_finish_packet(session: SkillSession, ai_response: str) -> str:
-    """Форматирование Finish Packet для SKILLTRAINER"""
-    packet = f"""🎓 **FINISH PACKET - SKILLTRAINER {SKILLTRAINER_VERSION}**
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-**📅 Сессия завершена:** {datetime.now().strftime('%d.%m.%Y %H:%M')}
-**👤 Пользователь ID:** {session.user_id}
-**🎯 Режим тренировки:** {session.selected_mode.name if session.selected_mode else 'Не выбран'}
-**📊 Пргресс:** {int(session.progress * 100)}%
-**🔍 КЛЮЧЕВЫЕ ОТВЕТЫ:**
-"""
-    for step, answer in session.answers.items():
-        if step < len(SKILLTRAINER_QUESTIONS):
-            question_num = SKILLTRAINER_QUESTIONS[step].split('**Шаг')[1].split(':**')[0]
-            packet += f"{question_num}: {answer}\n"
-    packet += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    packet += f"**🎯 ПЕРСОНАЛИЗИРОВАННАЯ ПРОГРАММА:**\n{ai_response}\n"
-    packet += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    packet += f"**📋 ПРОЙДЕННЫЕ ГЕЙТЫ:** {len(session.gates_passed)}/{len(SKILLTRAINER_GATES)}"
-    for gate_id in session.gates_passed:
-        packet += f"\n✅ {SKILLTRAINER_GATES[gate_id]['description']}"
-    return packet
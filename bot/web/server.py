@@ -7,6 +7,8 @@ from aiohttp import web
 from telegram import Update
 
 from ..config import logger, TELEGRAM_TOKEN, WEBHOOK_URL, BOT_VERSION
+from ..services.subscriptions import subscription_service
+from ..services.tracing import tracer, update_label
 
 
 async def health_check(request: web.Request) -> web.Response:
@@ -18,9 +20,13 @@ async def health_check(request: web.Request) -> web.Response:
 
 async def telegram_webhook_handler(request: web.Request, application) -> web.Response:
     try:
-        data = await request.json()
-        update = Update.de_json(data, application.bot)
-        await application.process_update(update)
+        with tracer.trace('webhook') as trace:
+            with tracer.span('decode'):
+                data = await request.json()
+                update = Update.de_json(data, application.bot)
+            if trace is not None:
+                trace.label = update_label(update)
+            await application.process_update(update)
         return web.Response(text="OK", status=200)
     except Exception as e:
         logger.error(f"Ошибка обработки webhook: {e}")
@@ -59,6 +65,7 @@ async def setup_web_server(application, port: int, webhook_url: str):
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', port)
     await site.start()
+    subscription_service.start(application)
     
     logger.info(f"{BOT_VERSION} - 🚀 AIOHTTP Server запущен на порту {port}")
     logger.info(f"{BOT_VERSION} - ✅ Бот готов к работе!")